@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube API密钥池
+每个Google Cloud项目每天有独立的配额 (默认10000单位)，配置多个项目的密钥后：
+- 记录每个密钥今天已用的配额单位
+- 每次调用选择剩余配额最多的密钥
+- 收到 403 quotaExceeded 时把该密钥标记为用完，直到太平洋时间午夜配额重置
+
+环境变量:
+    YOUTUBE_API_KEYS     逗号分隔的多个密钥 (优先于 YOUTUBE_API_KEY)
+    YOUTUBE_DAILY_QUOTA  每个密钥每天的配额单位 (默认10000)
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_DAILY_QUOTA = 10000
+
+# 表示配额用完的错误原因
+QUOTA_ERROR_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+
+try:
+    from zoneinfo import ZoneInfo
+    _PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # Python 3.8 及以下没有 zoneinfo，按太平洋标准时间计算（夏令时期间会晚一小时重置）
+    _PACIFIC = timezone(timedelta(hours=-8))
+
+
+class QuotaExhaustedError(Exception):
+    """所有密钥的配额都已用完"""
+
+
+def next_quota_reset(now=None):
+    """下一次配额重置（太平洋时间午夜）的时间戳"""
+    current = datetime.fromtimestamp(now if now is not None else time.time(), _PACIFIC)
+    midnight = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+def quota_error_reason(error):
+    """如果 HttpError 是配额用完的错误，返回错误原因，否则返回None"""
+    resp = getattr(error, 'resp', None)
+    if resp is None:
+        return None
+    return quota_reason_from_response(getattr(resp, 'status', None), getattr(error, 'content', b''))
+
+
+def quota_reason_from_response(status, content):
+    """按HTTP状态码和响应内容判断是否是配额用完的错误，返回错误原因或None"""
+    if status != 403:
+        return None
+    content = content or b''
+    try:
+        details = json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+        reasons = [item.get('reason') for item in details['error'].get('errors', [])]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        reasons = []
+    for reason in reasons:
+        if reason in QUOTA_ERROR_REASONS:
+            return reason
+    # 无法解析响应内容时，按提示文字判断
+    text = content.decode('utf-8', 'replace') if isinstance(content, bytes) else str(content)
+    for reason in QUOTA_ERROR_REASONS:
+        if reason in text:
+            return reason
+    return None
+
+
+def mask_key(key):
+    """用于日志和报告的密钥缩写"""
+    return f'{key[:6]}...{key[-4:]}' if len(key) > 12 else '***'
+
+
+def parse_api_keys(value):
+    """把逗号分隔的密钥字符串或列表转换为去重后的列表"""
+    if isinstance(value, str):
+        value = value.split(',')
+    keys = []
+    for key in value or []:
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class ApiKeyPool:
+    def __init__(self, keys, daily_quota: int = None):
+        """
+        Args:
+            keys: 密钥列表或逗号分隔的字符串
+            daily_quota: 每个密钥每天的配额单位，默认读取环境变量 YOUTUBE_DAILY_QUOTA
+        """
+        self.keys = parse_api_keys(keys)
+        if not self.keys:
+            raise ValueError("至少需要一个API密钥")
+        self.daily_quota = daily_quota or int(os.getenv('YOUTUBE_DAILY_QUOTA', DEFAULT_DAILY_QUOTA))
+        self._lock = threading.Lock()
+        self._used = {key: 0 for key in self.keys}
+        self._exhausted_until = {key: 0.0 for key in self.keys}
+        self._reset_at = next_quota_reset()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _maybe_reset(self, now):
+        if now >= self._reset_at:
+            self._used = {key: 0 for key in self.keys}
+            self._exhausted_until = {key: 0.0 for key in self.keys}
+            self._reset_at = next_quota_reset(now)
+
+    def headroom(self, key) -> int:
+        """密钥今天剩余的配额单位（已标记用完的为0）"""
+        with self._lock:
+            self._maybe_reset(time.time())
+            if self._exhausted_until[key] > time.time():
+                return 0
+            return max(0, self.daily_quota - self._used[key])
+
+    def acquire(self, cost: int = 1) -> str:
+        """
+        选择剩余配额最多的密钥
+
+        Args:
+            cost: 本次调用预计消耗的配额单位
+
+        Raises:
+            QuotaExhaustedError: 所有密钥都已用完
+        """
+        with self._lock:
+            now = time.time()
+            self._maybe_reset(now)
+            best_key, best_headroom = None, 0
+            for key in self.keys:
+                if self._exhausted_until[key] > now:
+                    continue
+                headroom = self.daily_quota - self._used[key]
+                if headroom >= cost and headroom > best_headroom:
+                    best_key, best_headroom = key, headroom
+            if best_key is None:
+                raise QuotaExhaustedError(f"{len(self.keys)} 个API密钥的配额都已用完")
+            return best_key
+
+    def record(self, key: str, cost: int = 1):
+        """记录一次调用消耗的配额"""
+        with self._lock:
+            self._used[key] += cost
+
+    def mark_exhausted(self, key: str):
+        """密钥收到配额用完的错误，在下次重置前不再使用"""
+        with self._lock:
+            self._used[key] = max(self._used[key], self.daily_quota)
+            self._exhausted_until[key] = self._reset_at
+
+    def usage(self) -> dict:
+        """
+        每个密钥的配额使用情况 {'#序号 缩写': {used, remaining, exhausted}}，用于汇总报告
+
+        以密钥在池中的序号区分，较短的密钥缩写都是 '***'，只用缩写做键会互相覆盖
+        """
+        with self._lock:
+            now = time.time()
+            return {
+                f'#{index} {mask_key(key)}': {
+                    'used': self._used[key],
+                    'remaining': 0 if self._exhausted_until[key] > now else max(0, self.daily_quota - self._used[key]),
+                    'exhausted': self._exhausted_until[key] > now,
+                }
+                for index, key in enumerate(self.keys)
+            }
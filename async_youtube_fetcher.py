@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步YouTube视频获取器
+googleapiclient 基于同步的 httplib2，频道很多时需要大量阻塞的线程。
+这里用 aiohttp 直接调用 playlistItems / channels 的REST接口，所有频道在同一个事件循环中并行翻页，
+由全局信号量限制同时进行的请求数。
+
+接口与 YouTubeVideoFetcher 相同 (get_channel_videos、get_all_video_ids、get_multiple_channel_videos)，
+返回同样的 VideoRecord 列表；同样支持多个API密钥 (api_key_pool.py) 和条件请求缓存 (http_cache.py)。
+
+用法:
+    async with AsyncYouTubeVideoFetcher(api_key, concurrency=20) as fetcher:
+        results = await fetcher.get_multiple_channel_videos(channel_ids)
+
+环境变量:
+    YOUTUBE_API_BASE_URL   REST接口地址 (默认 https://www.googleapis.com/youtube/v3，可指向 local_standins 的替身)
+    YOUTUBE_ASYNC_CONCURRENCY  同时进行的请求数上限 (默认20)
+"""
+
+import os
+import json
+import asyncio
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+from youtube_video_fetcher import LEAN_PLAYLIST_FIELDS, IDS_ONLY_PLAYLIST_FIELDS, BATCH_SIZE, YouTubeVideoFetcher
+from api_key_pool import ApiKeyPool, QuotaExhaustedError, mask_key, parse_api_keys, quota_reason_from_response
+from http_cache import EtagCache, cache_key_for
+from pipeline_metrics import metrics
+from video_records import VideoRecord
+
+API_BASE_URL = os.getenv('YOUTUBE_API_BASE_URL', 'https://www.googleapis.com/youtube/v3')
+
+# 5xx、429 和网络错误的重试次数
+MAX_RETRIES = 3
+
+
+class YouTubeApiError(Exception):
+    """REST接口返回的错误"""
+
+    def __init__(self, status: int, content: bytes, url: str = None):
+        self.status = status
+        self.content = content
+        self.url = url
+        super().__init__(f"HTTP {status}: {content[:200].decode('utf-8', 'replace')}")
+
+
+class AsyncYouTubeVideoFetcher:
+    def __init__(self, api_key, concurrency: int = None, lean: bool = True, http_cache=None,
+                 base_url: str = None, session=None):
+        """
+        Args:
+            api_key: API密钥；多个密钥（列表、逗号分隔的字符串或 ApiKeyPool）时按剩余配额轮换
+            concurrency: 同时进行的请求数上限，默认读取环境变量 YOUTUBE_ASYNC_CONCURRENCY (20)
+            lean: 精简模式，请求时带 fields 过滤
+            http_cache: 条件请求缓存（EtagCache 或数据库路径），默认读取环境变量 YOUTUBE_HTTP_CACHE
+            base_url: REST接口地址，默认 YOUTUBE_API_BASE_URL
+            session: 已创建的 aiohttp.ClientSession，默认在 async with 中创建
+        """
+        if isinstance(api_key, ApiKeyPool):
+            self.key_pool = api_key
+            self.api_key = None
+        else:
+            keys = parse_api_keys(api_key)
+            self.key_pool = ApiKeyPool(keys) if len(keys) > 1 else None
+            self.api_key = keys[0] if keys else None
+        self.concurrency = concurrency or int(os.getenv('YOUTUBE_ASYNC_CONCURRENCY', 20))
+        self.lean = lean
+        http_cache = http_cache or os.getenv('YOUTUBE_HTTP_CACHE')
+        self.http_cache = EtagCache(http_cache) if isinstance(http_cache, str) else http_cache
+        self.base_url = (base_url or API_BASE_URL).rstrip('/')
+        self.session = session
+        self._own_session = session is None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self.session is None:
+            import aiohttp  # 可选依赖，只有异步获取器需要
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=60),
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                headers={'User-Agent': 'youtube-srt-fetcher (gzip)', 'Accept-Encoding': 'gzip'},
+            )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None and self._own_session:
+            await self.session.close()
+            self.session = None
+
+    async def _get(self, method: str, params: dict, stage: str, cost: int = 1) -> dict:
+        """
+        调用一次REST接口
+
+        Raises:
+            YouTubeApiError: API返回的错误（重试后仍失败）
+            QuotaExhaustedError: 所有密钥的配额都已用完
+        """
+        import aiohttp
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        query = urlencode({name: value for name, value in params.items() if value is not None})
+        cache_key = cache_key_for(f'{self.base_url}/{method}?{query}') if self.http_cache else None
+        attempt = 0
+        while True:
+            key = self.key_pool.acquire(cost) if self.key_pool else self.api_key
+            headers = {}
+            etag = self.http_cache.etag_for(cache_key) if cache_key else None
+            if etag:
+                headers['If-None-Match'] = etag
+            url = f'{self.base_url}/{method}?{query}&{urlencode({"key": key})}'
+
+            async with self._semaphore:
+                try:
+                    with metrics.stage(stage):
+                        async with self.session.get(url, headers=headers) as response:
+                            status = response.status
+                            content = await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= MAX_RETRIES:
+                        raise YouTubeApiError(0, str(e).encode('utf-8'), url) from e
+                    attempt += 1
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+
+            if status == 200:
+                data = json.loads(content)
+                if cache_key:
+                    self.http_cache.store(cache_key, data)
+            elif status == 304 and cache_key:
+                data = self.http_cache.load(cache_key)
+                if data is None:
+                    # 缓存刚被清除，不带 If-None-Match 重新请求
+                    self.http_cache.discard(cache_key)
+                    continue
+            elif self.key_pool and quota_reason_from_response(status, content):
+                self.key_pool.mark_exhausted(key)
+                metrics.increment('api_key_failovers')
+                print(f"⚠️  API密钥 {mask_key(key)} 的配额已用完，切换到其他密钥")
+                continue
+            elif (status >= 500 or status == 429) and attempt < MAX_RETRIES:
+                attempt += 1
+                await asyncio.sleep(2 ** attempt)
+                continue
+            else:
+                raise YouTubeApiError(status, content, url)
+
+            if self.key_pool:
+                self.key_pool.record(key, cost)
+            return data
+
+    def _playlist_params(self, playlist_id: str, page_token: Optional[str], ids_only: bool) -> dict:
+        params = {
+            'part': 'contentDetails' if ids_only else 'contentDetails,snippet',
+            'playlistId': playlist_id,
+            'maxResults': 50,
+            'pageToken': page_token,
+        }
+        if ids_only:
+            params['fields'] = IDS_ONLY_PLAYLIST_FIELDS
+        elif self.lean:
+            params['fields'] = LEAN_PLAYLIST_FIELDS
+        return params
+
+    async def get_channel_uploads_playlist_id(self, channel_id: str) -> Optional[str]:
+        """通过频道ID获取uploads播放列表ID，失败时返回None"""
+        return (await self.get_uploads_playlist_ids([channel_id]))[channel_id]
+
+    async def get_uploads_playlist_ids(self, channel_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        获取多个频道的uploads播放列表ID，UC开头的频道直接换算，其余每50个频道查询一次
+
+        Returns:
+            {频道ID: uploads播放列表ID}，查询失败的频道值为None
+        """
+        playlists = {}
+        lookups = []
+        for channel_id in channel_ids:
+            if channel_id.startswith('UC'):
+                playlists[channel_id] = 'UU' + channel_id[2:]
+            else:
+                playlists[channel_id] = None
+                lookups.append(channel_id)
+
+        async def lookup(chunk):
+            params = {'part': 'contentDetails', 'id': ','.join(chunk), 'maxResults': BATCH_SIZE}
+            if self.lean:
+                params['fields'] = 'etag,items(id,contentDetails/relatedPlaylists/uploads)'
+            try:
+                response = await self._get('channels', params, 'uploads_resolve')
+            except (YouTubeApiError, QuotaExhaustedError) as e:
+                print(f"批量获取频道信息时出错: {e}")
+                return
+            for item in response.get('items', []):
+                playlists[item['id']] = item['contentDetails']['relatedPlaylists']['uploads']
+
+        await asyncio.gather(*(lookup(lookups[start:start + BATCH_SIZE])
+                               for start in range(0, len(lookups), BATCH_SIZE)))
+        return playlists
+
+    async def get_all_video_ids(self, playlist_id: str, max_videos: Optional[int] = None,
+                                ids_only: bool = False, quiet: bool = False) -> List[VideoRecord]:
+        """
+        获取播放列表中的所有视频（与 YouTubeVideoFetcher.get_all_video_ids 相同，出错时返回已获取的部分）
+
+        Args:
+            playlist_id: 播放列表ID
+            max_videos: 最大获取视频数量，None表示获取所有
+            ids_only: 只获取视频ID和发布时间（title为空字符串）
+            quiet: 不输出进度（多频道并行时使用）
+        """
+        videos = await self._list_playlist(playlist_id, max_videos, ids_only)
+        if not quiet:
+            print(f"总共获取了 {len(videos)} 个视频")
+        return videos
+
+    async def _list_playlist(self, playlist_id, max_videos, ids_only, raise_errors=False):
+        videos = []
+        page_token = None
+        while True:
+            try:
+                response = await self._get('playlistItems', self._playlist_params(playlist_id, page_token, ids_only),
+                                           'playlist_page')
+            except (YouTubeApiError, QuotaExhaustedError) as e:
+                if raise_errors:
+                    raise
+                print(f"API请求出错: {e}")
+                break
+            metrics.increment('playlist_pages')
+            metrics.increment('videos_listed', len(response.get('items', [])))
+            videos.extend(YouTubeVideoFetcher._parse_playlist_items(response, ids_only))
+
+            if max_videos and len(videos) >= max_videos:
+                del videos[max_videos:]
+                break
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        return videos
+
+    async def get_channel_videos(self, channel_id: str, max_videos: Optional[int] = None,
+                                 ids_only: bool = False) -> List[VideoRecord]:
+        """获取指定频道的所有视频，找不到uploads播放列表时返回空列表"""
+        playlist_id = await self.get_channel_uploads_playlist_id(channel_id)
+        if not playlist_id:
+            return []
+        return await self.get_all_video_ids(playlist_id, max_videos, ids_only)
+
+    async def get_multiple_channel_videos(self, channel_ids: List[str], max_videos: Optional[int] = None,
+                                          ids_only: bool = False) -> Dict[str, Optional[List[VideoRecord]]]:
+        """
+        并行获取多个频道的视频，同时进行的请求数不超过 concurrency
+
+        Returns:
+            {频道ID: 视频列表}，失败的频道值为None（与 YouTubeVideoFetcher.get_multiple_channel_videos 相同）
+        """
+        print(f"开始并行获取 {len(channel_ids)} 个频道的视频 (并发上限 {self.concurrency})...")
+        playlists = await self.get_uploads_playlist_ids(channel_ids)
+        results = {}
+
+        async def fetch(channel_id):
+            if not playlists.get(channel_id):
+                results[channel_id] = None
+                return
+            try:
+                results[channel_id] = await self._list_playlist(playlists[channel_id], max_videos, ids_only,
+                                                                raise_errors=True)
+            except (YouTubeApiError, QuotaExhaustedError) as e:
+                print(f"频道 {channel_id} 获取失败: {e}")
+                results[channel_id] = None
+
+        await asyncio.gather(*(fetch(channel_id) for channel_id in channel_ids))
+        fetched = sum(len(videos) for videos in results.values() if videos)
+        print(f"已获取 {fetched} 个视频，失败 {sum(1 for videos in results.values() if videos is None)} 个频道")
+        return {channel_id: results[channel_id] for channel_id in channel_ids}
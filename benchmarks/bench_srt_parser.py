@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SRT解析性能测试
+生成一批模拟的SRT文件（默认10000个），测量 srt_parser 解析和规范化的速度
+
+用法:
+    python benchmarks/bench_srt_parser.py
+    python benchmarks/bench_srt_parser.py --files 10000 --cues 300
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from srt_parser import parse_srt_file, format_srt_time
+
+WORDS = ['量子', '力学', '今天', '我们', '来讲', 'the', 'video', 'physics', 'energy', '宇宙', '黑洞', 'light']
+
+
+def generate_srt(rng, cue_count):
+    """生成一个带少量时间轴重叠的模拟SRT文本"""
+    parts = []
+    start = 0
+    for number in range(1, cue_count + 1):
+        start += rng.randint(500, 3000)
+        # 约5%的条目与下一条重叠
+        end = start + rng.randint(800, 4000 if rng.random() < 0.05 else 2500)
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        parts.append(f"{number}\r\n{format_srt_time(start)} --> {format_srt_time(end)}\r\n{text}\r\n\r\n")
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SRT解析性能测试')
+    parser.add_argument('--files', type=int, default=10000, help='SRT文件数量')
+    parser.add_argument('--cues', type=int, default=300, help='每个文件的平均字幕条数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"📝 生成 {args.files} 个SRT文件...")
+        paths = []
+        total_bytes = 0
+        for index in range(args.files):
+            path = os.path.join(directory, f'{index:05d}.srt')
+            data = generate_srt(rng, rng.randint(args.cues // 2, args.cues * 3 // 2)).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(data)
+            total_bytes += len(data)
+            paths.append(path)
+
+        print("⏱️  开始解析...")
+        total_cues = 0
+        start_time = time.perf_counter()
+        for path in paths:
+            total_cues += len(parse_srt_file(path))
+        parse_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for path in paths:
+            parse_srt_file(path).normalize()
+        normalize_seconds = time.perf_counter() - start_time
+
+    print(f"\n📊 结果:")
+    print(f"- 文件数: {args.files}, 字幕条数: {total_cues}, 总大小: {total_bytes / 1024 / 1024:.1f} MB")
+    print(f"- 解析: {parse_seconds:.2f} 秒 ({args.files / parse_seconds:.0f} 文件/秒, "
+          f"{total_cues / parse_seconds:.0f} 条/秒, {total_bytes / 1024 / 1024 / parse_seconds:.1f} MB/秒)")
+    print(f"- 解析+规范化: {normalize_seconds:.2f} 秒 ({args.files / normalize_seconds:.0f} 文件/秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端性能测试
+全部基于本地替身 (local_standins)，不访问真实的YouTube API和SRT服务，结果可重复
+
+测量项目:
+- listing:  get_all_video_ids 翻页获取视频的速度 (视频/秒)
+- srt:      batch_request_srt 在不同并发数下的请求速度 (请求/秒)
+- lambda:   lambda_handler 处理每个视频的平均耗时
+- writers:  各种输出格式写入时的峰值内存
+
+结果保存为JSON，可以用 --baseline 与之前版本的结果对比
+
+用法:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --videos 20000 --concurrency 1 4 16
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/benchmark_1748000000.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from local_standins import MockSRTServer, FakeYouTubeResource
+from youtube_video_fetcher import YouTubeVideoFetcher
+
+CHANNEL_ID = 'UCbenchmarkchannel000001'
+
+# 对比时超过这个比例的下降视为退化
+REGRESSION_THRESHOLD = 0.10
+
+
+def git_version():
+    """当前代码的git版本，用于标记结果"""
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def quiet_call(function, *args, **kwargs):
+    """执行函数并丢弃其打印输出，避免终端输出影响计时"""
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            return function(*args, **kwargs)
+        finally:
+            sys.stdout = stdout
+
+
+def bench_listing(videos, page_latency_ms):
+    """get_all_video_ids 的翻页速度"""
+    youtube = FakeYouTubeResource(videos_per_channel=videos, page_latency_ms=page_latency_ms)
+    fetcher = YouTubeVideoFetcher('benchmark', youtube=youtube, page_delay=0)
+
+    start_time = time.perf_counter()
+    video_data = quiet_call(fetcher.get_channel_videos, CHANNEL_ID)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        'videos': len(video_data),
+        'pages': youtube.calls.get('playlistItems.list', 0),
+        'seconds': round(elapsed, 4),
+        'videos_per_second': round(len(video_data) / elapsed, 1),
+    }
+
+
+def bench_srt(server, requests_count, concurrency_levels):
+    """batch_request_srt 在不同并发数下的请求速度"""
+    import get_all_videos
+
+    video_data = [
+        {'video_id': f'bench{index:06d}', 'title': f'video {index}', 'published_at': '2025-01-01T00:00:00Z'}
+        for index in range(requests_count)
+    ]
+    channel_info = {'id': CHANNEL_ID, 'name': 'benchmark'}
+
+    results = {}
+    for concurrency in concurrency_levels:
+        start_time = time.perf_counter()
+        srt_results = quiet_call(
+            get_all_videos.batch_request_srt, video_data, channel_info, delay=0, concurrency=concurrency
+        )
+        elapsed = time.perf_counter() - start_time
+        results[str(concurrency)] = {
+            'requests': len(srt_results),
+            'failed': sum(1 for record in srt_results if not record['request_result']['success']),
+            'seconds': round(elapsed, 4),
+            'requests_per_second': round(len(srt_results) / elapsed, 1),
+        }
+    return results
+
+
+def bench_lambda(videos):
+    """lambda_handler 每个视频的平均耗时"""
+    import lambda_youtube_srt
+
+    logging.getLogger().setLevel(logging.WARNING)
+    start_time = time.perf_counter()
+    response = quiet_call(
+        lambda_youtube_srt.lambda_handler,
+        {'channel_id': CHANNEL_ID, 'max_videos': videos, 'delay': 0}, None
+    )
+    elapsed = time.perf_counter() - start_time
+
+    body = json.loads(response['body'])
+    processed = body.get('total_videos', 0)
+    return {
+        'status_code': response['statusCode'],
+        'videos': processed,
+        'seconds': round(elapsed, 4),
+        'ms_per_video': round(elapsed * 1000 / processed, 3) if processed else None,
+    }
+
+
+def bench_writers(videos):
+    """各种输出格式写入时的峰值内存和耗时"""
+    youtube = FakeYouTubeResource(videos_per_channel=videos)
+    fetcher = YouTubeVideoFetcher('benchmark', youtube=youtube, page_delay=0)
+    video_data = quiet_call(fetcher.get_channel_videos, CHANNEL_ID)
+
+    writers = {
+        'txt': lambda path: YouTubeVideoFetcher.save_to_file(video_data, path, 'txt'),
+        'json': lambda path: YouTubeVideoFetcher.save_to_file(video_data, path, 'json'),
+        'csv': lambda path: YouTubeVideoFetcher.save_to_file(video_data, path, 'csv'),
+    }
+
+    def write_catalogue(path):
+        from catalogue_store import CatalogueStore
+        store = CatalogueStore(path)
+        store.upsert_videos(CHANNEL_ID, video_data)
+        store.close()
+
+    writers['catalogue'] = write_catalogue
+
+    try:
+        import pyarrow  # noqa: F401
+        from columnar_export import save_videos_parquet
+        writers['parquet'] = lambda path: save_videos_parquet(video_data, path)
+    except ImportError:
+        pass
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, writer in writers.items():
+            path = os.path.join(directory, f'videos.{name}')
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            quiet_call(writer, path)
+            elapsed = time.perf_counter() - start_time
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {
+                'videos': len(video_data),
+                'seconds': round(elapsed, 4),
+                'peak_memory_kb': round(peak / 1024, 1),
+                'file_size_kb': round(os.path.getsize(path) / 1024, 1),
+            }
+    return results
+
+
+def compare_with_baseline(current, baseline_path):
+    """与之前的结果对比，打印吞吐量和内存的变化"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    checks = [('listing', 'videos_per_second', True)]
+    for concurrency in current['results'].get('srt', {}):
+        checks.append((f'srt.{concurrency}', 'requests_per_second', True))
+    checks.append(('lambda', 'ms_per_video', False))
+    for writer in current['results'].get('writers', {}):
+        checks.append((f'writers.{writer}', 'peak_memory_kb', False))
+
+    def lookup(results, path):
+        value = results
+        for key in path.split('.'):
+            value = value.get(key, {}) if isinstance(value, dict) else {}
+        return value
+
+    print(f"\n📊 与基线 {baseline.get('version')} 对比:")
+    regressions = 0
+    for path, metric, higher_is_better in checks:
+        old = lookup(baseline['results'], path).get(metric)
+        new = lookup(current['results'], path).get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change < -REGRESSION_THRESHOLD if higher_is_better else change > REGRESSION_THRESHOLD
+        regressions += regressed
+        print(f"  {'❌' if regressed else '✅'} {path}.{metric}: {old} -> {new} ({change * 100:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端性能测试 (基于本地替身)')
+    parser.add_argument('--videos', type=int, default=10000, help='虚拟频道的视频数量')
+    parser.add_argument('--page-latency-ms', type=float, default=0.0, help='模拟每页API请求的延迟')
+    parser.add_argument('--srt-requests', type=int, default=200, help='SRT测试的请求数量')
+    parser.add_argument('--srt-latency-ms', type=float, default=20.0, help='SRT替身的平均延迟')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='SRT测试的并发数')
+    parser.add_argument('--lambda-videos', type=int, default=100, help='Lambda测试的视频数量')
+    parser.add_argument('--output', help='结果文件路径，默认 benchmarks/results/benchmark_{时间戳}.json')
+    parser.add_argument('--baseline', help='用于对比的之前的结果文件')
+    args = parser.parse_args()
+
+    results = {}
+    with MockSRTServer(cached_ratio=0.5, latency_ms=args.srt_latency_ms, seed=42) as server:
+        # 让所有模块都指向本地替身
+        os.environ['SRT_API_URL'] = server.url
+        os.environ['YOUTUBE_FAKE_VIDEOS'] = str(args.lambda_videos)
+        os.environ.setdefault('YOUTUBE_API_KEY', 'benchmark')
+
+        print("⏱️  listing: get_all_video_ids 翻页...")
+        results['listing'] = bench_listing(args.videos, args.page_latency_ms)
+
+        print(f"⏱️  srt: batch_request_srt 并发 {args.concurrency}...")
+        results['srt'] = bench_srt(server, args.srt_requests, args.concurrency)
+
+        print("⏱️  lambda: lambda_handler...")
+        results['lambda'] = bench_lambda(args.lambda_videos)
+
+    print("⏱️  writers: 输出格式峰值内存...")
+    results['writers'] = bench_writers(args.videos)
+
+    report = {
+        'version': git_version(),
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': vars(args),
+        'results': results,
+    }
+
+    output = args.output or os.path.join(ROOT_DIR, 'benchmarks', 'results', f"benchmark_{report['timestamp']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\n💾 结果已保存到: {output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(report, args.baseline)
+        if regressions:
+            print(f"\n⚠️  发现 {regressions} 项性能退化")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
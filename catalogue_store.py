@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道视频目录存储
+用一个SQLite数据库保存所有频道的视频列表和SRT请求结果，代替每次运行生成的时间戳文件
+需要旧格式文件时再通过导出功能按需生成
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+DEFAULT_DB_PATH = 'youtube_catalogue.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id   TEXT PRIMARY KEY,
+    channel_name TEXT,
+    video_count  INTEGER,
+    last_sync    REAL
+);
+
+CREATE TABLE IF NOT EXISTS videos (
+    video_id     TEXT PRIMARY KEY,
+    channel_id   TEXT NOT NULL,
+    title        TEXT,
+    published_at TEXT,
+    first_seen   REAL,
+    last_seen    REAL
+);
+
+CREATE TABLE IF NOT EXISTS srt_requests (
+    video_id     TEXT PRIMARY KEY,
+    channel_id   TEXT,
+    success      INTEGER NOT NULL,
+    status_code  INTEGER,
+    error        TEXT,
+    response     TEXT,
+    requested_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_videos_channel ON videos (channel_id, published_at DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_published ON videos (published_at);
+CREATE INDEX IF NOT EXISTS idx_srt_channel ON srt_requests (channel_id);
+CREATE INDEX IF NOT EXISTS idx_srt_success ON srt_requests (success);
+"""
+
+
+class CatalogueStore:
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        """
+        打开（或创建）目录数据库
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """为旧版本创建的数据库补上新增的列"""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(channels)")}
+        if 'api_video_count' not in columns:
+            # 上次处理时API返回的 statistics.videoCount (video_count 是实际获取的视频数量，可能受 max_videos 限制)
+            with self.conn:
+                self.conn.execute("ALTER TABLE channels ADD COLUMN api_video_count INTEGER")
+        if 'api_max_videos' not in columns:
+            # 记录 api_video_count 时那次运行的 max_videos (NULL 表示没有限制)
+            with self.conn:
+                self.conn.execute("ALTER TABLE channels ADD COLUMN api_max_videos INTEGER")
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def upsert_channel(self, channel_info: dict, video_count: int):
+        """写入或更新频道信息"""
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO channels (channel_id, channel_name, video_count, last_sync)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    video_count = excluded.video_count,
+                    last_sync = excluded.last_sync
+                """,
+                (channel_info['id'], channel_info.get('name'), video_count, time.time())
+            )
+
+    def upsert_videos(self, channel_id: str, video_data: list):
+        """写入或更新一个频道的视频列表"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO videos (video_id, channel_id, title, published_at, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    channel_id = excluded.channel_id,
+                    title = excluded.title,
+                    published_at = excluded.published_at,
+                    last_seen = excluded.last_seen
+                """,
+                ((video['video_id'], channel_id, video['title'], video['published_at'], now, now)
+                 for video in video_data)
+            )
+
+    def upsert_srt_results(self, srt_results: list):
+        """
+        写入或更新 batch_request_srt 返回的SRT请求结果
+
+        已经成功的记录不会被之后失败的请求（重试、重复轮询等）覆盖
+        """
+        now = time.time()
+        rows = []
+        for record in srt_results:
+            result = record['request_result']
+            response = result.get('data', result.get('response'))
+            rows.append((
+                record['video_id'],
+                record.get('channel_id'),
+                1 if result['success'] else 0,
+                result.get('status_code'),
+                result.get('error'),
+                json.dumps(response, ensure_ascii=False) if response is not None else None,
+                now
+            ))
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO srt_requests (video_id, channel_id, success, status_code, error, response, requested_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    channel_id = excluded.channel_id,
+                    success = excluded.success,
+                    status_code = excluded.status_code,
+                    error = excluded.error,
+                    response = excluded.response,
+                    requested_at = excluded.requested_at
+                WHERE srt_requests.success = 0 OR excluded.success = 1
+                """,
+                rows
+            )
+
+    def get_channel_videos(self, channel_id: str, limit: int = None) -> list:
+        """按发布时间从新到旧返回频道的视频列表（与 get_channel_videos 相同的字典格式）"""
+        sql = "SELECT video_id, title, published_at FROM videos WHERE channel_id = ? ORDER BY published_at DESC"
+        params = [channel_id]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def get_known_video_ids(self, channel_id: str) -> set:
+        """返回目录中已有的某频道视频ID集合"""
+        rows = self.conn.execute("SELECT video_id FROM videos WHERE channel_id = ?", (channel_id,))
+        return {row[0] for row in rows}
+
+    def get_api_video_counts(self, channel_ids: list) -> dict:
+        """
+        上次处理时记录的视频数量，没有记录的频道不在结果中
+
+        Returns:
+            {频道ID: {'api_video_count': statistics.videoCount, 'video_count': 实际获取的视频数量,
+                      'api_max_videos': 那次运行的 max_videos}}
+        """
+        counts = {}
+        for start in range(0, len(channel_ids), 500):
+            chunk = channel_ids[start:start + 500]
+            rows = self.conn.execute(
+                "SELECT channel_id, api_video_count, video_count, api_max_videos FROM channels "
+                "WHERE api_video_count IS NOT NULL AND channel_id IN ({})".format(','.join('?' * len(chunk))),
+                chunk
+            )
+            counts.update((row['channel_id'], dict(row)) for row in rows)
+        return counts
+
+    def set_api_video_count(self, channel_id: str, count: int, max_videos: int = None):
+        """记录处理频道时API返回的 statistics.videoCount 和那次运行的 max_videos"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE channels SET api_video_count = ?, api_max_videos = ? WHERE channel_id = ?",
+                (count, max_videos, channel_id)
+            )
+
+    def get_channel(self, channel_id: str):
+        """返回频道信息字典，不存在时返回None"""
+        row = self.conn.execute("SELECT * FROM channels WHERE channel_id = ?", (channel_id,)).fetchone()
+        return dict(row) if row else None
+
+    def videos_missing_srt(self, channel_id: str = None, include_failed: bool = True, limit: int = None,
+                           first_seen_after: float = None) -> list:
+        """
+        返回还没有SRT的视频（从新到旧）
+
+        Args:
+            channel_id: 只查询指定频道，None表示所有频道
+            include_failed: 是否包含请求过但失败的视频
+            limit: 最多返回多少条
+            first_seen_after: 只返回在这个时间之后才第一次记录的视频
+        """
+        sql = """
+            SELECT v.video_id, v.channel_id, v.title, v.published_at
+            FROM videos v LEFT JOIN srt_requests s ON s.video_id = v.video_id
+            WHERE (s.video_id IS NULL{failed})
+        """.format(failed=' OR s.success = 0' if include_failed else '')
+        params = []
+        if channel_id:
+            sql += " AND v.channel_id = ?"
+            params.append(channel_id)
+        if first_seen_after is not None:
+            sql += " AND v.first_seen > ?"
+            params.append(first_seen_after)
+        sql += " ORDER BY v.published_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def channel_first_seen(self, channel_id: str):
+        """频道第一次同步的时间（最早记录的视频的 first_seen），还没有视频时返回None"""
+        row = self.conn.execute("SELECT MIN(first_seen) FROM videos WHERE channel_id = ?", (channel_id,)).fetchone()
+        return row[0]
+
+    def get_srt_done_ids(self, channel_id: str) -> set:
+        """返回某频道已经成功请求过SRT的视频ID集合"""
+        rows = self.conn.execute("SELECT video_id FROM srt_requests WHERE channel_id = ? AND success = 1", (channel_id,))
+        return {row[0] for row in rows}
+
+    def srt_done_counts(self, newest: int = None) -> dict:
+        """
+        每个频道已经成功请求过SRT的视频数量
+
+        Args:
+            newest: 只统计每个频道最新的多少个视频，None表示所有视频
+
+        Returns:
+            {频道ID: 数量}
+        """
+        sql = """
+            SELECT channel_id, COUNT(*) FROM (
+                SELECT v.channel_id, s.success,
+                       ROW_NUMBER() OVER (PARTITION BY v.channel_id ORDER BY v.published_at DESC) AS position
+                FROM videos v LEFT JOIN srt_requests s ON s.video_id = v.video_id
+            )
+            WHERE success = 1{newest}
+            GROUP BY channel_id
+        """.format(newest=' AND position <= ?' if newest else '')
+        return dict(self.conn.execute(sql, [newest] if newest else []).fetchall())
+
+    def get_srt_results(self, channel_id: str) -> list:
+        """以 batch_request_srt 的结果格式返回某频道的SRT请求记录"""
+        rows = self.conn.execute(
+            """
+            SELECT s.*, v.title, v.published_at, c.channel_name
+            FROM srt_requests s
+            LEFT JOIN videos v ON v.video_id = s.video_id
+            LEFT JOIN channels c ON c.channel_id = s.channel_id
+            WHERE s.channel_id = ?
+            ORDER BY v.published_at DESC
+            """,
+            (channel_id,)
+        )
+        results = []
+        for i, row in enumerate(rows, 1):
+            response = json.loads(row['response']) if row['response'] else None
+            if row['success']:
+                request_result = {"success": True, "data": response, "status_code": row['status_code']}
+            else:
+                request_result = {"success": False, "error": row['error'], "response": response}
+            results.append({
+                'channel_id': row['channel_id'],
+                'channel_name': row['channel_name'],
+                'index': i,
+                'video_id': row['video_id'],
+                'title': row['title'],
+                'published_at': row['published_at'],
+                'request_result': request_result
+            })
+        return results
+
+    def export_channel(self, channel_id: str, filename: str, format_type: str = 'json'):
+        """
+        按旧的文件格式导出某频道的数据
+
+        Args:
+            channel_id: 频道ID
+            filename: 输出文件名
+            format_type: 'txt'、'json'、'csv'、'parquet' 为视频列表，'srt_results' 为SRT请求结果
+        """
+        if format_type == 'srt_results':
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.get_srt_results(channel_id), f, ensure_ascii=False, indent=2)
+            print(f"数据已保存到 {filename}")
+            return
+
+        # 延迟导入，避免没有安装 googleapiclient 时无法使用目录的查询功能
+        from youtube_video_fetcher import YouTubeVideoFetcher
+        YouTubeVideoFetcher.save_to_file(self.get_channel_videos(channel_id), filename, format_type)
+
+    def stats(self) -> dict:
+        """返回目录的整体统计"""
+        row = self.conn.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM channels) AS channels,
+                (SELECT COUNT(*) FROM videos) AS videos,
+                (SELECT COUNT(*) FROM srt_requests WHERE success = 1) AS srt_success,
+                (SELECT COUNT(*) FROM srt_requests WHERE success = 0) AS srt_failed
+            """
+        ).fetchone()
+        return dict(row)
+
+
+def open_catalogue_store():
+    """根据环境变量 CATALOGUE_DB_PATH 打开目录数据库，未设置时返回None"""
+    db_path = os.getenv('CATALOGUE_DB_PATH')
+    if not db_path:
+        return None
+    return CatalogueStore(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='频道视频目录查询和导出工具')
+    parser.add_argument('--db', default=os.getenv('CATALOGUE_DB_PATH', DEFAULT_DB_PATH), help='数据库文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('stats', help='显示目录统计')
+
+    missing = subparsers.add_parser('missing-srt', help='列出还没有SRT的视频')
+    missing.add_argument('channel_id', nargs='?', help='只查询指定频道')
+    missing.add_argument('--limit', type=int, help='最多显示多少条')
+
+    export = subparsers.add_parser('export', help='按旧格式导出频道数据')
+    export.add_argument('channel_id', help='频道ID')
+    export.add_argument('filename', help='输出文件名')
+    export.add_argument('format_type', nargs='?', default='json',
+                        choices=['txt', 'json', 'csv', 'parquet', 'srt_results'], help='输出格式')
+
+    args = parser.parse_args()
+    store = CatalogueStore(args.db)
+
+    if args.command == 'stats':
+        stats = store.stats()
+        print(f"📊 频道: {stats['channels']}, 视频: {stats['videos']}, "
+              f"SRT成功: {stats['srt_success']}, SRT失败: {stats['srt_failed']}")
+    elif args.command == 'missing-srt':
+        for video in store.videos_missing_srt(args.channel_id, limit=args.limit):
+            print(f"{video['video_id']}\t{video['published_at']}\t{video['title']}")
+    elif args.command == 'export':
+        store.export_channel(args.channel_id, args.filename, args.format_type)
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道RSS (Atom) 订阅源
+YouTube为每个频道提供包含最新15个上传视频的Atom订阅源，不需要API密钥，也不消耗API配额:
+    https://www.youtube.com/feeds/videos.xml?channel_id=UCxxxx
+
+用于"有没有新视频"的检查：并发下载多个频道的订阅源，用流式XML解析器 (iterparse) 边下载边解析，
+返回与 YouTubeVideoFetcher 相同的 VideoRecord (video_id / title / published_at)。
+
+环境变量:
+    FEED_URL_TEMPLATE  订阅源地址模板，{channel_id} 会被替换（可指向 local_standins 的替身，也支持 file://）
+    FEED_CONCURRENCY   同时下载的订阅源数量 (默认8)
+"""
+
+import os
+import urllib.request
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pipeline_metrics import metrics
+from video_records import VideoRecord, format_timestamp
+
+DEFAULT_FEED_URL_TEMPLATE = 'https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}'
+
+# 订阅源只包含最新的15个视频
+FEED_WINDOW = 15
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+YT_NS = '{http://www.youtube.com/xml/schemas/2015}'
+
+
+def feed_url(channel_id: str) -> str:
+    """频道订阅源的地址"""
+    return os.getenv('FEED_URL_TEMPLATE', DEFAULT_FEED_URL_TEMPLATE).format(channel_id=channel_id)
+
+
+def normalize_published(value: str) -> str:
+    """把订阅源的 '2025-05-24T10:00:00+00:00' 转换为API的 '2025-05-24T10:00:00Z' 格式"""
+    try:
+        return format_timestamp(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except (ValueError, AttributeError):
+        return value or ''
+
+
+def parse_feed(stream) -> List[VideoRecord]:
+    """
+    流式解析Atom订阅源，每解析完一个 <entry> 就释放它
+
+    Args:
+        stream: 文件对象（HTTP响应或本地文件）
+
+    Returns:
+        视频记录列表（与订阅源顺序相同，从新到旧）
+    """
+    videos = []
+    for event, element in ElementTree.iterparse(stream, events=('end',)):
+        if element.tag != f'{ATOM_NS}entry':
+            continue
+        video_id = element.findtext(f'{YT_NS}videoId')
+        if video_id:
+            videos.append(VideoRecord(
+                video_id,
+                element.findtext(f'{ATOM_NS}title') or '',
+                normalize_published(element.findtext(f'{ATOM_NS}published') or '')
+            ))
+        element.clear()
+    return videos
+
+
+def fetch_feed(channel_id: str, timeout: float = 15) -> Optional[List[VideoRecord]]:
+    """
+    下载并解析一个频道的订阅源
+
+    Returns:
+        视频记录列表，下载或解析失败（包括频道不存在的404）时返回None
+    """
+    try:
+        with metrics.stage('feed_fetch') as stage:
+            try:
+                with urllib.request.urlopen(feed_url(channel_id), timeout=timeout) as response:
+                    videos = parse_feed(response)
+            except Exception as e:
+                stage.mark_error(type(e).__name__)
+                raise
+    except (OSError, ElementTree.ParseError) as e:
+        print(f"⚠️  获取频道 {channel_id} 的订阅源失败: {e}")
+        return None
+    metrics.increment('feed_fetches')
+    return videos
+
+
+def fetch_feeds(channel_ids: List[str], concurrency: int = None) -> Dict[str, Optional[List[VideoRecord]]]:
+    """
+    并发下载多个频道的订阅源
+
+    Returns:
+        {频道ID: 视频记录列表}，失败的频道值为None
+    """
+    concurrency = concurrency or int(os.getenv('FEED_CONCURRENCY', 8))
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(channel_ids)))) as executor:
+        return dict(zip(channel_ids, executor.map(fetch_feed, channel_ids)))
+
+
+def new_videos_from_feed(feed_videos: List[VideoRecord], known_video_ids: set) -> Optional[List[VideoRecord]]:
+    """
+    从订阅源中找出新视频
+
+    订阅源中出现了已知视频（或订阅源不满15个，说明包含了频道的全部视频）时，
+    订阅源覆盖了上次同步之后的所有上传，返回其中的新视频；否则返回None，需要改用API翻页
+
+    Args:
+        feed_videos: fetch_feed 的结果
+        known_video_ids: 已知的视频ID集合
+    """
+    if not known_video_ids:
+        return None
+    new_videos = [video for video in feed_videos if video.video_id not in known_video_ids]
+    if len(new_videos) < len(feed_videos) or len(feed_videos) < FEED_WINDOW:
+        return new_videos
+    return None
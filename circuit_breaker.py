@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SRT服务熔断器
+SRT服务 (lic.deepsrt.cc) 出问题时，每个请求都要等满30秒超时才失败，一小时就能把几千个视频记为失败。
+熔断器统计最近的请求，错误率或慢请求比例超过阈值时"打开"：
+- closed (关闭): 正常发送请求
+- open (打开): 不发送请求，待处理的视频在 acquire() 中等待，而不是记为失败
+- half_open (半开): 冷却时间过后放行少量探测请求，全部成功则关闭，任何一个失败则重新打开（冷却时间加倍）
+
+环境变量 (前缀默认 SRT_BREAKER):
+    SRT_BREAKER                 设为0时关闭熔断器
+    SRT_BREAKER_ERROR_RATE      打开熔断器的错误率 (默认0.5)
+    SRT_BREAKER_SLOW_SECONDS    超过该耗时的请求算作慢请求 (默认10秒)
+    SRT_BREAKER_SLOW_RATE       打开熔断器的慢请求比例 (默认0.5)
+    SRT_BREAKER_WINDOW          统计最近多少个请求 (默认20)
+    SRT_BREAKER_MIN_CALLS       窗口中至少有多少个请求才判断 (默认10)
+    SRT_BREAKER_OPEN_SECONDS    第一次打开后的冷却时间 (默认30秒，连续打开时加倍)
+    SRT_BREAKER_MAX_OPEN_SECONDS  冷却时间上限 (默认300秒)
+    SRT_BREAKER_PROBES          半开状态的探测请求数 (默认3)
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+from pipeline_metrics import metrics
+
+logger = logging.getLogger('youtube_srt.breaker')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, error_rate: float = 0.5, slow_call_seconds: float = 10.0,
+                 slow_call_rate: float = 0.5, window: int = 20, min_calls: int = 10,
+                 open_seconds: float = 30.0, max_open_seconds: float = 300.0, half_open_calls: int = 3,
+                 enabled: bool = True, clock=time.monotonic):
+        """
+        Args:
+            name: 名称，用于日志
+            error_rate: 打开熔断器的错误率
+            slow_call_seconds: 超过该耗时的请求算作慢请求
+            slow_call_rate: 打开熔断器的慢请求比例
+            window: 统计最近多少个请求
+            min_calls: 窗口中至少有多少个请求才判断
+            open_seconds: 第一次打开后的冷却时间（秒），连续打开时加倍
+            max_open_seconds: 冷却时间上限（秒）
+            half_open_calls: 半开状态放行的探测请求数
+            enabled: False 时不做任何限制
+            clock: 单调时钟（测试时可替换）
+        """
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_calls = half_open_calls
+        self.enabled = enabled
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._calls = deque(maxlen=window)   # (成功, 慢请求)
+        self._state = CLOSED
+        self._generation = 1                 # 每次状态变化加1，用于忽略状态变化前发出的请求结果
+        self._state_since = clock()
+        self._durations = {CLOSED: 0.0, OPEN: 0.0, HALF_OPEN: 0.0}
+        self._open_until = 0.0
+        self._current_open_seconds = open_seconds
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self.times_opened = 0
+        self.parked_calls = 0
+        self.parked_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str = 'SRT_BREAKER'):
+        """按环境变量创建熔断器"""
+        def env(suffix, default, cast=float):
+            return cast(os.getenv(f'{prefix}_{suffix}', default))
+
+        return cls(
+            name,
+            error_rate=env('ERROR_RATE', 0.5),
+            slow_call_seconds=env('SLOW_SECONDS', 10.0),
+            slow_call_rate=env('SLOW_RATE', 0.5),
+            window=env('WINDOW', 20, int),
+            min_calls=env('MIN_CALLS', 10, int),
+            open_seconds=env('OPEN_SECONDS', 30.0),
+            max_open_seconds=env('MAX_OPEN_SECONDS', 300.0),
+            half_open_calls=env('PROBES', 3, int),
+            enabled=os.getenv(prefix, '1') != '0',
+        )
+
+    @property
+    def state(self) -> str:
+        with self._cond:
+            self._advance(self.clock())
+            return self._state
+
+    def _transition(self, state, now):
+        self._durations[self._state] += now - self._state_since
+        self._state = state
+        self._state_since = now
+        self._generation += 1
+        self._cond.notify_all()
+
+    def _advance(self, now):
+        """冷却时间结束后从打开转为半开"""
+        if self._state == OPEN and now >= self._open_until:
+            self._probes_started = 0
+            self._probes_succeeded = 0
+            self._transition(HALF_OPEN, now)
+            logger.info(f"🔌 {self.name} 熔断器半开，发送 {self.half_open_calls} 个探测请求",
+                        extra={'breaker': self.name, 'state': HALF_OPEN})
+
+    def _open(self, now, reason):
+        if self._state == HALF_OPEN:
+            self._current_open_seconds = min(self.max_open_seconds, self._current_open_seconds * 2)
+        else:
+            self._current_open_seconds = self.open_seconds
+        self._open_until = now + self._current_open_seconds
+        self._calls.clear()
+        self.times_opened += 1
+        self._transition(OPEN, now)
+        metrics.increment('circuit_opened')
+        logger.warning(
+            f"⚡ {self.name} 熔断器打开 ({reason})，暂停请求 {self._current_open_seconds:.0f} 秒",
+            extra={'breaker': self.name, 'state': OPEN, 'reason': reason, 'open_seconds': self._current_open_seconds}
+        )
+
+    def acquire(self, timeout: float = None):
+        """
+        等待可以发送请求
+
+        熔断器打开时在这里等待（视频被暂缓而不是记为失败），冷却结束后自动恢复
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            请求凭证，发送完请求后传给 record()；等待超时返回None
+        """
+        if not self.enabled:
+            return 0
+        with self._cond:
+            start = self.clock()
+            parked = False
+            while True:
+                now = self.clock()
+                self._advance(now)
+                if self._state == CLOSED:
+                    break
+                if self._state == HALF_OPEN and self._probes_started < self.half_open_calls:
+                    self._probes_started += 1
+                    break
+
+                if not parked:
+                    parked = True
+                    self.parked_calls += 1
+                # 打开时等到冷却结束，半开时等探测结果
+                wait = self._open_until - now if self._state == OPEN else 1.0
+                if timeout is not None:
+                    remaining = start + timeout - now
+                    if remaining <= 0:
+                        self.parked_seconds += now - start
+                        return None
+                    wait = min(wait, remaining)
+                self._cond.wait(max(wait, 0.01))
+
+            if parked:
+                self.parked_seconds += self.clock() - start
+            return self._generation
+
+    def record(self, ticket, success: bool, elapsed: float):
+        """
+        记录一次请求的结果
+
+        Args:
+            ticket: acquire() 返回的凭证
+            success: 服务是否正常响应（单个视频的业务错误不算失败）
+            elapsed: 请求耗时（秒）
+        """
+        if not self.enabled or ticket is None:
+            return
+        with self._cond:
+            if ticket != self._generation:
+                # 状态变化之前发出的请求，结果已经不代表当前状态
+                return
+            now = self.clock()
+            slow = elapsed >= self.slow_call_seconds
+
+            if self._state == HALF_OPEN:
+                if success and not slow:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_calls:
+                        self._current_open_seconds = self.open_seconds
+                        self._transition(CLOSED, now)
+                        logger.info(f"✅ {self.name} 熔断器关闭，恢复正常请求",
+                                    extra={'breaker': self.name, 'state': CLOSED})
+                else:
+                    self._open(now, '探测请求失败' if not success else f'探测请求耗时 {elapsed:.1f} 秒')
+                return
+
+            self._calls.append((success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+            slow_calls = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+            if failures >= self.error_rate:
+                self._open(now, f'错误率 {failures:.0%}')
+            elif slow_calls >= self.slow_call_rate:
+                self._open(now, f'慢请求比例 {slow_calls:.0%}')
+
+    def summary(self) -> dict:
+        """各状态的累计时间等统计，用于汇总报告"""
+        with self._cond:
+            now = self.clock()
+            self._advance(now)
+            durations = dict(self._durations)
+            durations[self._state] += now - self._state_since
+            return {
+                'enabled': self.enabled,
+                'state': self._state,
+                'seconds_in_state': {state: round(seconds, 1) for state, seconds in durations.items()},
+                'times_opened': self.times_opened,
+                'parked_calls': self.parked_calls,
+                'parked_seconds': round(self.parked_seconds, 1),
+            }
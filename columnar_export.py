@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式存储导出工具
+把视频列表和SRT请求结果导出为Parquet格式，并支持按频道和日期分区写入数据集
+
+优先使用 pyarrow，没有安装时退回到 pandas (需要 pandas + fastparquet 或 pyarrow)
+"""
+
+import os
+import glob
+import json
+from datetime import datetime, timezone
+
+# 视频列表的字段及类型
+VIDEO_FIELDS = [
+    ('video_id', 'string'),
+    ('title', 'string'),
+    ('published_at', 'timestamp'),
+]
+
+# SRT请求结果的字段及类型
+SRT_RESULT_FIELDS = [
+    ('channel_id', 'string'),
+    ('channel_name', 'string'),
+    ('index', 'int32'),
+    ('video_id', 'string'),
+    ('title', 'string'),
+    ('published_at', 'timestamp'),
+    ('success', 'bool'),
+    ('status_code', 'int16'),
+    ('error', 'string'),
+    ('response', 'string'),
+]
+
+DEFAULT_COMPRESSION = 'zstd'
+
+
+def parse_published_at(value):
+    """把 YouTube 的 ISO8601 时间字符串转换为带时区的 datetime"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def video_columns(video_data):
+    """把视频记录列表转换为按列组织的数据"""
+    columns = {name: [] for name, _ in VIDEO_FIELDS}
+    for video in video_data:
+        columns['video_id'].append(video['video_id'])
+        columns['title'].append(video.get('title'))
+        columns['published_at'].append(parse_published_at(video.get('published_at')))
+    return columns
+
+
+def srt_result_columns(srt_results):
+    """把 batch_request_srt 的结果列表转换为按列组织的数据"""
+    columns = {name: [] for name, _ in SRT_RESULT_FIELDS}
+    for record in srt_results:
+        result = record.get('request_result') or record.get('srt_request') or {}
+        columns['channel_id'].append(record.get('channel_id'))
+        columns['channel_name'].append(record.get('channel_name'))
+        columns['index'].append(record.get('index'))
+        columns['video_id'].append(record['video_id'])
+        columns['title'].append(record.get('title'))
+        columns['published_at'].append(parse_published_at(record.get('published_at')))
+        columns['success'].append(bool(result.get('success')))
+        columns['status_code'].append(result.get('status_code'))
+        columns['error'].append(result.get('error'))
+        # 提供方的原始响应保留为JSON字符串，避免嵌套结构导致schema不稳定
+        response = result.get('data', result.get('response'))
+        columns['response'].append(json.dumps(response, ensure_ascii=False) if response is not None else None)
+    return columns
+
+
+def _arrow_schema(fields):
+    """根据字段定义生成 pyarrow schema"""
+    import pyarrow as pa
+
+    type_map = {
+        'string': pa.string(),
+        'timestamp': pa.timestamp('ms', tz='UTC'),
+        'bool': pa.bool_(),
+        'int16': pa.int16(),
+        'int32': pa.int32(),
+    }
+    return pa.schema([(name, type_map[kind]) for name, kind in fields])
+
+
+def _pandas_frame(columns, fields):
+    """根据字段定义生成带类型的 pandas DataFrame"""
+    import pandas as pd
+
+    dtype_map = {
+        'string': 'string',
+        'timestamp': 'datetime64[ns, UTC]',
+        'bool': 'boolean',
+        'int16': 'Int16',
+        'int32': 'Int32',
+    }
+    frame = pd.DataFrame(columns)
+    for name, kind in fields:
+        if kind == 'timestamp':
+            frame[name] = pd.to_datetime(frame[name], utc=True)
+        else:
+            frame[name] = frame[name].astype(dtype_map[kind])
+    return frame
+
+
+def write_parquet(columns, fields, filename, compression=DEFAULT_COMPRESSION):
+    """
+    把按列组织的数据写入Parquet文件
+
+    Args:
+        columns: {字段名: 值列表}
+        fields: 字段定义列表 [(字段名, 类型)]
+        filename: 输出文件名
+        compression: 压缩算法 ('zstd', 'snappy', 'gzip', None)
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        table = pa.Table.from_pydict(columns, schema=_arrow_schema(fields))
+        pq.write_table(table, filename, compression=compression)
+        return
+
+    try:
+        frame = _pandas_frame(columns, fields)
+    except ImportError:
+        raise ImportError("导出Parquet需要安装 pyarrow 或 pandas: pip install pyarrow")
+    frame.to_parquet(filename, compression=compression, index=False)
+
+
+def read_parquet(filename, fields):
+    """
+    读取Parquet文件中 fields 定义的列
+
+    Returns:
+        {字段名: 值列表}，缺失值为None
+    """
+    names = [name for name, _ in fields]
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        pq = None
+
+    if pq is not None:
+        return pq.read_table(filename, columns=names).to_pydict()
+
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("读取Parquet需要安装 pyarrow 或 pandas: pip install pyarrow")
+    frame = pd.read_parquet(filename, columns=names)
+    frame = frame.astype(object).where(frame.notna(), None)
+    return {name: frame[name].tolist() for name in names}
+
+
+def save_videos_parquet(video_data, filename, compression=DEFAULT_COMPRESSION):
+    """把视频列表保存为Parquet文件"""
+    write_parquet(video_columns(video_data), VIDEO_FIELDS, filename, compression)
+
+
+def save_srt_results_parquet(srt_results, filename, compression=DEFAULT_COMPRESSION):
+    """把SRT请求结果保存为Parquet文件"""
+    write_parquet(srt_result_columns(srt_results), SRT_RESULT_FIELDS, filename, compression)
+
+
+DATASET_FILENAME = 'part-0.parquet'
+
+
+def append_to_dataset(records, dataset_root, channel_id, kind='videos', date=None,
+                      compression=DEFAULT_COMPRESSION):
+    """
+    把一批记录合并到按频道和日期分区的Parquet数据集
+
+    目录结构 (Hive风格分区，pyarrow.dataset / pandas / DuckDB 都能直接读取):
+        {dataset_root}/{kind}/channel_id={频道ID}/date={YYYY-MM-DD}/part-0.parquet
+
+    每个分区只有一个文件，去重键是 (kind, channel_id, date, video_id)：
+    同一天多次运行时与分区中已有的记录按 video_id 合并，同一视频以本次的记录为准，
+    不会重复写入；不同日期的分区是各自那天的快照，跨日期读取时按 (channel_id, video_id) 取最新日期。
+    旧版本写入的 part-{时间戳}.parquet 文件也会合并进来并删除。
+
+    Args:
+        records: 视频记录列表 (kind='videos') 或SRT结果列表 (kind='srt_results')
+        dataset_root: 数据集根目录
+        channel_id: 频道ID
+        kind: 'videos' 或 'srt_results'
+        date: 分区日期，默认为今天 (UTC)
+
+    Returns:
+        写入的文件路径，没有记录时返回None
+    """
+    if not records:
+        return None
+
+    if kind == 'videos':
+        columns, fields = video_columns(records), VIDEO_FIELDS
+    elif kind == 'srt_results':
+        columns, fields = srt_result_columns(records), SRT_RESULT_FIELDS
+    else:
+        raise ValueError(f"不支持的数据集类型: {kind}")
+
+    # 分区目录已经包含channel_id，文件内不再重复保存该列
+    if 'channel_id' in columns:
+        del columns['channel_id']
+        fields = [field for field in fields if field[0] != 'channel_id']
+
+    if date is None:
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    partition_dir = os.path.join(dataset_root, kind, f'channel_id={channel_id}', f'date={date}')
+    os.makedirs(partition_dir, exist_ok=True)
+
+    # 按 video_id 合并，已有的视频保持原来的位置，后写入的记录覆盖先写入的
+    existing_files = sorted(glob.glob(os.path.join(partition_dir, 'part-*.parquet')))
+    names = [name for name, _ in fields]
+    rows = {}
+    for existing in existing_files + [None]:
+        part = columns if existing is None else read_parquet(existing, fields)
+        for values in zip(*(part[name] for name in names)):
+            row = dict(zip(names, values))
+            rows[row['video_id']] = row
+    merged = {name: [row[name] for row in rows.values()] for name in names}
+
+    # 先写临时文件再替换，中途失败不会留下不完整的分区 (以 . 开头的文件读取数据集时会被忽略)
+    filename = os.path.join(partition_dir, DATASET_FILENAME)
+    temp_filename = os.path.join(partition_dir, f'.{DATASET_FILENAME}.tmp')
+    write_parquet(merged, fields, temp_filename, compression)
+    os.replace(temp_filename, filename)
+    for existing in existing_files:
+        if existing != filename:
+            os.remove(existing)
+    return filename
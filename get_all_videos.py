@@ -9,9 +9,20 @@ import os
 import requests
 import json
 import time
+import logging
 import gspread
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2.service_account import Credentials
-from youtube_video_fetcher import YouTubeVideoFetcher
+from youtube_video_fetcher import YouTubeVideoFetcher, BATCH_SIZE
+from pipeline_metrics import metrics
+from sheets_writeback import SheetsWriteback
+from catalogue_store import open_catalogue_store
+from subtitle_storage import open_subtitle_store
+from subtitle_search import open_search_index
+from structured_logging import setup_logging, ProgressLine
+from circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger('youtube_srt')
 
 # Google Sheets 配置
 GOOGLE_SHEETS_SCOPES = [
@@ -19,22 +30,41 @@ GOOGLE_SHEETS_SCOPES = [
     'https://www.googleapis.com/auth/drive.readonly'
 ]
 
-# SRT API 配置
-SRT_API_URL = 'https://lic.deepsrt.cc/webhook/get-srt-from-provider'
+# 回写结果时需要的读写权限
+GOOGLE_SHEETS_WRITE_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.readonly'
+]
+
+# SRT API 配置 (可通过环境变量 SRT_API_URL 指向本地替身服务)
+SRT_API_URL = os.getenv('SRT_API_URL', 'https://lic.deepsrt.cc/webhook/get-srt-from-provider')
+
+# SRT请求并发数 (run_planner.py 按同一个值估算耗时)
+SRT_CONCURRENCY = int(os.getenv('SRT_CONCURRENCY', 1))
+
+# 使用目录数据库时跳过视频数量没有变化的频道 (设为0时每次都完整获取)
+SKIP_UNCHANGED_CHANNELS = os.getenv('SKIP_UNCHANGED_CHANNELS', '1') != '0'
+
+# SRT服务熔断器 (阈值见 circuit_breaker.py 中的 SRT_BREAKER_* 环境变量)
+srt_breaker = CircuitBreaker.from_env('SRT服务')
+
+# Parquet数据集目录 (可选)，设置后每个频道的结果会按 video_id 合并到按频道/日期分区的数据集
+PARQUET_DATASET_DIR = os.getenv('PARQUET_DATASET_DIR')
 
 def get_api_key():
-    """从环境变量获取API密钥"""
-    api_key = os.getenv('YOUTUBE_API_KEY')
+    """从环境变量获取API密钥，YOUTUBE_API_KEYS（逗号分隔的多个密钥）优先于 YOUTUBE_API_KEY"""
+    api_key = os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY')
     if not api_key:
         print("❌ 请设置环境变量 YOUTUBE_API_KEY")
         print("设置方法:")
         print("  Linux/Mac: export YOUTUBE_API_KEY='你的API密钥'")
         print("  Windows: set YOUTUBE_API_KEY=你的API密钥")
         print("  PowerShell: $env:YOUTUBE_API_KEY='你的API密钥'")
+        print("  多个密钥轮换使用: export YOUTUBE_API_KEYS='密钥1,密钥2'")
         return None
     return api_key
 
-def get_google_credentials():
+def get_google_credentials(scopes=GOOGLE_SHEETS_SCOPES):
     """从环境变量或文件获取Google凭据"""
     # 方法1: 从环境变量获取服务账号JSON
     service_account_json = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
@@ -42,7 +72,7 @@ def get_google_credentials():
         try:
             service_account_info = json.loads(service_account_json)
             credentials = Credentials.from_service_account_info(
-                service_account_info, scopes=GOOGLE_SHEETS_SCOPES
+                service_account_info, scopes=scopes
             )
             return credentials
         except json.JSONDecodeError:
@@ -53,7 +83,7 @@ def get_google_credentials():
     if os.path.exists(service_account_file):
         try:
             credentials = Credentials.from_service_account_file(
-                service_account_file, scopes=GOOGLE_SHEETS_SCOPES
+                service_account_file, scopes=scopes
             )
             return credentials
         except Exception as e:
@@ -87,7 +117,8 @@ def read_channel_ids_from_sheets(spreadsheet_id, sheet_name="Sheet1", column_ran
         
         # 读取指定列的数据
         print(f"📋 正在读取工作表 '{sheet_name}' 的 {column_range} 列...")
-        values = worksheet.get(column_range)
+        with metrics.stage('sheet_read'):
+            values = worksheet.get(column_range)
         
         # 提取频道ID（过滤空值和标题行）
         channel_ids = []
@@ -122,6 +153,26 @@ def read_channel_ids_from_sheets(spreadsheet_id, sheet_name="Sheet1", column_ran
         print(f"❌ 读取Google Sheets失败: {e}")
         return None
 
+def open_sheets_writeback(spreadsheet_id, sheet_name="Sheet1", column_range="A:A"):
+    """打开工作表并创建结果回写器（需要服务账号有编辑权限）"""
+    try:
+        credentials = get_google_credentials(GOOGLE_SHEETS_WRITE_SCOPES)
+        if not credentials:
+            return None
+        
+        gc = gspread.authorize(credentials)
+        worksheet = gc.open_by_key(spreadsheet_id).worksheet(sheet_name)
+        return SheetsWriteback(worksheet, column_range)
+        
+    except Exception as e:
+        print(f"❌ 初始化Google Sheets回写失败: {e}")
+        return None
+
+def count_srt_results(srt_results):
+    """统计SRT请求的成功和失败数量"""
+    success_count = sum(1 for record in srt_results if record['request_result']['success'])
+    return success_count, len(srt_results) - success_count
+
 def get_channel_info(fetcher, channel_id):
     """获取频道基本信息"""
     try:
@@ -132,6 +183,27 @@ def get_channel_info(fetcher, channel_id):
 
 def request_srt_for_video(video_id, fetch_only=False):
     """为单个视频请求SRT字幕"""
+    # fetch_only=True 只查询缓存 (probe)，False 会触发生成 (generate)
+    # 熔断器打开时在这里等待服务恢复
+    ticket = srt_breaker.acquire()
+    start_time = time.monotonic()
+    with metrics.stage('srt_probe' if fetch_only else 'srt_generate') as stage:
+        result = _request_srt(video_id, fetch_only)
+        if not result['success']:
+            stage.mark_error(result.get('error_class', result['error']))
+    srt_breaker.record(ticket, not is_provider_failure(result), time.monotonic() - start_time)
+    metrics.increment('srt_requests_succeeded' if result['success'] else 'srt_requests_failed')
+    return result
+
+def is_provider_failure(result):
+    """是否是SRT服务本身的故障（超时、连接错误、5xx、429），单个视频的4xx错误不算"""
+    if result['success']:
+        return False
+    status_code = result.get('status_code')
+    return status_code is None or status_code >= 500 or status_code == 429
+
+def _request_srt(video_id, fetch_only):
+    """发送SRT请求，返回结果字典"""
     try:
         payload = {
             "youtube_id": video_id,
@@ -148,17 +220,34 @@ def request_srt_for_video(video_id, fetch_only=False):
         if response.status_code == 200:
             return {"success": True, "data": response.json(), "status_code": response.status_code}
         else:
-            return {"success": False, "error": f"HTTP {response.status_code}", "response": response.text}
+            return {"success": False, "error": f"HTTP {response.status_code}", "response": response.text,
+                    "status_code": response.status_code}
             
     except requests.exceptions.Timeout:
-        return {"success": False, "error": "请求超时"}
+        return {"success": False, "error": "请求超时", "error_class": "Timeout"}
     except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"请求异常: {str(e)}"}
+        return {"success": False, "error": f"请求异常: {str(e)}", "error_class": type(e).__name__}
     except Exception as e:
-        return {"success": False, "error": f"未知错误: {str(e)}"}
+        return {"success": False, "error": f"未知错误: {str(e)}", "error_class": type(e).__name__}
 
-def batch_request_srt(video_data, channel_info, max_requests=None, delay=1.0):
-    """批量请求所有视频的SRT字幕"""
+def batch_request_srt(video_data, channel_info, max_requests=None, delay=1.0, subtitle_store=None, concurrency=None,
+                      skip_video_ids=None):
+    """
+    批量请求所有视频的SRT字幕，传入 subtitle_store 时同时保存返回的字幕文本
+    
+    concurrency 大于1时用线程池并发请求（默认 SRT_CONCURRENCY），每个线程在请求之间各自等待 delay 秒，
+    结果仍按视频顺序处理；skip_video_ids 中的视频（已经成功请求过的）在 max_requests 范围内跳过
+    """
+    concurrency = concurrency or SRT_CONCURRENCY
+    if max_requests and video_data:
+        video_data = video_data[:max_requests]
+    if skip_video_ids and video_data:
+        pending = [video for video in video_data if video['video_id'] not in skip_video_ids]
+        if len(pending) < len(video_data):
+            print(f"⏭️  跳过 {len(video_data) - len(pending)} 个已经成功请求过SRT的视频")
+            if not pending:
+                return []
+        video_data = pending
     if not video_data:
         print("❌ 没有视频数据")
         return []
@@ -171,25 +260,28 @@ def batch_request_srt(video_data, channel_info, max_requests=None, delay=1.0):
     print(f"\n🚀 开始为频道 {channel_info['name']} 批量请求SRT字幕...")
     print(f"📊 总共需要处理 {total_videos} 个视频")
     print(f"⏱️  请求间隔: {delay} 秒")
+    if concurrency > 1:
+        print(f"🔀 并发数: {concurrency}")
     print("=" * 50)
     
     results = []
     success_count = 0
     fail_count = 0
     
-    for i, video in enumerate(video_data, 1):
+    progress = ProgressLine(total_videos, label=f"SRT {channel_info['name']}")
+    
+    def send_request(video):
+        result = request_srt_for_video(video['video_id'], fetch_only=False)
+        if concurrency > 1 and delay > 0:
+            time.sleep(delay)
+        return result
+    
+    # 发送请求 (并发时由线程池提前发出，这里按顺序取结果)
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    request_results = executor.map(send_request, video_data) if executor else map(send_request, video_data)
+    
+    for i, (video, result) in enumerate(zip(video_data, request_results), 1):
         video_id = video['video_id']
-        title = video['title'][:50] + "..." if len(video['title']) > 50 else video['title']
-        
-        print(f"\n[{i:3d}/{total_videos}] 处理视频: {title}")
-        print(f"Video ID: {video_id}")
-        print(f"Published At: {video['published_at']}")
-        
-        # 发送请求
-        result = request_srt_for_video(video_id, fetch_only=False)
-        
-        # 打印请求结果
-        print(f"Request Result: {result}")
         
         # 记录结果
         result_record = {
@@ -203,28 +295,111 @@ def batch_request_srt(video_data, channel_info, max_requests=None, delay=1.0):
         }
         results.append(result_record)
         
+        subtitle_saved = False
         if result['success']:
             success_count += 1
-            print(f"✅ 成功")
+            if subtitle_store:
+                try:
+                    subtitle_saved = subtitle_store.save_response(video_id, result['data'])
+                except Exception as e:
+                    logger.warning(f"保存字幕时出错: {video_id} - {e}", extra={'video_id': video_id})
         else:
             fail_count += 1
-            print(f"❌ 失败: {result['error']}")
         
-        # 显示进度
-        progress = (i / total_videos) * 100
-        print(f"📈 进度: {progress:.1f}% (成功:{success_count}, 失败:{fail_count})")
+        # 每个视频一行日志，不再输出完整的提供方响应
+        logger.log(
+            logging.INFO if result['success'] else logging.WARNING,
+            f"[{i}/{total_videos}] {video_id} {'成功' if result['success'] else '失败: ' + result['error']}",
+            extra={
+                'channel_id': channel_info['id'],
+                'index': i,
+                'video_id': video_id,
+                'success': result['success'],
+                'status_code': result.get('status_code'),
+                'error': result.get('error'),
+                'subtitle_saved': subtitle_saved,
+            }
+        )
+        
+        # 显示进度 (限速的单行状态)
+        progress.update(i, success_count, fail_count)
         
         # 延迟避免请求过于频繁
-        if i < total_videos:
+        if executor is None and i < total_videos:
             time.sleep(delay)
     
+    if executor:
+        executor.shutdown()
+    progress.finish(total_videos, success_count, fail_count)
+    
     print(f"\n✅ 频道 {channel_info['name']} SRT请求处理完成!")
     print(f"📊 统计: 成功 {success_count}, 失败 {fail_count}")
     
     return results
 
-def process_single_channel(fetcher, channel_id, max_videos=None, srt_mode=None):
-    """处理单个频道的所有视频"""
+def srt_pending(store, channel_id, srt_mode):
+    """目录中该频道是否还有本次 srt_mode 会处理、但还没有成功请求过SRT的视频"""
+    from run_planner import SRT_LIMITS
+
+    if srt_mode == 'skip':
+        return False
+    limit = SRT_LIMITS.get(srt_mode)
+    if limit is None:
+        return bool(store.videos_missing_srt(channel_id, limit=1))
+    done_ids = store.get_srt_done_ids(channel_id)
+    return any(video['video_id'] not in done_ids for video in store.get_channel_videos(channel_id, limit=limit))
+
+def precheck_unchanged_channels(fetcher, store, channel_ids, max_videos=None, srt_mode=None):
+    """
+    查询频道的视频数量 (每50个频道一次 channels.list)，与目录数据库中上次记录的数量比较
+    
+    只有同时满足以下条件的频道才跳过:
+    - API 返回的视频数量与上次处理时记录的 API 数量相同
+    - 上次运行的 max_videos 满足本次的 max_videos (上次用 max_videos 限制过、这次不限制或限制更大时需要重新获取)
+    - 没有本次 srt_mode 需要处理的、还没成功请求过SRT的视频 (失败的SRT请求需要重试)
+    
+    Returns:
+        (视频数量字典, 可以跳过的频道ID集合)
+    """
+    video_counts = fetcher.get_channel_video_counts(channel_ids)
+    stored = store.get_api_video_counts(channel_ids)
+    unchanged = set()
+    for channel_id, count in video_counts.items():
+        previous = stored.get(channel_id)
+        if count is None or previous is None or previous['api_video_count'] != count:
+            continue
+        # 只比较 API 返回的数量，列表中的视频数 (video_count) 会因私享/删除的视频和 videoCount 不同
+        previous_max = previous['api_max_videos']
+        if previous_max is not None and (max_videos is None or previous_max < max_videos):
+            continue
+        if srt_pending(store, channel_id, srt_mode):
+            continue
+        unchanged.add(channel_id)
+    if unchanged:
+        print(f"⏭️  {len(unchanged)}/{len(channel_ids)} 个频道没有变化，跳过获取视频列表")
+    return video_counts, unchanged
+
+def fetch_channels_async(fetcher, channel_ids, max_videos=None):
+    """用异步获取器在一个事件循环中并行获取多个频道的视频列表（需要安装 aiohttp），密钥和缓存与 fetcher 共用"""
+    import asyncio
+    from async_youtube_fetcher import AsyncYouTubeVideoFetcher
+
+    async def run():
+        async with AsyncYouTubeVideoFetcher(fetcher.key_pool or fetcher.api_key, lean=fetcher.lean,
+                                            http_cache=fetcher.http_cache) as async_fetcher:
+            return await async_fetcher.get_multiple_channel_videos(channel_ids, max_videos)
+
+    return asyncio.run(run())
+
+def process_single_channel(fetcher, channel_id, max_videos=None, srt_mode=None, store=None, subtitle_store=None,
+                           search_index=None, video_data=None):
+    """
+    处理单个频道的所有视频
+    
+    传入目录数据库 store 时，视频列表和SRT结果写入数据库而不是生成时间戳文件，
+    需要旧格式文件时用 catalogue_store.py export 导出；传入字幕存储 subtitle_store 时保存字幕文本，
+    再传入 search_index 时把新字幕增量加入全文索引；传入 video_data 时使用已经批量获取的视频列表
+    """
     print(f"\n{'='*60}")
     print(f"🎯 开始处理频道: {channel_id}")
     print(f"{'='*60}")
@@ -232,22 +407,23 @@ def process_single_channel(fetcher, channel_id, max_videos=None, srt_mode=None):
     # 获取频道信息
     channel_info = get_channel_info(fetcher, channel_id)
     
-    print(f"正在获取频道 {channel_id} 的视频...")
-    if max_videos:
-        print(f"限制获取最近 {max_videos} 个视频")
-    else:
-        print("获取所有视频（这可能需要较长时间）")
-    print("请耐心等待...\n")
-    
-    # 获取视频数据
-    try:
+    if video_data is None:
+        print(f"正在获取频道 {channel_id} 的视频...")
         if max_videos:
-            video_data = fetcher.get_channel_videos(channel_id, max_videos=max_videos)
+            print(f"限制获取最近 {max_videos} 个视频")
         else:
-            video_data = fetcher.get_channel_videos(channel_id)
-    except Exception as e:
-        print(f"❌ 获取频道视频时出错: {e}")
-        return None
+            print("获取所有视频（这可能需要较长时间）")
+        print("请耐心等待...\n")
+        
+        # 获取视频数据
+        try:
+            if max_videos:
+                video_data = fetcher.get_channel_videos(channel_id, max_videos=max_videos)
+            else:
+                video_data = fetcher.get_channel_videos(channel_id)
+        except Exception as e:
+            print(f"❌ 获取频道视频时出错: {e}")
+            return None
     
     if not video_data:
         print(f"❌ 频道 {channel_id} 未能获取到视频数据")
@@ -271,47 +447,69 @@ def process_single_channel(fetcher, channel_id, max_videos=None, srt_mode=None):
     safe_channel_name = channel_info['name'].replace(' ', '_').replace('/', '_').replace('\\', '_')
     timestamp = int(time.time())
     
-    print(f"\n💾 保存文件...")
-    try:
-        fetcher.save_to_file(video_data, f'{safe_channel_name}_all_video_ids_{timestamp}.txt', 'txt')
-        fetcher.save_to_file(video_data, f'{safe_channel_name}_all_videos_{timestamp}.json', 'json')
-        fetcher.save_to_file(video_data, f'{safe_channel_name}_all_videos_{timestamp}.csv', 'csv')
-        
-        print("✅ 数据已保存为:")
-        print(f"- {safe_channel_name}_all_video_ids_{timestamp}.txt (纯视频ID列表)")
-        print(f"- {safe_channel_name}_all_videos_{timestamp}.json (完整JSON数据)")
-        print(f"- {safe_channel_name}_all_videos_{timestamp}.csv (CSV表格格式)")
-    except Exception as e:
-        print(f"⚠️  保存文件时出错: {e}")
+    if store:
+        # 写入目录数据库，不再生成时间戳文件
+        try:
+            store.upsert_channel(channel_info, len(video_data))
+            store.upsert_videos(channel_id, video_data)
+            print(f"\n💾 已写入目录数据库: {store.db_path}")
+        except Exception as e:
+            print(f"⚠️  写入目录数据库时出错: {e}")
+    else:
+        print(f"\n💾 保存文件...")
+        try:
+            fetcher.save_to_file(video_data, f'{safe_channel_name}_all_video_ids_{timestamp}.txt', 'txt')
+            fetcher.save_to_file(video_data, f'{safe_channel_name}_all_videos_{timestamp}.json', 'json')
+            fetcher.save_to_file(video_data, f'{safe_channel_name}_all_videos_{timestamp}.csv', 'csv')
+            
+            print("✅ 数据已保存为:")
+            print(f"- {safe_channel_name}_all_video_ids_{timestamp}.txt (纯视频ID列表)")
+            print(f"- {safe_channel_name}_all_videos_{timestamp}.json (完整JSON数据)")
+            print(f"- {safe_channel_name}_all_videos_{timestamp}.csv (CSV表格格式)")
+        except Exception as e:
+            print(f"⚠️  保存文件时出错: {e}")
     
     # 显示前3个视频作为预览
     print(f"\n🔍 最新3个视频预览:")
     for i, video in enumerate(video_data[:3], 1):
         print(f"{i}. {video['title']} ({video['published_at'][:10]})")
     
-    # SRT字幕请求
+    # SRT字幕请求 (使用目录数据库时跳过已经成功请求过的视频)
     srt_results = []
+    srt_done_ids = store.get_srt_done_ids(channel_id) if store else None
     if srt_mode == 'all':
-        srt_results = batch_request_srt(video_data, channel_info)
+        srt_results = batch_request_srt(video_data, channel_info, subtitle_store=subtitle_store,
+                                        skip_video_ids=srt_done_ids)
     elif srt_mode == 'test':
-        srt_results = batch_request_srt(video_data, channel_info, max_requests=10)
+        srt_results = batch_request_srt(video_data, channel_info, max_requests=10, subtitle_store=subtitle_store,
+                                        skip_video_ids=srt_done_ids)
     elif srt_mode == 'limited':
-        srt_results = batch_request_srt(video_data, channel_info, max_requests=50)
+        srt_results = batch_request_srt(video_data, channel_info, max_requests=50, subtitle_store=subtitle_store,
+                                        skip_video_ids=srt_done_ids)
     elif srt_mode == 'ask':
         print(f"\n{'='*50}")
         srt_choice = input(f"是否要为频道 {channel_info['name']} 的 {len(video_data)} 个视频请求SRT字幕？\n1. 是，处理所有视频\n2. 是，但只处理前10个视频(测试)\n3. 是，但只处理前50个视频\n4. 否，跳过\n请选择 (1-4): ").strip()
         
         if srt_choice == '1':
-            srt_results = batch_request_srt(video_data, channel_info)
+            srt_results = batch_request_srt(video_data, channel_info, subtitle_store=subtitle_store,
+                                            skip_video_ids=srt_done_ids)
         elif srt_choice == '2':
-            srt_results = batch_request_srt(video_data, channel_info, max_requests=10)
+            srt_results = batch_request_srt(video_data, channel_info, max_requests=10, subtitle_store=subtitle_store,
+                                            skip_video_ids=srt_done_ids)
         elif srt_choice == '3':
-            srt_results = batch_request_srt(video_data, channel_info, max_requests=50)
+            srt_results = batch_request_srt(video_data, channel_info, max_requests=50, subtitle_store=subtitle_store,
+                                            skip_video_ids=srt_done_ids)
         else:
             print("跳过SRT字幕请求")
     
     # 保存SRT结果
-    if srt_results:
+    if srt_results and store:
+        try:
+            store.upsert_srt_results(srt_results)
+            print(f"💾 SRT请求结果已写入目录数据库: {store.db_path}")
+        except Exception as e:
+            print(f"⚠️  写入SRT结果时出错: {e}")
+    elif srt_results:
         srt_filename = f'{safe_channel_name}_srt_results_{timestamp}.json'
         try:
             with open(srt_filename, 'w', encoding='utf-8') as f:
@@ -320,6 +518,24 @@ def process_single_channel(fetcher, channel_id, max_videos=None, srt_mode=None):
         except Exception as e:
             print(f"⚠️  保存SRT结果时出错: {e}")
     
+    # 把新保存的字幕加入全文索引
+    if subtitle_store and search_index and srt_results:
+        try:
+            indexed = search_index.update_from_store(subtitle_store)
+            print(f"🔍 已索引 {indexed} 个视频的字幕")
+        except Exception as e:
+            print(f"⚠️  更新字幕索引时出错: {e}")
+    
+    # 写入Parquet数据集 (同一天重复运行时按 video_id 去重)
+    if PARQUET_DATASET_DIR:
+        try:
+            from columnar_export import append_to_dataset
+            append_to_dataset(video_data, PARQUET_DATASET_DIR, channel_id, 'videos')
+            append_to_dataset(srt_results, PARQUET_DATASET_DIR, channel_id, 'srt_results')
+            print(f"💾 已写入Parquet数据集: {PARQUET_DATASET_DIR}")
+        except Exception as e:
+            print(f"⚠️  写入Parquet数据集时出错: {e}")
+    
     return {
         'channel_info': channel_info,
         'video_data': video_data,
@@ -367,59 +583,167 @@ def process_multiple_channels_from_sheets():
     srt_mode_map = {'1': 'ask', '2': 'skip', '3': 'all', '4': 'test', '5': 'limited'}
     srt_mode = srt_mode_map.get(srt_mode_choice, 'ask')
     
+    # 是否回写结果到Google Sheets
+    writeback_choice = input("\n是否将每个频道的处理结果回写到Google Sheets? (需要编辑权限) (y/n, 默认n): ").strip().lower()
+    enable_writeback = writeback_choice in ['y', 'yes', '是']
+    
+    # 初始化YouTube获取器
+    fetcher = YouTubeVideoFetcher(API_KEY)
+    
+    # 目录数据库 (设置了 CATALOGUE_DB_PATH 时启用)
+    store = open_catalogue_store()
+    if store:
+        print(f"🗄️  使用目录数据库: {store.db_path}")
+    
+    # 运行计划：估算配额和耗时，配额不够时只处理其中一天的频道
+    plan_choice = input("\n是否先估算API配额和耗时 (dry-run)? (y/n, 默认n): ").strip().lower()
+    if plan_choice in ['y', 'yes', '是']:
+        from run_planner import build_plan, print_plan
+        plan = build_plan(fetcher, channel_ids, store, max_videos=max_videos, srt_mode=srt_mode,
+                          srt_concurrency=SRT_CONCURRENCY)
+        print_plan(plan)
+        if not plan['fits_in_one_day']:
+            day_choice = input(f"\n本次处理第几天的频道? (1-{len(plan['days'])}, 默认1): ").strip() or '1'
+            try:
+                channel_ids = plan['days'][int(day_choice) - 1]['channels']
+            except (ValueError, IndexError):
+                channel_ids = plan['days'][0]['channels']
+            print(f"📅 本次处理 {len(channel_ids)} 个频道")
+    
     # 确认开始处理
     print(f"\n🚀 准备开始批量处理:")
     print(f"- 频道数量: {len(channel_ids)}")
     print(f"- 视频模式: {'所有视频' if not max_videos else f'最近{max_videos}个视频'}")
     print(f"- SRT模式: {srt_mode}")
+    print(f"- 结果回写: {'是' if enable_writeback else '否'}")
     
     confirm = input("\n确认开始处理? (y/n): ").strip().lower()
     if confirm not in ['y', 'yes', '是']:
         print("操作已取消")
+        if store:
+            store.close()
         return
     
-    # 初始化YouTube获取器
-    fetcher = YouTubeVideoFetcher(API_KEY)
-    
-    # 处理所有频道
-    all_results = []
+    # 字幕存储 (设置了 SUBTITLE_STORE_DIR 时启用)
+    subtitle_store = open_subtitle_store()
+    if subtitle_store:
+        print(f"🗄️  字幕保存目录: {subtitle_store.root}")
+    search_index = open_search_index()
+    
+    # 初始化结果回写器
+    writeback = None
+    if enable_writeback:
+        writeback = open_sheets_writeback(spreadsheet_id, sheet_name, column_range)
+        if not writeback:
+            print("⚠️  无法回写结果，将只保存本地汇总报告")
+    
+    # 处理所有频道 (每个频道只保留汇总需要的统计，视频列表和SRT结果处理完即释放)
+    channel_summaries = []
     total_channels = len(channel_ids)
     failed_channels = []
     
+    skipped_channels = []
+    
     start_time = time.time()
+    prefetched = {}
+    video_counts = {}
+    unchanged = set()
     
     for i, channel_id in enumerate(channel_ids, 1):
+        # 每50个频道用批量HTTP请求一起获取视频列表
+        if (i - 1) % BATCH_SIZE == 0:
+            chunk = channel_ids[i - 1:i - 1 + BATCH_SIZE]
+            
+            # 预检查：一次 channels.list 查询这50个频道的视频数量，与上次处理时相同的频道直接跳过
+            video_counts, unchanged = {}, set()
+            if store and SKIP_UNCHANGED_CHANNELS:
+                video_counts, unchanged = precheck_unchanged_channels(fetcher, store, chunk, max_videos, srt_mode)
+            to_fetch = [cid for cid in chunk if cid not in unchanged]
+            
+            if to_fetch:
+                print(f"\n📦 批量获取第 {i}-{i - 1 + len(chunk)} 个频道中 {len(to_fetch)} 个频道的视频列表...")
+                try:
+                    if os.getenv('YOUTUBE_ASYNC_FETCH') == '1':
+                        prefetched = fetch_channels_async(fetcher, to_fetch, max_videos)
+                    else:
+                        prefetched = fetcher.get_multiple_channel_videos(to_fetch, max_videos)
+                except Exception as e:
+                    print(f"⚠️  批量获取失败，将逐个频道获取: {e}")
+                    prefetched = {}
+        
+        if channel_id in unchanged:
+            # 跳过的频道也写入汇总和回写，数据取自目录数据库
+            skipped_channels.append(channel_id)
+            channel = store.get_channel(channel_id)
+            channel_summaries.append({
+                'channel_info': {'id': channel_id, 'name': channel['channel_name']},
+                'video_count': channel['video_count'],
+                'srt_request_count': 0,
+                'skipped': True
+            })
+            if writeback:
+                # 和处理过的频道一样，srt_success/srt_failed 是本次运行的数量，跳过的频道没有请求SRT
+                writeback.record(channel_id, channel['video_count'], 0, 0)
+            continue
+        
         print(f"\n{'🚀' * 3} 正在处理频道 {i}/{total_channels}: {channel_id} {'🚀' * 3}")
         
         try:
-            result = process_single_channel(fetcher, channel_id, max_videos, srt_mode)
+            # 批量获取失败的频道 (None) 由 process_single_channel 单独重试
+            video_data = prefetched.pop(channel_id, None)
+            result = process_single_channel(fetcher, channel_id, max_videos, srt_mode, store, subtitle_store,
+                                            search_index, video_data=video_data)
             if result:
-                all_results.append(result)
+                if store and video_counts.get(channel_id) is not None:
+                    store.set_api_video_count(channel_id, video_counts[channel_id], max_videos)
+                channel_summaries.append({
+                    'channel_info': result['channel_info'],
+                    'video_count': len(result['video_data']),
+                    'srt_request_count': len(result['srt_results'])
+                })
                 print(f"✅ 频道 {channel_id} 处理成功")
+                if writeback:
+                    srt_success, srt_failed = count_srt_results(result['srt_results'])
+                    writeback.record(channel_id, len(result['video_data']), srt_success, srt_failed)
             else:
                 failed_channels.append(channel_id)
                 print(f"❌ 频道 {channel_id} 处理失败")
+                if writeback:
+                    writeback.record(channel_id, error='未能获取到视频数据')
             
-            # 频道间延迟，避免API限制
-            if i < total_channels:
+            # 频道间延迟，避免API限制 (视频列表已批量获取时不需要)
+            if i < total_channels and video_data is None:
                 delay_seconds = 5
                 print(f"\n⏱️  等待{delay_seconds}秒后处理下一个频道...")
                 time.sleep(delay_seconds)
                 
         except KeyboardInterrupt:
-            print(f"\n⚠️  用户中断操作，已处理 {len(all_results)} 个频道")
+            print(f"\n⚠️  用户中断操作，已处理 {len(channel_summaries)} 个频道")
             break
         except Exception as e:
             print(f"❌ 处理频道 {channel_id} 时出错: {e}")
             failed_channels.append(channel_id)
+            if writeback:
+                writeback.record(channel_id, error=str(e))
             continue
     
+    # 提交剩余的回写结果
+    if writeback:
+        writeback.flush()
+    
+    if store:
+        store.close()
+    if subtitle_store:
+        subtitle_store.close()
+    if search_index:
+        search_index.close()
+    
     # 计算处理时间
     end_time = time.time()
     processing_time = end_time - start_time
     
     # 保存汇总结果
-    if all_results or failed_channels:
+    if channel_summaries or failed_channels or skipped_channels:
         timestamp = int(time.time())
         summary_filename = f'multi_channel_summary_{timestamp}.json'
         
@@ -427,9 +751,11 @@ def process_multiple_channels_from_sheets():
             'timestamp': timestamp,
             'processing_time_seconds': processing_time,
             'total_channels_found': total_channels,
-            'total_channels_processed': len(all_results),
+            'total_channels_processed': len(channel_summaries) - len(skipped_channels),
             'total_channels_failed': len(failed_channels),
             'failed_channels': failed_channels,
+            'total_channels_skipped': len(skipped_channels),
+            'skipped_channels': skipped_channels,
             'settings': {
                 'max_videos': max_videos,
                 'srt_mode': srt_mode,
@@ -443,19 +769,35 @@ def process_multiple_channels_from_sheets():
         total_videos = 0
         total_srt_requests = 0
         
-        for result in all_results:
-            channel_summary = {
-                'channel_info': result['channel_info'],
-                'video_count': len(result['video_data']),
-                'srt_request_count': len(result['srt_results'])
-            }
+        for channel_summary in channel_summaries:
             summary['channels'].append(channel_summary)
-            total_videos += len(result['video_data'])
-            total_srt_requests += len(result['srt_results'])
+            total_videos += channel_summary['video_count']
+            total_srt_requests += channel_summary['srt_request_count']
         
         summary['total_videos'] = total_videos
         summary['total_srt_requests'] = total_srt_requests
         
+        # SRT服务熔断器各状态的累计时间
+        summary['srt_circuit'] = srt_breaker.summary()
+        
+        # 条件请求缓存的命中情况
+        if fetcher.http_cache:
+            summary['http_cache'] = fetcher.http_cache.stats()
+        
+        # 多个API密钥时记录每个密钥的配额使用情况
+        if fetcher.key_pool:
+            summary['api_keys'] = fetcher.key_pool.usage()
+        
+        # 运行指标 (设置了 PIPELINE_METRICS=1 时)
+        if metrics.enabled:
+            summary['metrics'] = metrics.to_json()
+            metrics_filename = os.getenv('PIPELINE_METRICS_FILE', f'pipeline_metrics_{timestamp}.prom')
+            try:
+                metrics.save(metrics_filename)
+                print(f"📈 运行指标已保存到: {metrics_filename}")
+            except Exception as e:
+                print(f"⚠️  保存运行指标时出错: {e}")
+        
         try:
             with open(summary_filename, 'w', encoding='utf-8') as f:
                 json.dump(summary, f, ensure_ascii=False, indent=2)
@@ -466,11 +808,17 @@ def process_multiple_channels_from_sheets():
         print(f"\n{'='*60}")
         print("🎉 批量处理完成!")
         print(f"📊 最终统计:")
-        print(f"   - 处理频道数: {len(all_results)}/{total_channels}")
-        print(f"   - 成功频道数: {len(all_results)}")
+        print(f"   - 处理频道数: {len(channel_summaries) - len(skipped_channels)}/{total_channels}")
+        print(f"   - 成功频道数: {len(channel_summaries)}")
         print(f"   - 失败频道数: {len(failed_channels)}")
+        if skipped_channels:
+            print(f"   - 未变化跳过: {len(skipped_channels)}")
         print(f"   - 总视频数: {total_videos}")
         print(f"   - 总SRT请求数: {total_srt_requests}")
+        if summary['srt_circuit']['times_opened']:
+            circuit = summary['srt_circuit']
+            print(f"   - SRT熔断: 打开 {circuit['times_opened']} 次，"
+                  f"暂停 {circuit['seconds_in_state']['open']/60:.1f} 分钟，暂缓 {circuit['parked_calls']} 个请求")
         print(f"   - 处理时间: {processing_time/60:.1f} 分钟")
         
         if failed_channels:
@@ -518,7 +866,16 @@ def process_single_channel_mode():
     fetcher = YouTubeVideoFetcher(API_KEY)
     
     # 处理频道
-    result = process_single_channel(fetcher, channel_id, max_videos, 'ask')
+    store = open_catalogue_store()
+    subtitle_store = open_subtitle_store()
+    search_index = open_search_index()
+    result = process_single_channel(fetcher, channel_id, max_videos, 'ask', store, subtitle_store, search_index)
+    if store:
+        store.close()
+    if subtitle_store:
+        subtitle_store.close()
+    if search_index:
+        search_index.close()
     
     if result:
         print("\n🎉 操作完成!")
@@ -546,6 +903,8 @@ def show_usage_help():
     print("3. 或使用浏览器开发者工具查看页面源码")
 
 if __name__ == "__main__":
+    setup_logging()
+    
     print("🎬 YouTube频道完整数据获取工具 + SRT字幕请求")
     print("📊 支持单频道处理和多频道批量处理 (从Google Sheets读取)")
     print("🔑 使用环境变量获取API密钥和凭据\n")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube Data API 条件请求缓存 (ETag / If-None-Match)
+API响应带有 etag，缓存上次的响应后，下次请求同一页时带上 If-None-Match：
+内容没有变化时API返回 304 Not Modified（没有响应体），直接使用缓存的响应。
+重复同步没有变化的频道和页面时几乎不产生下载流量和解析开销（304 仍然消耗API配额）。
+
+缓存保存在SQLite数据库中，按去掉API密钥的请求URI索引，多个密钥共用同一份缓存。
+
+环境变量:
+    YOUTUBE_HTTP_CACHE  缓存数据库路径，设置后 YouTubeVideoFetcher 默认启用缓存
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from pipeline_metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key  TEXT PRIMARY KEY,
+    etag       TEXT NOT NULL,
+    body       TEXT NOT NULL,
+    stored_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_stored_at ON responses(stored_at);
+"""
+
+# 不参与缓存键的查询参数
+IGNORED_PARAMS = ('key', 'quotaUser')
+
+
+def cache_key_for(uri: str) -> str:
+    """去掉API密钥等参数并排序查询参数，得到请求的缓存键"""
+    parts = urlsplit(uri)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+class EtagCache:
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def close(self):
+        self.conn.close()
+
+    def prepare(self, request) -> str:
+        """
+        为尚未发送的请求加上 If-None-Match 头（有缓存时）
+
+        Returns:
+            缓存键，收到响应后传给 store() 或 load()
+        """
+        cache_key = cache_key_for(request.uri)
+        etag = self.etag_for(cache_key)
+        if etag:
+            request.headers['If-None-Match'] = etag
+        return cache_key
+
+    def etag_for(self, cache_key: str):
+        """缓存的 etag（已加引号，可直接用作 If-None-Match），没有缓存时返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT etag FROM responses WHERE cache_key = ?', (cache_key,)).fetchone()
+        return row[0] if row else None
+
+    def store(self, cache_key: str, response: dict):
+        """保存带 etag 的响应"""
+        etag = response.get('etag') if isinstance(response, dict) else None
+        if not etag:
+            return
+        self.misses += 1
+        metrics.increment('http_cache_misses')
+        body = json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO responses (cache_key, etag, body, stored_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    etag = excluded.etag, body = excluded.body, stored_at = excluded.stored_at
+                """,
+                (cache_key, _quote(etag), body, time.time())
+            )
+
+    def load(self, cache_key: str):
+        """收到 304 时取出缓存的响应，缓存已被清除时返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT body FROM responses WHERE cache_key = ?', (cache_key,)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        self.bytes_saved += len(row[0])
+        metrics.increment('http_cache_hits')
+        return json.loads(row[0])
+
+    def discard(self, cache_key: str):
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM responses WHERE cache_key = ?', (cache_key,))
+
+    def prune(self, max_age_seconds: float) -> int:
+        """删除超过指定时间没有更新的缓存，返回删除的数量"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute('DELETE FROM responses WHERE stored_at < ?', (time.time() - max_age_seconds,))
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'bytes_saved': self.bytes_saved}
+
+
+def _quote(etag: str) -> str:
+    """响应体中的 etag 不带引号，If-None-Match 头需要带引号的值"""
+    return etag if etag.startswith(('"', 'W/')) else f'"{etag}"'
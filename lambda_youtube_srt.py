@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 Amazon Lambda Function: 获取YouTube频道所有视频并请求SRT字幕
+
+除了单个 channel_id，也接受批量事件 (channel_ids、video_ids、SQS的 Records)，
+一次调用处理多个频道或几百个视频，返回 batchItemFailures 以便只重试失败的条目
 """
 
 import os
@@ -9,17 +12,44 @@ import json
 import requests
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from youtube_video_fetcher import YouTubeVideoFetcher
+from pipeline_metrics import metrics
+from subtitle_storage import is_cache_miss
 
 # 配置日志
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# SRT API 配置
-SRT_API_URL = 'https://lic.deepsrt.cc/webhook/get-srt-from-provider'
+# SRT API 配置 (可通过环境变量 SRT_API_URL 指向本地替身服务)
+SRT_API_URL = os.getenv('SRT_API_URL', 'https://lic.deepsrt.cc/webhook/get-srt-from-provider')
+
+# 模块级的HTTP会话：同一次调用的所有请求、以及同一个热容器的后续调用复用连接 (TLS握手只做一次)
+SRT_CONCURRENCY = int(os.getenv('SRT_CONCURRENCY', 1))
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=max(10, SRT_CONCURRENCY)))
+_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=max(10, SRT_CONCURRENCY)))
+
+# 单个SRT请求的超时（秒）
+SRT_TIMEOUT = 30
+# 预留时间之外的余量（毫秒），用于记录结果和返回
+TIME_MARGIN_MS = 5000
+
+_fetchers = {}
 
 def request_srt_for_video(video_id, fetch_only=False):
     """为单个视频请求SRT字幕"""
+    # fetch_only=True 只查询缓存 (probe)，False 会触发生成 (generate)
+    with metrics.stage('srt_probe' if fetch_only else 'srt_generate') as stage:
+        result = _request_srt(video_id, fetch_only)
+        if not result['success']:
+            stage.mark_error(result.get('error_class', result['error']))
+    metrics.increment('srt_requests_succeeded' if result['success'] else 'srt_requests_failed')
+    return result
+
+def _request_srt(video_id, fetch_only):
+    """发送SRT请求，返回结果字典"""
     try:
         payload = {
             "youtube_id": video_id,
@@ -30,7 +60,7 @@ def request_srt_for_video(video_id, fetch_only=False):
             'Content-Type': 'application/json'
         }
         
-        response = requests.post(SRT_API_URL, headers=headers, json=payload, timeout=30)
+        response = _session.post(SRT_API_URL, headers=headers, json=payload, timeout=SRT_TIMEOUT)
         
         if response.status_code == 200:
             return {
@@ -46,11 +76,208 @@ def request_srt_for_video(video_id, fetch_only=False):
             }
             
     except requests.exceptions.Timeout:
-        return {"success": False, "error": "请求超时"}
+        return {"success": False, "error": "请求超时", "error_class": "Timeout"}
     except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"请求异常: {str(e)}"}
+        return {"success": False, "error": f"请求异常: {str(e)}", "error_class": type(e).__name__}
     except Exception as e:
-        return {"success": False, "error": f"未知错误: {str(e)}"}
+        return {"success": False, "error": f"未知错误: {str(e)}", "error_class": type(e).__name__}
+
+def get_fetcher(api_key):
+    """YouTube视频获取器，同一个热容器的多次调用共用（API资源对象和发现文档只创建一次）"""
+    fetcher = _fetchers.get(api_key)
+    if fetcher is None:
+        fetcher = _fetchers[api_key] = YouTubeVideoFetcher(api_key)
+    return fetcher
+
+def probe_then_generate(video_id):
+    """先只查询缓存，没有缓存时再触发生成 (与 generate_srt_scripts.py 生成的脚本相同)"""
+    result = request_srt_for_video(video_id, fetch_only=True)
+    if result['success'] and not is_cache_miss(result['data']):
+        return result
+    return request_srt_for_video(video_id, fetch_only=False)
+
+def time_reserve_ms(fetch_only=False, probe=False, delay=0.0):
+    """
+    处理一个视频最坏情况下需要的时间（毫秒）
+
+    先查询缓存再生成时一个视频最多两个请求，每个请求最长 SRT_TIMEOUT 秒，之后还要等待 delay 秒
+    """
+    requests_per_video = 2 if probe and not fetch_only else 1
+    return int((requests_per_video * SRT_TIMEOUT + delay) * 1000) + TIME_MARGIN_MS
+
+def request_srt_batch(video_ids, context=None, fetch_only=False, probe=False, delay=0.0, concurrency=None):
+    """
+    为一批视频请求SRT字幕，所有请求共用模块级的HTTP会话
+
+    剩余执行时间不足以处理一个视频的最坏情况 (time_reserve_ms) 时不再发送新请求，
+    避免超过Lambda的执行时限导致整次调用失败，这些视频的结果为
+    {"success": False, "error": "执行时间不足", "skipped": True}
+
+    Args:
+        video_ids: 视频ID列表
+        context: Lambda上下文，用于检查剩余执行时间
+        fetch_only: 只查询缓存
+        probe: 先只查询缓存，没有缓存时再生成
+        delay: 每个线程在请求之间等待的秒数
+        concurrency: 并发请求数，默认 SRT_CONCURRENCY
+
+    Returns:
+        {视频ID: 结果字典}
+    """
+    reserve_ms = time_reserve_ms(fetch_only, probe, delay)
+
+    def request(video_id):
+        if context and context.get_remaining_time_in_millis() < reserve_ms:
+            return video_id, {"success": False, "error": "执行时间不足", "skipped": True}
+        result = probe_then_generate(video_id) if probe and not fetch_only \
+            else request_srt_for_video(video_id, fetch_only=fetch_only)
+        if delay > 0:
+            time.sleep(delay)
+        return video_id, result
+
+    concurrency = max(1, min(concurrency or SRT_CONCURRENCY, len(video_ids) or 1))
+    if concurrency == 1:
+        return dict(map(request, video_ids))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(executor.map(request, video_ids))
+
+def parse_video_ids(value):
+    """视频ID列表，也接受 video_ids.txt 的内容 (每行一个ID，空行和 # 开头的行忽略)"""
+    if isinstance(value, str):
+        value = value.splitlines()
+    return [video_id.strip() for video_id in value if video_id.strip() and not video_id.strip().startswith('#')]
+
+def parse_record(record):
+    """
+    SQS消息的内容: {"channel_id": ...}、{"video_id": ...}、{"video_ids": [...]} 或单个视频ID的纯文本
+
+    Returns:
+        (频道ID列表, 视频ID列表)
+    """
+    body = record.get('body', '')
+    try:
+        message = json.loads(body)
+    except ValueError:
+        message = body
+    if isinstance(message, str):
+        return [], parse_video_ids(message)
+    if not isinstance(message, dict):
+        raise ValueError(f"无法识别的消息内容: {body[:100]}")
+    channel_ids = message.get('channel_ids') or ([message['channel_id']] if message.get('channel_id') else [])
+    video_ids = parse_video_ids(message.get('video_ids') or ([message['video_id']] if message.get('video_id') else []))
+    if not channel_ids and not video_ids:
+        raise ValueError(f"消息中没有 channel_id 或 video_id: {body[:100]}")
+    return channel_ids, video_ids
+
+def handle_batch(event, context):
+    """
+    批量事件: 一次调用处理多个频道 / 视频
+
+    支持的输入格式:
+    {"channel_ids": ["UC...", ...], "max_videos": null}
+    {"video_ids": ["abc...", ...]}          // 也可以是 video_ids.txt 的内容
+    {"Records": [{"messageId": "...", "body": "{\"channel_id\": \"UC...\"}"}, ...]}   // SQS事件
+    公共参数: delay (默认0)、fetch_only、probe (默认true，先查询缓存)、concurrency
+
+    返回值中的 batchItemFailures 列出失败的条目 (SQS消息ID、频道ID或视频ID)，
+    body 中的 retry_event 可以直接作为下一次调用的事件，只重试失败的频道和视频
+    """
+    max_videos = event.get('max_videos')
+    options = {
+        'fetch_only': event.get('fetch_only', False),
+        'probe': event.get('probe', True),
+        'delay': event.get('delay', 0.0),
+        'concurrency': event.get('concurrency'),
+    }
+
+    # 条目标识 -> (频道ID列表, 视频ID列表)
+    items = {}
+    failures = {}   # 保持顺序的集合
+    if 'Records' in event:
+        for record in event['Records']:
+            try:
+                items[record['messageId']] = parse_record(record)
+            except ValueError as e:
+                logger.warning(f"❌ 消息 {record.get('messageId')} 格式错误: {e}")
+                failures[record['messageId']] = True
+    else:
+        for channel_id in event.get('channel_ids') or []:
+            items[channel_id] = ([channel_id], [])
+        for video_id in parse_video_ids(event.get('video_ids') or []):
+            items[video_id] = ([], [video_id])
+
+    # 获取所有频道的视频列表
+    channel_videos = {}
+    channel_ids = list(dict.fromkeys(channel_id for ids, _ in items.values() for channel_id in ids))
+    if channel_ids:
+        youtube_api_key = os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY')
+        if not youtube_api_key:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({
+                    'error': 'Missing YouTube API key in environment variables'
+                }, ensure_ascii=False)
+            }
+        channel_videos = get_fetcher(youtube_api_key).get_multiple_channel_videos(
+            channel_ids, max_videos=max_videos, ids_only=True
+        )
+
+    # 所有视频一起请求SRT (去重)
+    video_ids = []
+    for ids, direct_video_ids in items.values():
+        video_ids.extend(direct_video_ids)
+        for channel_id in ids:
+            video_ids.extend(video['video_id'] for video in channel_videos.get(channel_id) or [])
+    video_ids = list(dict.fromkeys(video_ids))
+    logger.info(f"批量处理: {len(items)} 个条目，{len(channel_ids)} 个频道，{len(video_ids)} 个视频")
+    srt_results = request_srt_batch(video_ids, context, **options)
+
+    failed_channels = [channel_id for channel_id in channel_ids if channel_videos.get(channel_id) is None]
+    failed_videos = [video_id for video_id, result in srt_results.items() if not result['success']]
+    failed_video_set = set(failed_videos)
+    item_results = {}
+    for item_id, (ids, direct_video_ids) in items.items():
+        item_video_ids = list(direct_video_ids)
+        for channel_id in ids:
+            item_video_ids.extend(video['video_id'] for video in channel_videos.get(channel_id) or [])
+        failed = [video_id for video_id in item_video_ids if video_id in failed_video_set]
+        failed_item_channels = [channel_id for channel_id in ids if channel_id in failed_channels]
+        item_results[item_id] = {
+            'videos': len(item_video_ids),
+            'failed_videos': failed,
+            'failed_channels': failed_item_channels,
+        }
+        if failed or failed_item_channels:
+            failures[item_id] = True
+
+    success_count = len(video_ids) - len(failed_videos)
+    response_data = {
+        'items': len(items),
+        'total_channels': len(channel_ids),
+        'total_videos': len(video_ids),
+        'success_count': success_count,
+        'fail_count': len(failed_videos),
+        'skipped_count': sum(1 for result in srt_results.values() if result.get('skipped')),
+        'success_rate': f"{(success_count / len(video_ids)) * 100:.1f}%" if video_ids else "0.0%",
+        'item_results': item_results,
+        'retry_event': {'channel_ids': failed_channels, 'video_ids': failed_videos}
+                       if failed_channels or failed_videos else None,
+        'results': [
+            {'video_id': video_id, 'srt_request': result} for video_id, result in srt_results.items()
+        ],
+    }
+    if metrics.enabled:
+        response_data['metrics'] = metrics.to_json()
+
+    logger.info(f"批量处理完成 - 成功: {success_count}, 失败: {len(failed_videos)}, 失败条目: {len(failures)}")
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json; charset=utf-8'
+        },
+        'body': json.dumps(response_data, ensure_ascii=False),
+        'batchItemFailures': [{'itemIdentifier': item_id} for item_id in failures],
+    }
 
 def lambda_handler(event, context):
     """
@@ -63,8 +290,24 @@ def lambda_handler(event, context):
         "delay": 1.0,        // 可选，请求间隔（秒）
         "fetch_only": false  // 可选，是否只获取而不处理
     }
+    批量事件 (channel_ids、video_ids、SQS Records) 见 handle_batch
     """
     
+    if 'Records' in event or 'channel_ids' in event or 'video_ids' in event:
+        try:
+            return handle_batch(event, context)
+        except Exception as e:
+            logger.error(f"Lambda执行出错: {str(e)}")
+            # 整批失败：SQS事件的所有消息都会重试
+            return {
+                'statusCode': 500,
+                'body': json.dumps({
+                    'error': f'Internal server error: {str(e)}'
+                }, ensure_ascii=False),
+                'batchItemFailures': [{'itemIdentifier': record.get('messageId')}
+                                      for record in event.get('Records', [])],
+            }
+    
     try:
         # 解析输入参数
         channel_id = event.get('channel_id')
@@ -81,7 +324,7 @@ def lambda_handler(event, context):
             }
         
         # 从环境变量获取YouTube API密钥
-        youtube_api_key = os.getenv('YOUTUBE_API_KEY')
+        youtube_api_key = os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY')
         if not youtube_api_key:
             return {
                 'statusCode': 500,
@@ -92,8 +335,8 @@ def lambda_handler(event, context):
         
         logger.info(f"开始处理频道: {channel_id}")
         
-        # 初始化YouTube视频获取器
-        fetcher = YouTubeVideoFetcher(youtube_api_key)
+        # YouTube视频获取器 (热容器中复用)
+        fetcher = get_fetcher(youtube_api_key)
         
         # 获取频道的所有视频
         logger.info("正在获取频道视频...")
@@ -170,6 +413,9 @@ def lambda_handler(event, context):
             }
         }
         
+        if metrics.enabled:
+            response_data['metrics'] = metrics.to_json()
+        
         logger.info(f"处理完成 - 成功: {success_count}, 失败: {fail_count}")
         
         return {
@@ -206,8 +452,8 @@ def test_locally():
             return 300000  # 5分钟
     
     # 确保设置了环境变量
-    if not os.getenv('YOUTUBE_API_KEY'):
-        print("❌ 请设置环境变量 YOUTUBE_API_KEY")
+    if not (os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY')):
+        print("❌ 请设置环境变量 YOUTUBE_API_KEY 或 YOUTUBE_API_KEYS")
         return
     
     print("🧪 开始本地测试...")
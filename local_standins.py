@@ -0,0 +1,830 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地替身服务 (用于压力测试和性能测试，不访问真实服务)
+
+- MockSRTServer: 模拟 lic.deepsrt.cc 的SRT webhook，可配置缓存命中比例、延迟分布和错误注入
+- FakeYouTubeResource: 模拟 googleapiclient 的 youtube 资源对象，为任意大小的虚拟频道返回分页的 playlistItems
+- MockYouTubeApiServer: 以REST接口提供 FakeYouTubeResource 的数据，供 async_youtube_fetcher.py 使用；
+  同时提供频道的RSS订阅源 /feeds/videos.xml?channel_id=，供 channel_feeds.py 使用
+- LocalWebSubHub: 模拟YouTube的WebSub中心，验证订阅并向 websub_receiver.py 推送上传通知
+- FakeWorksheet: 模拟 gspread 的 Worksheet (get / batch_update)，供 sheets_writeback.py 使用
+
+指向替身的方法:
+    export SRT_API_URL=http://127.0.0.1:8765/webhook/get-srt-from-provider
+    export YOUTUBE_FAKE_VIDEOS=5000      # 每个频道的虚拟视频数量
+    export YOUTUBE_FAKE_QUOTA=200        # 可选，每个密钥的模拟配额，用完后返回 403 quotaExceeded
+    export YOUTUBE_API_BASE_URL=http://127.0.0.1:8766/youtube/v3   # 异步获取器使用REST替身
+    export FEED_URL_TEMPLATE='http://127.0.0.1:8766/feeds/videos.xml?channel_id={channel_id}'
+
+启动SRT替身:
+    python local_standins.py --port 8765 --cached-ratio 0.7 --latency-ms 200 --error-rate 0.02
+同时启动YouTube REST替身 (端口 8766):
+    python local_standins.py --port 8765 --youtube-api-port 8766 --youtube-videos 5000
+"""
+
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from xml.sax.saxutils import escape
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+SRT_WEBHOOK_PATH = '/webhook/get-srt-from-provider'
+
+# 虚拟视频ID可用的字符（与YouTube视频ID相同的字符集）
+_ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+
+def _stable_fraction(text):
+    """把字符串映射到 [0, 1) 的稳定值，相同输入在每次运行中结果相同"""
+    digest = hashlib.md5(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+def fake_video_id(playlist_id, index):
+    """为虚拟频道的第index个视频生成稳定的11位视频ID"""
+    digest = hashlib.sha1(f'{playlist_id}:{index}'.encode('utf-8')).digest()
+    return ''.join(_ID_ALPHABET[byte % 64] for byte in digest[:11])
+
+
+def fake_srt(video_id, cue_count=20):
+    """生成一段模拟的SRT字幕"""
+    parts = []
+    for number in range(1, cue_count + 1):
+        start = (number - 1) * 3
+        parts.append(
+            f"{number}\n00:{start // 60:02d}:{start % 60:02d},000 --> "
+            f"00:{(start + 2) // 60:02d}:{(start + 2) % 60:02d},500\n"
+            f"{video_id} 第{number}句字幕\n\n"
+        )
+    return ''.join(parts)
+
+
+class _ServerWithBacklog(ThreadingHTTPServer):
+    # 默认监听队列只有5，并发测试时多余的连接会被丢弃并等待TCP重传
+    request_queue_size = 128
+
+
+class MockSRTServer:
+    def __init__(self, host='127.0.0.1', port=0, cached_ratio=0.5, latency_ms=50.0,
+                 latency_dist='fixed', latency_jitter_ms=0.0, error_rate=0.0,
+                 timeout_rate=0.0, hang_seconds=35.0, seed=None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动选择
+            cached_ratio: 视频已有缓存字幕的比例 (0-1)
+            latency_ms: 平均响应延迟（毫秒）
+            latency_dist: 延迟分布 'fixed'、'uniform' 或 'lognormal'
+            latency_jitter_ms: uniform分布的上下浮动范围 / lognormal分布的标准差
+            error_rate: 返回HTTP 500的比例
+            timeout_rate: 长时间不响应（超过客户端30秒超时）的比例
+            hang_seconds: 模拟超时时的等待时间
+            seed: 随机种子
+        """
+        self.cached_ratio = cached_ratio
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._generated = set()
+        self.stats = {'requests': 0, 'probes': 0, 'generations': 0, 'cache_hits': 0,
+                      'not_cached': 0, 'errors': 0, 'timeouts': 0}
+
+        self.server = _ServerWithBacklog((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """SRT webhook的完整URL，可直接设置为 SRT_API_URL"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{SRT_WEBHOOK_PATH}'
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _sample_latency(self):
+        """按配置的分布抽取一次延迟（秒）"""
+        with self._lock:
+            if self.latency_dist == 'uniform':
+                value = self._random.uniform(self.latency_ms - self.latency_jitter_ms,
+                                             self.latency_ms + self.latency_jitter_ms)
+            elif self.latency_dist == 'lognormal':
+                # 换算为对数正态分布参数，使均值为 latency_ms、标准差为 latency_jitter_ms
+                mean = max(self.latency_ms, 0.001)
+                variance = self.latency_jitter_ms ** 2
+                sigma_squared = math.log(1 + variance / mean ** 2)
+                mu = math.log(mean) - sigma_squared / 2
+                value = self._random.lognormvariate(mu, sigma_squared ** 0.5)
+            else:
+                value = self.latency_ms
+            roll = self._random.random()
+        return max(value, 0) / 1000, roll
+
+    def is_cached(self, video_id):
+        """视频是否已有缓存字幕（按视频ID稳定判定，生成过的视频视为已缓存）"""
+        with self._lock:
+            if video_id in self._generated:
+                return True
+        return _stable_fraction(video_id) < self.cached_ratio
+
+    def handle(self, payload):
+        """处理一次请求，返回 (HTTP状态码, 响应体字典)"""
+        self._count('requests')
+        latency, roll = self._sample_latency()
+        time.sleep(latency)
+
+        if roll < self.timeout_rate:
+            self._count('timeouts')
+            time.sleep(self.hang_seconds)
+            return 504, {'error': 'gateway timeout'}
+        if roll < self.timeout_rate + self.error_rate:
+            self._count('errors')
+            return 500, {'error': 'injected error'}
+
+        video_id = payload.get('youtube_id', '')
+        fetch_only = str(payload.get('fetch_only', 'false')).lower() == 'true'
+
+        if fetch_only:
+            self._count('probes')
+            if not self.is_cached(video_id):
+                self._count('not_cached')
+                return 200, {'youtube_id': video_id, 'message': 'not cached'}
+            self._count('cache_hits')
+        else:
+            self._count('generations')
+            with self._lock:
+                self._generated.add(video_id)
+
+        return 200, {'youtube_id': video_id, 'srt': fake_srt(video_id)}
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except json.JSONDecodeError:
+                    payload = {}
+                status, body = mock.handle(payload)
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _parse_fields(fields):
+    """
+    解析API的 fields 参数，例如 'nextPageToken,items(contentDetails/videoId,snippet(title))'
+
+    Returns:
+        嵌套字典 {字段名: True 或 子字段字典}
+    """
+    def parse(text, position):
+        spec = {}
+        while position < len(text):
+            end = position
+            while end < len(text) and text[end] not in ',()':
+                end += 1
+            path = text[position:end].strip().split('/')
+            position = end
+            children = True
+            if position < len(text) and text[position] == '(':
+                children, position = parse(text, position + 1)
+                position += 1  # 跳过 ')'
+            node = spec
+            for name in path[:-1]:
+                if not isinstance(node.get(name), dict):
+                    node[name] = {}
+                node = node[name]
+            node[path[-1]] = children
+            if position < len(text) and text[position] == ',':
+                position += 1
+            elif position < len(text) and text[position] == ')':
+                break
+        return spec, position
+
+    return parse(fields.replace(' ', ''), 0)[0]
+
+
+def _project_fields(data, spec):
+    """按 fields 规则裁剪响应，只保留请求的字段"""
+    if spec is True:
+        return data
+    if isinstance(data, list):
+        return [_project_fields(item, spec) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: _project_fields(data[key], children) for key, children in spec.items() if key in data}
+
+
+class _FakeRequest:
+    """模拟 googleapiclient 的 HttpRequest，execute() 时才生成响应"""
+
+    def __init__(self, resource, method, kwargs):
+        self.resource = resource
+        self.method = method
+        self.kwargs = kwargs
+        self.headers = {}
+        self.uri = f'fake://youtube/v3/{method}?' + '&'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))
+
+    def execute(self, num_retries=0):
+        return self.resource._respond(self.method, self.kwargs, headers=self.headers)
+
+
+class _FakeCollection:
+    def __init__(self, resource, name):
+        self.resource = resource
+        self.name = name
+
+    def list(self, **kwargs):
+        return _FakeRequest(self.resource, f'{self.name}.list', kwargs)
+
+
+def _http_error(status, reason, content=b''):
+    """构造 googleapiclient 的 HttpError"""
+    from googleapiclient.errors import HttpError
+
+    class _Resp(dict):
+        pass
+
+    resp = _Resp()
+    resp.status = status
+    resp.reason = reason
+    return HttpError(resp, content)
+
+
+def _quota_exceeded_error():
+    """构造与真实API相同的 403 quotaExceeded 错误"""
+    content = json.dumps({'error': {'code': 403, 'message': 'The request cannot be completed because you have exceeded your quota.',
+                                    'errors': [{'reason': 'quotaExceeded', 'domain': 'youtube.quota'}]}})
+    return _http_error(403, 'Forbidden', content.encode('utf-8'))
+
+
+class _FakeBatch:
+    """模拟 BatchHttpRequest，execute() 时只计一次请求延迟，然后依次调用回调"""
+
+    def __init__(self, resource, callback=None):
+        self.resource = resource
+        self.callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if request_id is None:
+            request_id = str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.resource._latency('batch')
+        for request_id, request, callback in self._requests:
+            try:
+                response = self.resource._respond(request.method, request.kwargs, latency=False, headers=request.headers)
+                exception = None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeYouTubeResource:
+    """
+    模拟 build('youtube', 'v3') 返回的资源对象
+
+    支持 channels().list、playlistItems().list 和 new_batch_http_request()，返回与真实API相同结构的分页数据
+    """
+
+    def __init__(self, videos_per_channel=500, channel_sizes=None, page_latency_ms=0.0,
+                 newest=datetime(2025, 5, 24, tzinfo=timezone.utc), quota_units=None):
+        """
+        Args:
+            videos_per_channel: 每个虚拟频道的视频数量
+            channel_sizes: {频道ID: 视频数量}，覆盖个别频道的大小
+            page_latency_ms: 每次请求的模拟延迟（毫秒）
+            newest: 最新视频的发布时间，之后每个视频早一天
+            quota_units: 模拟的每日配额（每次调用1单位），用完后返回 403 quotaExceeded；None 表示不限
+        """
+        self.videos_per_channel = videos_per_channel
+        self.channel_sizes = channel_sizes or {}
+        self.page_latency_ms = page_latency_ms
+        self.newest = newest
+        self.quota_units = quota_units
+        self.calls = {}
+        self.quota_used = 0
+
+    def channels(self):
+        return _FakeCollection(self, 'channels')
+
+    def playlistItems(self):
+        return _FakeCollection(self, 'playlistItems')
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def channel_size(self, channel_id):
+        """虚拟频道的视频数量"""
+        return self.channel_sizes.get(channel_id, self.videos_per_channel)
+
+    def _latency(self, method):
+        """记录一次HTTP请求并模拟延迟"""
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.page_latency_ms:
+            time.sleep(self.page_latency_ms / 1000)
+
+    def _respond(self, method, kwargs, latency=True, headers=None):
+        if latency:
+            self._latency(method)
+        else:
+            # 批量请求中的单个调用：消耗配额但不单独产生HTTP往返
+            self.calls[f'{method}(batched)'] = self.calls.get(f'{method}(batched)', 0) + 1
+
+        if self.quota_units is not None and self.quota_used >= self.quota_units:
+            raise _quota_exceeded_error()
+        self.quota_used += 1
+        response = self._build_response(method, kwargs)
+        # 与真实API一样，内容不变时 etag 不变；请求带相同的 If-None-Match 时返回 304
+        response['etag'] = hashlib.md5(json.dumps(response, sort_keys=True).encode('utf-8')).hexdigest()
+        if (headers or {}).get('If-None-Match', '').strip('"') == response['etag']:
+            self.calls['not_modified'] = self.calls.get('not_modified', 0) + 1
+            raise _http_error(304, 'Not Modified')
+        if kwargs.get('fields'):
+            response = _project_fields(response, _parse_fields(kwargs['fields']))
+        return response
+
+    def _build_response(self, method, kwargs):
+
+        if method == 'channels.list':
+            items = []
+            for channel_id in str(kwargs.get('id', '')).split(','):
+                if not channel_id:
+                    continue
+                items.append({
+                    'kind': 'youtube#channel',
+                    'id': channel_id,
+                    'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}},
+                    'statistics': {'videoCount': str(self.channel_size(channel_id))},
+                })
+            return {'kind': 'youtube#channelListResponse', 'items': items}
+
+        if method == 'playlistItems.list':
+            playlist_id = kwargs['playlistId']
+            total = self.channel_size('UC' + playlist_id[2:])
+            offset = int(kwargs.get('pageToken') or 0)
+            page_size = int(kwargs.get('maxResults', 5))
+            end = min(offset + page_size, total)
+
+            parts = str(kwargs.get('part', 'snippet')).split(',')
+            items = []
+            for index in range(offset, end):
+                video_id = fake_video_id(playlist_id, total - index)
+                published_at = (self.newest - timedelta(days=index)).strftime('%Y-%m-%dT%H:%M:%SZ')
+                item = {'kind': 'youtube#playlistItem'}
+                if 'snippet' in parts:
+                    item['snippet'] = {
+                        'publishedAt': published_at,
+                        'title': f'虚拟视频 {total - index}',
+                        'description': '模拟数据' * 20,
+                        'thumbnails': {'default': {'url': f'https://i.ytimg.com/vi/{video_id}/default.jpg'}},
+                    }
+                if 'contentDetails' in parts:
+                    item['contentDetails'] = {'videoId': video_id, 'videoPublishedAt': published_at}
+                items.append(item)
+
+            response = {
+                'kind': 'youtube#playlistItemListResponse',
+                'items': items,
+                'pageInfo': {'totalResults': total, 'resultsPerPage': page_size},
+            }
+            if end < total:
+                response['nextPageToken'] = str(end)
+            return response
+
+        raise NotImplementedError(method)
+
+    def feed_xml(self, channel_id, window=15):
+        """频道的Atom订阅源（最新 window 个视频），与 playlistItems 返回的视频一致"""
+        self.calls['feed'] = self.calls.get('feed', 0) + 1
+        playlist_id = 'UU' + channel_id[2:]
+        total = self.channel_size(channel_id)
+        entries = []
+        for index in range(min(window, total)):
+            video_id = fake_video_id(playlist_id, total - index)
+            published_at = (self.newest - timedelta(days=index)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            entries.append(
+                f'<entry><id>yt:video:{video_id}</id><yt:videoId>{video_id}</yt:videoId>'
+                f'<yt:channelId>{escape(channel_id)}</yt:channelId><title>虚拟视频 {total - index}</title>'
+                f'<published>{published_at}</published><updated>{published_at}</updated></entry>'
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Channel_{escape(channel_id[:8])}</title>{"".join(entries)}</feed>'
+        ).encode('utf-8')
+
+
+class MockYouTubeApiServer:
+    """
+    以REST接口提供 FakeYouTubeResource 的数据: GET /youtube/v3/playlistItems、/youtube/v3/channels，
+    以及频道的Atom订阅源 GET /feeds/videos.xml?channel_id=
+
+    支持 fields、pageToken、If-None-Match (304)，错误以与真实API相同的状态码和JSON返回
+    """
+
+    def __init__(self, resource=None, host='127.0.0.1', port=0):
+        """
+        Args:
+            resource: FakeYouTubeResource，默认每个频道500个视频
+            host: 监听地址
+            port: 监听端口，0表示自动选择
+        """
+        self.resource = resource or FakeYouTubeResource()
+        self.server = _ServerWithBacklog((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """REST接口地址，可直接设置为 YOUTUBE_API_BASE_URL"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/youtube/v3'
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def feed_url_template(self):
+        """订阅源地址模板，可直接设置为 FEED_URL_TEMPLATE"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/feeds/videos.xml?channel_id={{channel_id}}'
+
+    def handle(self, path, query, headers):
+        """处理一次GET请求，返回 (状态码, 响应体bytes)"""
+        if path == '/feeds/videos.xml':
+            channel_id = dict(parse_qsl(query)).get('channel_id', '')
+            if not channel_id.startswith('UC'):
+                return 404, b''
+            return 200, self.resource.feed_xml(channel_id)
+        method = path.rstrip('/').rsplit('/', 1)[-1]
+        if method not in ('playlistItems', 'channels'):
+            return 404, b'{"error": {"code": 404, "message": "Not Found"}}'
+        kwargs = {name: value for name, value in parse_qsl(query) if name != 'key'}
+        if 'maxResults' in kwargs:
+            kwargs['maxResults'] = int(kwargs['maxResults'])
+        try:
+            response = self.resource._respond(f'{method}.list', kwargs, headers=headers)
+        except Exception as e:
+            status = getattr(getattr(e, 'resp', None), 'status', None)
+            if status is None:
+                raise
+            return status, getattr(e, 'content', b'') or b''
+        return 200, json.dumps(response, ensure_ascii=False).encode('utf-8')
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                headers = {}
+                if self.headers.get('If-None-Match'):
+                    headers['If-None-Match'] = self.headers['If-None-Match']
+                status, data = mock.handle(parts.path, parts.query, headers)
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/atom+xml; charset=utf-8'
+                                     if parts.path.startswith('/feeds/') else 'application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class LocalWebSubHub:
+    """
+    模拟YouTube的WebSub中心 (pubsubhubbub.appspot.com)，驱动 websub_receiver.py
+
+    - POST /subscribe 接收订阅 / 退订请求，返回202后异步用 GET 访问回调地址验证 (hub.challenge)
+    - publish() 像YouTube一样把上传通知POST给订阅了该频道的回调地址，带 X-Hub-Signature
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, max_lease_seconds=864000):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动选择
+            max_lease_seconds: 中心允许的最长租期，请求更长的租期时验证请求中给出这个值
+        """
+        self.max_lease_seconds = max_lease_seconds
+        self.subscriptions = {}   # (回调地址, 主题) -> {'secret': ..., 'expires': ...}
+        self.stats = {'subscribe': 0, 'unsubscribe': 0, 'verified': 0, 'verify_failed': 0,
+                      'published': 0, 'delivered': 0}
+        self._lock = threading.Lock()
+        self.server = _ServerWithBacklog((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """订阅地址，可直接设置为 WEBSUB_HUB_URL"""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/subscribe'
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _verify(self, params):
+        """访问回调地址验证订阅意图，回调原样返回 challenge 时订阅生效"""
+        import urllib.request
+        import urllib.error
+        from urllib.parse import urlencode
+
+        mode, callback, topic = params['hub.mode'], params['hub.callback'], params['hub.topic']
+        lease_seconds = min(int(params.get('hub.lease_seconds') or self.max_lease_seconds), self.max_lease_seconds)
+        challenge = hashlib.md5(f'{callback}{topic}{time.time()}'.encode('utf-8')).hexdigest()
+        query = {'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge}
+        if mode == 'subscribe':
+            query['hub.lease_seconds'] = lease_seconds
+        separator = '&' if '?' in callback else '?'
+        try:
+            with urllib.request.urlopen(f'{callback}{separator}{urlencode(query)}', timeout=10) as response:
+                verified = response.status == 200 and response.read().decode('utf-8') == challenge
+        except (urllib.error.URLError, OSError):
+            verified = False
+
+        with self._lock:
+            self.stats['verified' if verified else 'verify_failed'] += 1
+            if not verified:
+                return
+            if mode == 'subscribe':
+                self.subscriptions[(callback, topic)] = {
+                    'secret': params.get('hub.secret'), 'expires': time.time() + lease_seconds
+                }
+            else:
+                self.subscriptions.pop((callback, topic), None)
+
+    def handle_subscribe(self, params):
+        """处理订阅 / 退订请求，返回 (状态码, 响应体bytes)"""
+        if params.get('hub.mode') not in ('subscribe', 'unsubscribe') or not params.get('hub.callback') \
+                or not params.get('hub.topic'):
+            return 400, b'hub.mode, hub.callback and hub.topic are required'
+        with self._lock:
+            self.stats[params['hub.mode']] += 1
+        threading.Thread(target=self._verify, args=(params,), daemon=True).start()
+        return 202, b''
+
+    def subscribers(self, channel_id):
+        """订阅了该频道且租期未到期的回调地址"""
+        now = time.time()
+        with self._lock:
+            return [(callback, subscription['secret'])
+                    for (callback, topic), subscription in self.subscriptions.items()
+                    if topic.endswith(f'channel_id={channel_id}') and subscription['expires'] > now]
+
+    def publish(self, channel_id, video_id, title='新视频', published=None):
+        """
+        发布一个新视频的通知
+
+        Returns:
+            成功送达（回调返回2xx）的订阅者数量
+        """
+        import hmac
+        import urllib.request
+        import urllib.error
+
+        published = published or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+            '<link rel="hub" href="https://pubsubhubbub.appspot.com"/>'
+            f'<title>YouTube video feed</title><updated>{published}</updated>'
+            f'<entry><id>yt:video:{escape(video_id)}</id><yt:videoId>{escape(video_id)}</yt:videoId>'
+            f'<yt:channelId>{escape(channel_id)}</yt:channelId><title>{escape(title)}</title>'
+            f'<published>{published}</published><updated>{published}</updated></entry></feed>'
+        ).encode('utf-8')
+
+        self.stats['published'] += 1
+        delivered = 0
+        for callback, secret in self.subscribers(channel_id):
+            headers = {'Content-Type': 'application/atom+xml'}
+            if secret:
+                headers['X-Hub-Signature'] = 'sha1=' + hmac.new(secret.encode('utf-8'), body, 'sha1').hexdigest()
+            request = urllib.request.Request(callback, data=body, headers=headers, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    if 200 <= response.status < 300:
+                        delivered += 1
+            except (urllib.error.URLError, OSError):
+                pass
+        with self._lock:
+            self.stats['delivered'] += delivered
+        return delivered
+
+    def _make_handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                if urlsplit(self.path).path.rstrip('/') != '/subscribe':
+                    status, data = 404, b''
+                else:
+                    status, data = hub.handle_subscribe(dict(parse_qsl(body)))
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeWorksheet:
+    """
+    模拟 gspread 的 Worksheet，只实现 SheetsWriteback 用到的 get(range) 和 batch_update(data, **kwargs)
+
+    单元格保存在 {(行号, 列序号): 值} 中，batch_update 的每次调用记录在 batch_calls 里
+    """
+
+    def __init__(self, rows=None):
+        """
+        Args:
+            rows: 初始内容，按行给出的值列表，例如 [['channel_id'], ['UCxxxx']]，从A1开始
+        """
+        self.cells = {}
+        self.batch_calls = []
+        for row_number, row in enumerate(rows or [], 1):
+            for column, value in enumerate(row, 1):
+                self.cells[(row_number, column)] = value
+
+    @staticmethod
+    def _parse_range(a1_range):
+        """'A:A' -> (1, 1, 1, None)，'B2:F2' -> (2, 2, 6, 2)，返回 (起始行, 起始列, 结束列, 结束行)"""
+        from sheets_writeback import column_letter_to_index
+
+        match = re.match(r'^([A-Za-z]+)(\d*)(?::([A-Za-z]+)(\d*))?$', a1_range.strip())
+        if not match:
+            raise ValueError(f"无法解析范围: {a1_range}")
+        first_column = column_letter_to_index(match.group(1))
+        last_column = column_letter_to_index(match.group(3)) if match.group(3) else first_column
+        first_row = int(match.group(2)) if match.group(2) else 1
+        last_row = int(match.group(4)) if match.group(4) else (None if not match.group(2) else first_row)
+        return first_row, first_column, last_column, last_row
+
+    def get(self, a1_range):
+        """与 gspread 相同：返回二维列表，去掉末尾的空行和每行末尾的空单元格"""
+        first_row, first_column, last_column, last_row = self._parse_range(a1_range)
+        if last_row is None:
+            last_row = max((row for row, _ in self.cells), default=0)
+        values = []
+        for row_number in range(first_row, last_row + 1):
+            row = [self.cells.get((row_number, column), '') for column in range(first_column, last_column + 1)]
+            while row and row[-1] == '':
+                row.pop()
+            values.append(row)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def batch_update(self, data, **kwargs):
+        """写入多个范围的值"""
+        self.batch_calls.append({'data': data, 'kwargs': kwargs})
+        for item in data:
+            first_row, first_column, _, _ = self._parse_range(item['range'])
+            for row_offset, row in enumerate(item['values']):
+                for column_offset, value in enumerate(row):
+                    self.cells[(first_row + row_offset, first_column + column_offset)] = value
+        return {'totalUpdatedRanges': len(data)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动本地SRT webhook替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--cached-ratio', type=float, default=0.5, help='已缓存视频的比例')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='平均延迟（毫秒）')
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'lognormal'], default='fixed', help='延迟分布')
+    parser.add_argument('--latency-jitter-ms', type=float, default=0.0, help='延迟浮动/标准差（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='HTTP 500的比例')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='超时的比例')
+    parser.add_argument('--seed', type=int, help='随机种子')
+    parser.add_argument('--youtube-api-port', type=int, help='同时在该端口启动YouTube REST替身')
+    parser.add_argument('--youtube-videos', type=int, default=500, help='REST替身中每个频道的视频数量')
+    parser.add_argument('--websub-hub-port', type=int, help='同时在该端口启动WebSub中心替身')
+    args = parser.parse_args()
+
+    server = MockSRTServer(
+        args.host, args.port, args.cached_ratio, args.latency_ms, args.latency_dist,
+        args.latency_jitter_ms, args.error_rate, args.timeout_rate, seed=args.seed
+    )
+    print(f"🧪 SRT替身服务已启动: {server.url}")
+    print(f"   export SRT_API_URL={server.url}")
+    api_server = None
+    if args.youtube_api_port:
+        api_server = MockYouTubeApiServer(FakeYouTubeResource(args.youtube_videos), args.host, args.youtube_api_port).start()
+        print(f"🧪 YouTube REST替身已启动: {api_server.url}")
+        print(f"   export YOUTUBE_API_BASE_URL={api_server.url}")
+        print(f"   export FEED_URL_TEMPLATE='{api_server.feed_url_template}'")
+    hub = None
+    if args.websub_hub_port:
+        hub = LocalWebSubHub(args.host, args.websub_hub_port).start()
+        print(f"🧪 WebSub中心替身已启动: {hub.url}")
+        print(f"   export WEBSUB_HUB_URL={hub.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        if api_server:
+            api_server.stop()
+            print(f"📊 YouTube REST替身调用: {api_server.resource.calls}")
+        if hub:
+            hub.stop()
+            print(f"📊 WebSub中心替身: {hub.stats}")
+        print(f"\n📊 请求统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线运行指标
+记录每个阶段（读取Sheets、解析uploads播放列表、每页playlistItems、每次SRT查询/生成）的耗时直方图、
+调用次数、错误类型和计数，可以导出为Prometheus文本格式或JSON
+
+设置环境变量 PIPELINE_METRICS=1 启用；未启用时 stage() 返回共享的空对象，几乎没有开销
+
+用法:
+    from pipeline_metrics import metrics
+
+    with metrics.stage('playlist_page') as stage:
+        response = request.execute()
+        if not response['items']:
+            stage.mark_error('EmptyPage')
+    metrics.increment('videos_listed', len(items))
+"""
+
+import os
+import json
+import time
+import threading
+
+# 耗时直方图的桶上限（毫秒）
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """固定桶的累计直方图"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        """返回 [(桶上限, 累计次数)]，Prometheus要求的格式"""
+        total = 0
+        result = []
+        for upper, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((upper, total))
+        return result
+
+    def quantile(self, q):
+        """根据桶估算分位数（返回所在桶的上限）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for upper, total in self.cumulative():
+            if total >= target:
+                return upper
+        return float('inf')
+
+
+class _NullStage:
+    """未启用指标时使用的空阶段对象"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def mark_error(self, error_class):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """一次阶段计时"""
+
+    __slots__ = ('metrics', 'name', 'start', 'error')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.error = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None and self.error is None:
+            self.error = exc_type.__name__
+        self.metrics.record_stage(self.name, elapsed_ms, self.error)
+        return False
+
+    def mark_error(self, error_class):
+        """标记本次调用失败（用于不抛异常、而是返回失败结果的函数）"""
+        self.error = error_class
+
+
+class PipelineMetrics:
+    def __init__(self, enabled: bool = False):
+        """
+        Args:
+            enabled: 是否记录指标
+        """
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._errors = {}
+        self._counters = {}
+
+    def stage(self, name: str):
+        """返回阶段计时的上下文管理器"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record_stage(self, name: str, elapsed_ms: float, error_class: str = None):
+        """记录一次阶段耗时和（可选的）错误类型"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(elapsed_ms)
+            if error_class:
+                key = (name, error_class)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def increment(self, name: str, value: int = 1):
+        """增加一个计数器"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        """清空所有已记录的指标"""
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def to_json(self) -> dict:
+        """以字典形式导出所有指标"""
+        with self._lock:
+            stages = {}
+            for name, histogram in sorted(self._histograms.items()):
+                stages[name] = {
+                    'count': histogram.count,
+                    'total_ms': round(histogram.sum, 3),
+                    'avg_ms': round(histogram.sum / histogram.count, 3) if histogram.count else 0,
+                    'p50_ms': histogram.quantile(0.5),
+                    'p95_ms': histogram.quantile(0.95),
+                    'p99_ms': histogram.quantile(0.99),
+                    'buckets': {str(upper): total for upper, total in histogram.cumulative()},
+                    'errors': {
+                        error_class: count
+                        for (stage, error_class), count in sorted(self._errors.items())
+                        if stage == name
+                    },
+                }
+            return {
+                'started_at': self.started_at,
+                'elapsed_seconds': round(time.time() - self.started_at, 3),
+                'stages': stages,
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    def to_prometheus(self) -> str:
+        """以Prometheus文本格式导出所有指标（可用于node_exporter的textfile收集器）"""
+        lines = [
+            '# HELP pipeline_stage_duration_ms Duration of pipeline stages in milliseconds.',
+            '# TYPE pipeline_stage_duration_ms histogram',
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                for upper, total in histogram.cumulative():
+                    lines.append(f'pipeline_stage_duration_ms_bucket{{stage="{name}",le="{upper}"}} {total}')
+                lines.append(f'pipeline_stage_duration_ms_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'pipeline_stage_duration_ms_sum{{stage="{name}"}} {histogram.sum:.3f}')
+                lines.append(f'pipeline_stage_duration_ms_count{{stage="{name}"}} {histogram.count}')
+
+            lines.append('# HELP pipeline_stage_errors_total Failed pipeline stage calls by error class.')
+            lines.append('# TYPE pipeline_stage_errors_total counter')
+            for (name, error_class), count in sorted(self._errors.items()):
+                error_label = error_class.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'pipeline_stage_errors_total{{stage="{name}",error="{error_label}"}} {count}')
+
+            lines.append('# HELP pipeline_events_total Pipeline event counters.')
+            lines.append('# TYPE pipeline_events_total counter')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'pipeline_events_total{{event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, filename: str):
+        """保存指标到文件，.json 结尾保存为JSON，其他保存为Prometheus文本格式"""
+        if filename.endswith('.json'):
+            content = json.dumps(self.to_json(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        # 先写临时文件再替换，避免Prometheus textfile收集器读到写了一半的文件
+        temp_filename = f'{filename}.tmp'
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_filename, filename)
+
+
+# 全局指标对象
+metrics = PipelineMetrics(enabled=os.getenv('PIPELINE_METRICS', '').lower() in ('1', 'true', 'yes'))
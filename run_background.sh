@@ -6,6 +6,11 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 LOG_DIR="$SCRIPT_DIR/logs"
 PID_FILE="$SCRIPT_DIR/youtube_processing.pid"
 MAIN_SCRIPT="$SCRIPT_DIR/get_all_videos.py"
+# 持续同步守护进程
+DAEMON_SCRIPT="$SCRIPT_DIR/sync_daemon.py"
+DAEMON_PID_FILE="$SCRIPT_DIR/youtube_sync_daemon.pid"
+# 关注列表：设置了 SYNC_SPREADSHEET_ID 时从Google Sheets读取，否则读取 SYNC_CHANNELS_FILE
+SYNC_CHANNELS_FILE="${SYNC_CHANNELS_FILE:-$SCRIPT_DIR/channels.txt}"
 
 # 创建日志目录
 mkdir -p "$LOG_DIR"
@@ -14,7 +19,8 @@ mkdir -p "$LOG_DIR"
 TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
 OUTPUT_LOG="$LOG_DIR/youtube_output_$TIMESTAMP.log"
 ERROR_LOG="$LOG_DIR/youtube_error_$TIMESTAMP.log"
-COMBINED_LOG="$LOG_DIR/youtube_combined_$TIMESTAMP.log"
+# 结构化日志 (JSON Lines)，由程序内部按大小轮转
+STRUCTURED_LOG="$LOG_DIR/youtube_structured.log"
 
 # 函数：启动程序
 start_processing() {
@@ -28,49 +34,71 @@ start_processing() {
     echo "📁 工作目录: $SCRIPT_DIR"
     echo "📝 输出日志: $OUTPUT_LOG"
     echo "❌ 错误日志: $ERROR_LOG"
-    echo "📋 合并日志: $COMBINED_LOG"
+    echo "📋 结构化日志: $STRUCTURED_LOG"
     
-    # 后台运行程序
-    nohup python3 "$MAIN_SCRIPT" > "$OUTPUT_LOG" 2> "$ERROR_LOG" &
+    # 后台运行程序，每个视频的结果以JSON Lines写入结构化日志（异步写入，自动轮转）
+    LOG_FORMAT=json LOG_FILE="$STRUCTURED_LOG" \
+        nohup python3 "$MAIN_SCRIPT" > "$OUTPUT_LOG" 2> "$ERROR_LOG" &
     
     # 保存PID
     echo $! > "$PID_FILE"
     
-    # 同时创建合并日志的进程
-    {
-        tail -f "$OUTPUT_LOG" 2>/dev/null &
-        tail -f "$ERROR_LOG" 2>/dev/null &
-        wait
-    } > "$COMBINED_LOG" &
-    
     echo "✅ 程序已启动，PID: $(cat "$PID_FILE")"
     echo ""
     echo "📊 监控命令:"
-    echo "  查看实时日志: tail -f $COMBINED_LOG"
+    echo "  查看结构化日志: tail -f $STRUCTURED_LOG"
     echo "  查看输出日志: tail -f $OUTPUT_LOG"
     echo "  查看错误日志: tail -f $ERROR_LOG"
     echo "  检查进程状态: $0 status"
     echo "  停止程序: $0 stop"
 }
 
-# 函数：停止程序
+# 函数：启动持续同步守护进程
+start_daemon() {
+    if [ -f "$DAEMON_PID_FILE" ] && kill -0 "$(cat "$DAEMON_PID_FILE")" 2>/dev/null; then
+        echo "❌ 同步守护进程已在运行中，PID: $(cat "$DAEMON_PID_FILE")"
+        exit 1
+    fi
+
+    if [ -n "$SYNC_SPREADSHEET_ID" ]; then
+        WATCHLIST_ARGS=(--spreadsheet-id "$SYNC_SPREADSHEET_ID")
+        echo "📋 关注列表: Google Sheets $SYNC_SPREADSHEET_ID"
+    else
+        WATCHLIST_ARGS=(--channels-file "$SYNC_CHANNELS_FILE")
+        echo "📋 关注列表: $SYNC_CHANNELS_FILE"
+    fi
+
+    echo "🔄 启动频道持续同步守护进程..."
+    LOG_FORMAT=json LOG_FILE="$STRUCTURED_LOG" \
+        nohup python3 "$DAEMON_SCRIPT" "${WATCHLIST_ARGS[@]}" > "$OUTPUT_LOG" 2> "$ERROR_LOG" &
+    echo $! > "$DAEMON_PID_FILE"
+
+    echo "✅ 同步守护进程已启动，PID: $(cat "$DAEMON_PID_FILE")"
+    echo "  查看结构化日志: tail -f $STRUCTURED_LOG"
+    echo "  停止守护进程: $0 daemon-stop"
+}
+
+# 函数：停止程序 (参数: PID文件，等待秒数)
 stop_processing() {
-    if [ ! -f "$PID_FILE" ]; then
+    local pid_file="${1:-$PID_FILE}"
+    local wait_seconds="${2:-10}"
+
+    if [ ! -f "$pid_file" ]; then
         echo "❌ 没有找到PID文件，程序可能没有运行"
         return 1
     fi
     
-    PID=$(cat "$PID_FILE")
+    PID=$(cat "$pid_file")
     if kill -0 "$PID" 2>/dev/null; then
         echo "🛑 正在停止程序，PID: $PID"
         kill "$PID"
         
         # 等待程序停止
-        for i in {1..10}; do
+        for i in $(seq 1 "$wait_seconds"); do
             if ! kill -0 "$PID" 2>/dev/null; then
                 break
             fi
-            echo "⏳ 等待程序停止... ($i/10)"
+            echo "⏳ 等待程序停止... ($i/$wait_seconds)"
             sleep 1
         done
         
@@ -80,11 +108,11 @@ stop_processing() {
             kill -9 "$PID"
         fi
         
-        rm -f "$PID_FILE"
+        rm -f "$pid_file"
         echo "✅ 程序已停止"
     else
         echo "❌ 程序已经停止，清理PID文件"
-        rm -f "$PID_FILE"
+        rm -f "$pid_file"
     fi
 }
 
@@ -99,7 +127,7 @@ check_status() {
         ps -p "$PID" -o pid,ppid,cmd,etime,pcpu,pmem
         
         # 显示最新日志
-        LATEST_LOG=$(find "$LOG_DIR" -name "youtube_combined_*.log" -type f -printf '%T@ %p\n' | sort -k 1nr | head -1 | cut -d' ' -f2-)
+        LATEST_LOG="$STRUCTURED_LOG"
         if [ -n "$LATEST_LOG" ] && [ -f "$LATEST_LOG" ]; then
             echo ""
             echo "📝 最新日志 (最后10行):"
@@ -124,7 +152,8 @@ view_logs() {
     
     echo ""
     echo "📝 查看日志命令:"
-    echo "  实时查看最新合并日志: tail -f $LOG_DIR/youtube_combined_*.log | head -1"
+    echo "  实时查看结构化日志: tail -f $STRUCTURED_LOG"
+    echo "  只看失败的视频: grep '\"success\": false' $STRUCTURED_LOG"
     echo "  查看所有输出日志: ls $LOG_DIR/youtube_output_*.log"
     echo "  查看所有错误日志: ls $LOG_DIR/youtube_error_*.log"
 }
@@ -144,13 +173,15 @@ clean_logs() {
 show_help() {
     echo "🎬 YouTube多频道处理后台运行管理脚本"
     echo ""
-    echo "用法: $0 {start|stop|restart|status|logs|clean|help}"
+    echo "用法: $0 {start|stop|restart|status|daemon-start|daemon-stop|logs|clean|help}"
     echo ""
     echo "命令说明:"
     echo "  start    - 启动程序（后台运行）"
     echo "  stop     - 停止程序"
     echo "  restart  - 重启程序"
     echo "  status   - 查看运行状态"
+    echo "  daemon-start - 启动频道持续同步守护进程"
+    echo "  daemon-stop  - 停止守护进程（等待当前频道处理完，最多60秒）"
     echo "  logs     - 查看日志文件列表"
     echo "  clean    - 清理旧日志文件（保留7天）"
     echo "  help     - 显示此帮助信息"
@@ -175,6 +206,12 @@ case "$1" in
     status)
         check_status
         ;;
+    daemon-start)
+        start_daemon
+        ;;
+    daemon-stop)
+        stop_processing "$DAEMON_PID_FILE" 60
+        ;;
     logs)
         view_logs
         ;;
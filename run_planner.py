@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多频道运行计划 (dry-run)
+开始处理之前先估算一次运行的成本，不获取视频列表也不请求SRT：
+- 每50个频道一次 channels.list 查询 statistics.videoCount
+- 按视频数量估算 playlistItems 翻页次数和API配额单位
+- 按目录数据库中已成功的记录估算还需要的SRT请求数
+- 按SRT并发数估算耗时
+一天的配额不够时，按频道顺序把运行拆分到多天。
+
+用法:
+    python run_planner.py --spreadsheet-id <ID> --srt-mode all
+    python run_planner.py --channels-file channels.txt --max-videos 100 --split-dir plan_days
+"""
+
+import os
+import json
+import math
+import argparse
+
+from youtube_video_fetcher import YouTubeVideoFetcher, BATCH_SIZE, get_api_key
+from api_key_pool import DEFAULT_DAILY_QUOTA
+
+# playlistItems.list 每页最多50个视频
+PAGE_SIZE = 50
+
+# 每种SRT模式每个频道最多请求多少个视频 (None 表示所有视频，ask 按全部处理估算)
+SRT_LIMITS = {'all': None, 'ask': None, 'test': 10, 'limited': 50, 'skip': 0}
+
+# 耗时估算的默认值，可按实际运行指标调整 (环境变量 PLAN_PAGE_SECONDS / PLAN_SRT_SECONDS)
+DEFAULT_PAGE_SECONDS = 0.5
+DEFAULT_SRT_SECONDS = 4.0
+
+# 每天保留的配额比例，留给重试和其他工具
+DEFAULT_QUOTA_RESERVE = 0.1
+
+
+def estimate_channel(channel_id, video_count, max_videos=None, srt_mode='skip', srt_done=0):
+    """
+    估算一个频道的翻页次数、配额和SRT请求数
+
+    Args:
+        channel_id: 频道ID
+        video_count: statistics.videoCount，None表示找不到频道
+        max_videos: 每个频道最多获取的视频数量
+        srt_mode: SRT模式 (all/ask/test/limited/skip)
+        srt_done: 范围内已经成功请求过SRT的视频数量
+    """
+    if video_count is None:
+        return {'channel_id': channel_id, 'video_count': None, 'videos': 0, 'pages': 0, 'quota': 0,
+                'srt_calls': 0, 'missing': True}
+
+    videos = min(video_count, max_videos) if max_videos else video_count
+    # 没有视频的频道也需要请求一页才知道
+    pages = max(1, math.ceil(videos / PAGE_SIZE))
+    # 不是UC开头的频道ID需要先查询uploads播放列表 (每50个频道一次，这里按1/50单位分摊)
+    quota = pages + (0 if channel_id.startswith('UC') else 1 / BATCH_SIZE)
+
+    srt_limit = SRT_LIMITS.get(srt_mode)
+    srt_videos = videos if srt_limit is None else min(videos, srt_limit)
+    srt_calls = max(0, srt_videos - srt_done)
+
+    return {'channel_id': channel_id, 'video_count': video_count, 'videos': videos, 'pages': pages,
+            'quota': quota, 'srt_calls': srt_calls, 'missing': False}
+
+
+def split_into_days(rows, daily_budget):
+    """
+    按频道顺序把频道分配到多天，每天的配额不超过 daily_budget
+
+    单个频道就超过一天配额时单独占一天 (会在计划中标出)
+    """
+    days = []
+    current, used = [], 0.0
+    for row in rows:
+        if current and used + row['quota'] > daily_budget:
+            days.append(current)
+            current, used = [], 0.0
+        current.append(row)
+        used += row['quota']
+    if current:
+        days.append(current)
+    return days
+
+
+def listing_seconds(rows, page_seconds):
+    """
+    估算获取视频列表的耗时
+
+    多频道模式每50个频道合并为批量请求，每轮一次HTTP往返，轮数等于这50个频道中最多的翻页次数
+    """
+    seconds = 0.0
+    for start in range(0, len(rows), BATCH_SIZE):
+        seconds += max((row['pages'] for row in rows[start:start + BATCH_SIZE]), default=0) * page_seconds
+    return seconds
+
+
+def plan_run(video_counts, max_videos=None, srt_mode='skip', srt_done=None, daily_quota=None, key_count=1,
+             quota_reserve=DEFAULT_QUOTA_RESERVE, srt_concurrency=1, srt_delay=1.0,
+             page_seconds=None, srt_seconds=None):
+    """
+    根据频道视频数量生成运行计划
+
+    Args:
+        video_counts: {频道ID: 视频数量}，保持频道顺序
+        max_videos: 每个频道最多获取的视频数量
+        srt_mode: SRT模式
+        srt_done: {频道ID: 已成功请求过SRT的视频数量}
+        daily_quota: 每个密钥每天的配额，默认 YOUTUBE_DAILY_QUOTA
+        key_count: API密钥数量
+        quota_reserve: 每天保留的配额比例
+        srt_concurrency: SRT请求并发数
+        srt_delay: SRT请求间隔（秒）
+        page_seconds: 每轮翻页耗时（秒），默认 PLAN_PAGE_SECONDS
+        srt_seconds: 单个SRT请求耗时（秒），默认 PLAN_SRT_SECONDS
+
+    Returns:
+        计划字典，days 为每天处理的频道ID列表
+    """
+    srt_done = srt_done or {}
+    daily_quota = daily_quota or int(os.getenv('YOUTUBE_DAILY_QUOTA', DEFAULT_DAILY_QUOTA))
+    page_seconds = page_seconds or float(os.getenv('PLAN_PAGE_SECONDS', DEFAULT_PAGE_SECONDS))
+    srt_seconds = srt_seconds or float(os.getenv('PLAN_SRT_SECONDS', DEFAULT_SRT_SECONDS))
+
+    rows = [estimate_channel(channel_id, count, max_videos, srt_mode, srt_done.get(channel_id, 0))
+            for channel_id, count in video_counts.items()]
+    found = [row for row in rows if not row['missing']]
+
+    precheck_quota = math.ceil(len(video_counts) / BATCH_SIZE)
+    daily_budget = daily_quota * key_count * (1 - quota_reserve)
+    days = split_into_days(found, daily_budget)
+
+    def day_summary(day_rows):
+        srt_calls = sum(row['srt_calls'] for row in day_rows)
+        seconds = (listing_seconds(day_rows, page_seconds)
+                   + srt_calls * (srt_seconds + srt_delay) / max(1, srt_concurrency))
+        return {
+            'channels': [row['channel_id'] for row in day_rows],
+            'quota': math.ceil(sum(row['quota'] for row in day_rows)),
+            'pages': sum(row['pages'] for row in day_rows),
+            'videos': sum(row['videos'] for row in day_rows),
+            'srt_calls': srt_calls,
+            'seconds': round(seconds),
+        }
+
+    day_plans = [day_summary(day_rows) for day_rows in days]
+    total = day_summary(found)
+    total['quota'] += precheck_quota
+
+    return {
+        'settings': {
+            'max_videos': max_videos, 'srt_mode': srt_mode, 'daily_quota': daily_quota, 'api_keys': key_count,
+            'daily_budget': int(daily_budget), 'srt_concurrency': srt_concurrency, 'srt_delay': srt_delay,
+            'page_seconds': page_seconds, 'srt_seconds': srt_seconds,
+        },
+        'precheck_quota': precheck_quota,
+        'total': total,
+        'fits_in_one_day': len(day_plans) <= 1,
+        'days': day_plans,
+        'oversized_channels': [row['channel_id'] for row in found if row['quota'] > daily_budget],
+        'missing_channels': [row['channel_id'] for row in rows if row['missing']],
+        'channels': rows,
+    }
+
+
+def build_plan(fetcher, channel_ids, store=None, max_videos=None, srt_mode='skip', **options):
+    """
+    查询频道视频数量并生成运行计划
+
+    Args:
+        fetcher: YouTubeVideoFetcher
+        channel_ids: 频道ID列表
+        store: 目录数据库 (可选)，用于扣除已经成功请求过SRT的视频
+        其余参数见 plan_run
+    """
+    print(f"🔎 查询 {len(channel_ids)} 个频道的视频数量 ({math.ceil(len(channel_ids) / BATCH_SIZE)} 次API调用)...")
+    video_counts = fetcher.get_channel_video_counts(channel_ids)
+
+    srt_done = {}
+    if store and srt_mode != 'skip':
+        srt_limit = SRT_LIMITS.get(srt_mode)
+        newest = min(filter(None, (max_videos, srt_limit)), default=None)
+        srt_done = store.srt_done_counts(newest)
+
+    key_count = len(fetcher.key_pool) if fetcher.key_pool else 1
+    options.setdefault('key_count', key_count)
+    return plan_run(video_counts, max_videos, srt_mode, srt_done, **options)
+
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}小时{remainder // 60}分钟" if hours else f"{remainder // 60}分{remainder % 60}秒"
+
+
+def print_plan(plan):
+    """显示运行计划"""
+    settings = plan['settings']
+    total = plan['total']
+    print(f"\n{'='*60}")
+    print("📋 运行计划 (dry-run)")
+    print(f"{'='*60}")
+    print(f"- 频道: {len(plan['channels'])} 个 (找不到 {len(plan['missing_channels'])} 个)")
+    print(f"- 视频: {total['videos']} 个，翻页 {total['pages']} 次")
+    print(f"- API配额: 约 {total['quota']} 单位 (其中查询视频数量 {plan['precheck_quota']} 单位)，"
+          f"每天可用 {settings['daily_budget']} 单位 ({settings['api_keys']} 个密钥，保留 {DEFAULT_QUOTA_RESERVE:.0%})")
+    print(f"- SRT请求: {total['srt_calls']} 次 (已扣除已成功的视频，模式 {settings['srt_mode']})")
+    print(f"- 预计耗时: {format_duration(total['seconds'])} "
+          f"(每轮翻页 {settings['page_seconds']} 秒，SRT {settings['srt_seconds']}+{settings['srt_delay']} 秒，"
+          f"并发 {settings['srt_concurrency']})")
+
+    if plan['missing_channels']:
+        print(f"⚠️  找不到的频道: {', '.join(plan['missing_channels'][:10])}")
+    if plan['oversized_channels']:
+        print(f"⚠️  单个频道超过一天的配额: {', '.join(plan['oversized_channels'])}，"
+              f"可以限制获取的视频数量或增加API密钥")
+
+    if plan['fits_in_one_day']:
+        print("✅ 一天的配额足够完成本次运行")
+    else:
+        print(f"📅 一天的配额不够，拆分为 {len(plan['days'])} 天:")
+        for number, day in enumerate(plan['days'], 1):
+            print(f"   第{number}天: {len(day['channels'])} 个频道，配额约 {day['quota']} 单位，"
+                  f"SRT {day['srt_calls']} 次，耗时约 {format_duration(day['seconds'])}")
+
+
+def write_day_files(plan, directory):
+    """把每天的频道写成一个文件 (每行一个频道ID)，可用于 sync_daemon.py / work_queue.py 的 --channels-file"""
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for number, day in enumerate(plan['days'], 1):
+        filename = os.path.join(directory, f'day_{number}.txt')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(day['channels']) + '\n')
+        filenames.append(filename)
+    return filenames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='估算多频道运行的API配额、SRT请求数和耗时')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--channels-file', help='频道列表文件，每行一个频道ID')
+    source.add_argument('--channels', nargs='+', help='频道ID')
+    source.add_argument('--spreadsheet-id', help='从Google Sheets读取频道列表')
+    parser.add_argument('--sheet-name', default='Sheet1', help='工作表名称')
+    parser.add_argument('--column-range', default='A:A', help='频道ID所在的列范围')
+    parser.add_argument('--max-videos', type=int, help='每个频道最多获取的视频数量')
+    parser.add_argument('--srt-mode', choices=sorted(SRT_LIMITS), default='skip', help='SRT模式')
+    parser.add_argument('--srt-concurrency', type=int, default=int(os.getenv('SRT_CONCURRENCY', 1)), help='SRT请求并发数')
+    parser.add_argument('--srt-delay', type=float, default=1.0, help='SRT请求间隔（秒）')
+    parser.add_argument('--daily-quota', type=int, help='每个密钥每天的配额 (默认 YOUTUBE_DAILY_QUOTA 或10000)')
+    parser.add_argument('--db', default=os.getenv('CATALOGUE_DB_PATH'), help='目录数据库，用于扣除已完成的SRT')
+    parser.add_argument('--output', help='把计划保存为JSON文件')
+    parser.add_argument('--split-dir', help='把每天的频道列表写到该目录 (day_1.txt, day_2.txt, ...)')
+    args = parser.parse_args()
+
+    api_key = get_api_key()
+    if not api_key:
+        return
+
+    if args.channels_file:
+        from sync_daemon import read_channels_file
+        channel_ids = read_channels_file(args.channels_file)
+    elif args.channels:
+        channel_ids = args.channels
+    else:
+        from get_all_videos import read_channel_ids_from_sheets
+        channel_ids = read_channel_ids_from_sheets(args.spreadsheet_id, args.sheet_name, args.column_range)
+    if not channel_ids:
+        print("❌ 没有频道")
+        return
+
+    store = None
+    if args.db and os.path.exists(args.db):
+        from catalogue_store import CatalogueStore
+        store = CatalogueStore(args.db)
+
+    fetcher = YouTubeVideoFetcher(api_key)
+    plan = build_plan(
+        fetcher, channel_ids, store, max_videos=args.max_videos, srt_mode=args.srt_mode,
+        daily_quota=args.daily_quota, srt_concurrency=args.srt_concurrency, srt_delay=args.srt_delay
+    )
+    print_plan(plan)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+        print(f"💾 计划已保存到: {args.output}")
+    if args.split_dir:
+        for filename in write_day_files(plan, args.split_dir):
+            print(f"📄 {filename}")
+
+    if store:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Google Sheets 结果回写工具
+把每个频道的处理结果（视频数、SRT成功/失败数、最后同步时间、错误信息）
+写回到源工作表中频道ID所在行的旁边，所有写入合并为一次 batch_update 调用
+"""
+
+import re
+import time
+
+# 回写列的标题（按列顺序）
+WRITEBACK_HEADERS = ['video_count', 'srt_success', 'srt_failed', 'last_sync', 'error']
+
+# 可能的标题行内容（与 read_channel_ids_from_sheets 的判断保持一致）
+HEADER_NAMES = ['channel_id', 'channel id', 'youtube_channel_id', 'id']
+
+
+def column_letter_to_index(letters):
+    """把列字母转换为从1开始的列序号，例如 'A' -> 1, 'AB' -> 28"""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    return index
+
+
+def column_index_to_letter(index):
+    """把从1开始的列序号转换为列字母，例如 1 -> 'A', 28 -> 'AB'"""
+    letters = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def parse_column_range(column_range):
+    """
+    解析列范围，返回 (列序号, 起始行号)
+
+    例如 'A:A' -> (1, 1)，'C2:C500' -> (3, 2)
+    """
+    match = re.match(r'^\s*([A-Za-z]+)(\d*)', column_range)
+    if not match:
+        raise ValueError(f"无法解析列范围: {column_range}")
+    column = column_letter_to_index(match.group(1))
+    start_row = int(match.group(2)) if match.group(2) else 1
+    return column, start_row
+
+
+class SheetsWriteback:
+    """
+    批量回写频道处理结果到Google Sheets
+
+    worksheet 只需要提供 get(range) 和 batch_update(data, **kwargs) 两个方法，
+    因此测试时可以用 local_standins.FakeWorksheet 代替 gspread 的 Worksheet
+    """
+
+    def __init__(self, worksheet, column_range="A:A", first_column=None, flush_every=50):
+        """
+        Args:
+            worksheet: gspread Worksheet（或提供相同方法的桩对象）
+            column_range: 频道ID所在的列范围
+            first_column: 回写的起始列字母，默认为频道ID列的下一列
+            flush_every: 累计多少个频道后自动提交一次，None表示只在 flush() 时提交
+        """
+        self.worksheet = worksheet
+        self.column_range = column_range
+        self.flush_every = flush_every
+
+        channel_column, self.start_row = parse_column_range(column_range)
+        if first_column:
+            self.first_column = column_letter_to_index(first_column)
+        else:
+            self.first_column = channel_column + 1
+
+        self.row_by_channel = {}
+        self.header_row = None
+        self.pending = {}
+        self.batch_count = 0
+        self._load_rows()
+
+    def _load_rows(self):
+        """读取一次频道ID列，建立 频道ID -> 行号 的映射"""
+        values = self.worksheet.get(self.column_range)
+        for offset, row in enumerate(values):
+            if not row or not row[0].strip():
+                continue
+            row_number = self.start_row + offset
+            channel_id = row[0].strip()
+            if offset == 0 and channel_id.lower() in HEADER_NAMES:
+                self.header_row = row_number
+                continue
+            # 同一个频道出现多次时以第一次为准
+            self.row_by_channel.setdefault(channel_id, row_number)
+
+    def _row_range(self, row_number):
+        """返回某一行回写区域的A1范围"""
+        first = column_index_to_letter(self.first_column)
+        last = column_index_to_letter(self.first_column + len(WRITEBACK_HEADERS) - 1)
+        return f"{first}{row_number}:{last}{row_number}"
+
+    def record(self, channel_id, video_count=0, srt_success=0, srt_failed=0, error=None, synced_at=None):
+        """
+        记录一个频道的处理结果（只缓存，不立即写入）
+
+        Returns:
+            是否找到了该频道所在的行
+        """
+        row_number = self.row_by_channel.get(channel_id)
+        if row_number is None:
+            print(f"⚠️  回写时在工作表中找不到频道: {channel_id}")
+            return False
+
+        if synced_at is None:
+            synced_at = time.time()
+        last_sync = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(synced_at))
+
+        self.pending[row_number] = [video_count, srt_success, srt_failed, last_sync, error or '']
+
+        if self.flush_every and len(self.pending) >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self):
+        """把缓存的所有结果用一次 batch_update 写入工作表"""
+        if not self.pending:
+            return 0
+
+        data = []
+        if self.header_row is not None and self.batch_count == 0:
+            data.append({'range': self._row_range(self.header_row), 'values': [WRITEBACK_HEADERS]})
+        for row_number in sorted(self.pending):
+            data.append({'range': self._row_range(row_number), 'values': [self.pending[row_number]]})
+
+        try:
+            self.worksheet.batch_update(data, value_input_option='RAW')
+        except Exception as e:
+            print(f"⚠️  回写Google Sheets失败: {e}")
+            return 0
+
+        written = len(self.pending)
+        self.pending = {}
+        self.batch_count += 1
+        print(f"📝 已回写 {written} 个频道的结果到Google Sheets")
+        return written
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SRT字幕解析和规范化工具
+直接从字节流解析字幕条目，用紧凑的数组结构保存（时间为整数毫秒，文本为同一个缓冲区中的偏移），
+支持修正时间轴重叠、自动识别编码，并可以重新输出为SRT或WebVTT
+"""
+
+import re
+import codecs
+from array import array
+
+# 字幕条目：可选的序号行 + 时间轴行 + 文本（到空行为止）
+# 文本可以为空：时间轴行后面紧跟空行时条目到此结束，不会把下一条吞进文本
+CUE_PATTERN = re.compile(
+    r'(?:^|\n)[ \t]*(?:\d+[ \t]*\n)?[ \t]*'
+    r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})[ \t]*-->[ \t]*'
+    r'(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})[^\n]*'
+    r'(?:\n(?![ \t]*\n)(.*?))?(?=\n[ \t]*\n|\Z)',
+    re.DOTALL
+)
+
+# 没有BOM时依次尝试的编码
+FALLBACK_ENCODINGS = ['utf-8', 'gb18030', 'cp1252']
+
+
+def decode_srt_bytes(data: bytes) -> str:
+    """
+    把SRT文件内容解码为字符串
+
+    先根据BOM判断UTF-8/UTF-16/UTF-32，没有BOM时依次尝试 UTF-8、GB18030、CP1252
+    """
+    for bom, encoding in (
+        (codecs.BOM_UTF32_LE, 'utf-32-le'),
+        (codecs.BOM_UTF32_BE, 'utf-32-be'),
+        (codecs.BOM_UTF8, 'utf-8'),
+        (codecs.BOM_UTF16_LE, 'utf-16-le'),
+        (codecs.BOM_UTF16_BE, 'utf-16-be'),
+    ):
+        if data.startswith(bom):
+            return data[len(bom):].decode(encoding, errors='replace')
+
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def _to_ms(hours, minutes, seconds, fraction):
+    # 毫秒部分可能只有1-2位，例如 ",5" 表示500毫秒
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, '0'))
+
+
+def _format_time(milliseconds, separator):
+    seconds, ms = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def format_srt_time(milliseconds):
+    """毫秒 -> SRT时间格式 HH:MM:SS,mmm"""
+    return _format_time(milliseconds, ',')
+
+
+def format_vtt_time(milliseconds):
+    """毫秒 -> WebVTT时间格式 HH:MM:SS.mmm"""
+    return _format_time(milliseconds, '.')
+
+
+class Cue:
+    """单个字幕条目（CueList 按需生成的只读视图）"""
+
+    __slots__ = ('start_ms', 'end_ms', 'text')
+
+    def __init__(self, start_ms, end_ms, text):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+
+    def __repr__(self):
+        return f"Cue({format_srt_time(self.start_ms)} --> {format_srt_time(self.end_ms)}, {self.text!r})"
+
+
+class CueList:
+    """
+    紧凑的字幕条目列表
+
+    开始/结束时间保存在 array('q') 中，所有文本拼接在一个字符串缓冲区里，
+    每个条目只记录文本在缓冲区中的结束偏移，避免为每条字幕创建多个Python对象
+    """
+
+    __slots__ = ('starts', 'ends', 'offsets', 'buffer')
+
+    def __init__(self, starts=None, ends=None, offsets=None, buffer=''):
+        self.starts = starts if starts is not None else array('q')
+        self.ends = ends if ends is not None else array('q')
+        # offsets[i] 是第i条文本的起始偏移，offsets[-1] 是缓冲区总长度
+        self.offsets = offsets if offsets is not None else array('q', [0])
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.starts)
+
+    def text(self, index):
+        """第index条字幕的文本"""
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('cue index out of range')
+        return Cue(self.starts[index], self.ends[index], self.text(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Cue(self.starts[index], self.ends[index], self.text(index))
+
+    def iter_tuples(self):
+        """遍历 (开始毫秒, 结束毫秒, 文本)"""
+        starts, ends, offsets, buffer = self.starts, self.ends, self.offsets, self.buffer
+        for index in range(len(starts)):
+            yield starts[index], ends[index], buffer[offsets[index]:offsets[index + 1]]
+
+    def normalize(self, min_duration_ms=1):
+        """
+        规范化时间轴，返回新的 CueList
+
+        - 按开始时间排序
+        - 结束时间晚于下一条开始时间时截断到下一条的开始
+        - 丢弃截断后时长小于 min_duration_ms 的条目和空文本
+        """
+        order = sorted(range(len(self)), key=self.starts.__getitem__)
+        result = CueBuilder()
+        for position, index in enumerate(order):
+            start = self.starts[index]
+            end = self.ends[index]
+            if position + 1 < len(order):
+                end = min(end, self.starts[order[position + 1]])
+            text = self.text(index).strip()
+            if text and end - start >= min_duration_ms:
+                result.add(start, end, text)
+        return result.build()
+
+    def to_srt(self):
+        """输出为SRT文本"""
+        return ''.join(
+            f"{number}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{text}\n\n"
+            for number, (start, end, text) in enumerate(self.iter_tuples(), 1)
+        )
+
+    def to_vtt(self):
+        """输出为WebVTT文本"""
+        return 'WEBVTT\n\n' + ''.join(
+            f"{format_vtt_time(start)} --> {format_vtt_time(end)}\n{text}\n\n"
+            for start, end, text in self.iter_tuples()
+        )
+
+
+class CueBuilder:
+    """逐条追加字幕并生成 CueList"""
+
+    __slots__ = ('starts', 'ends', 'offsets', 'parts', 'length')
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.offsets = array('q', [0])
+        self.parts = []
+        self.length = 0
+
+    def add(self, start_ms, end_ms, text):
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.parts.append(text)
+        self.length += len(text)
+        self.offsets.append(self.length)
+
+    def build(self):
+        return CueList(self.starts, self.ends, self.offsets, ''.join(self.parts))
+
+
+def iter_cues(data):
+    """
+    逐条解析SRT，产出 (开始毫秒, 结束毫秒, 文本)
+
+    Args:
+        data: SRT文件的字节内容或字符串
+    """
+    text = decode_srt_bytes(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    for match in CUE_PATTERN.finditer(text):
+        h1, m1, s1, f1, h2, m2, s2, f2, body = match.groups()
+        body = (body or '').strip()
+        if body:
+            yield _to_ms(h1, m1, s1, f1), _to_ms(h2, m2, s2, f2), body
+
+
+def parse_srt(data) -> CueList:
+    """把SRT的字节内容或字符串解析为 CueList"""
+    builder = CueBuilder()
+    for start_ms, end_ms, text in iter_cues(data):
+        builder.add(start_ms, end_ms, text)
+    return builder.build()
+
+
+def parse_srt_file(path) -> CueList:
+    """读取并解析SRT文件"""
+    with open(path, 'rb') as f:
+        return parse_srt(f.read())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化日志
+- JSON Lines 格式的日志（每条一行，便于用 jq / 日志系统检索）
+- 通过队列把日志交给后台线程写入，业务线程不会被磁盘或终端输出阻塞
+- 日志文件按大小自动轮转
+- 限速的单行进度显示，代替每个视频多行的 print
+
+环境变量:
+    LOG_FORMAT   json 或 text (默认 text)
+    LOG_FILE     日志文件路径，未设置时输出到标准输出
+    LOG_LEVEL    日志级别 (默认 INFO；text格式直接输出到终端时默认 WARNING，只显示失败和进度行)
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# LogRecord 的标准属性，其余属性都视为通过 extra 传入的结构化字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TracebackQueueHandler(logging.handlers.QueueHandler):
+    """
+    保留异常信息的 QueueHandler
+
+    标准的 prepare() 把异常堆栈拼进 msg 后清空 exc_info / exc_text，后台线程的格式化器就拿不到异常了；
+    这里在入队前把堆栈格式化到 exc_text（不把 traceback 对象放进队列），消息本身只做参数替换
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_format=None, log_file=None, level=None, max_bytes=50 * 1024 * 1024, backup_count=5):
+    """
+    配置根日志器：所有日志先进入内存队列，由后台线程写到终端或轮转文件
+
+    Args:
+        log_format: 'json' 或 'text'，默认读取环境变量 LOG_FORMAT
+        log_file: 日志文件路径，默认读取环境变量 LOG_FILE
+        level: 日志级别，默认读取环境变量 LOG_LEVEL
+        max_bytes: 单个日志文件的最大字节数
+        backup_count: 保留的轮转文件数量
+
+    Returns:
+        QueueListener 对象（程序退出时会自动停止并写完剩余日志）
+    """
+    global _listener
+
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower()
+    log_file = log_file or os.getenv('LOG_FILE')
+    level = level or os.getenv('LOG_LEVEL') or ('INFO' if log_format == 'json' or log_file else 'WARNING')
+
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+
+    _stop_listener()
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_TracebackQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.unregister(_stop_listener)
+    atexit.register(_stop_listener)
+    return _listener
+
+
+def _stop_listener():
+    """停止后台日志线程并写完剩余日志（已经停止时什么都不做）"""
+    global _listener
+
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
+
+class ProgressLine:
+    """
+    限速的单行进度显示
+
+    终端中用回车符原地刷新同一行；输出被重定向到文件时，每隔 min_interval 秒写一行
+    """
+
+    def __init__(self, total, label='', min_interval=1.0, stream=None):
+        self.total = total
+        self.label = label
+        self.min_interval = min_interval
+        self.stream = stream or sys.stderr
+        self.is_tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.start_time = time.monotonic()
+        self.last_render = 0.0
+        self.last_width = 0
+
+    def _render(self, done, success, fail):
+        elapsed = time.monotonic() - self.start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - done) / rate if rate > 0 else 0.0
+        percent = (done / self.total) * 100 if self.total else 100.0
+        return (f"{self.label} [{done}/{self.total}] {percent:.1f}% "
+                f"成功:{success} 失败:{fail} {rate:.2f}/s 剩余约{remaining / 60:.1f}分钟")
+
+    def update(self, done, success=0, fail=0, force=False):
+        """更新进度，距离上次输出不足 min_interval 秒时跳过（除非 force）"""
+        now = time.monotonic()
+        if not force and now - self.last_render < self.min_interval:
+            return
+        self.last_render = now
+        line = self._render(done, success, fail)
+        if self.is_tty:
+            padding = ' ' * max(0, self.last_width - len(line))
+            self.stream.write('\r' + line + padding)
+            self.last_width = len(line)
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def finish(self, done, success=0, fail=0):
+        """输出最终进度并换行"""
+        self.update(done, success, fail, force=True)
+        if self.is_tty:
+            self.stream.write('\n')
+            self.stream.flush()
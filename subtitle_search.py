@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕全文检索
+把字幕存储中的SRT按字幕条目（带时间轴）写入SQLite FTS5全文索引，
+可以快速查到哪些视频、在哪个时间点提到了某个词
+
+- 每个视频的字幕条目使用连续的rowid，indexed_videos 记录起始rowid，重新索引时按rowid范围删除
+  (FTS5表中的 video_id 列没有索引，按它删除要扫描所有条目)
+- 增量更新只读取字幕存储中上次更新之后保存的记录 (按 stored_at 水位线)
+
+用法:
+    python subtitle_search.py update --store subtitles
+    python subtitle_search.py query "关键词"
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+
+from subtitle_storage import SubtitleStore, DEFAULT_STORE_DIR
+from srt_parser import parse_srt, format_srt_time
+
+DEFAULT_INDEX_PATH = 'subtitle_search.db'
+
+# 增量更新时把水位线往前放这么多秒，避免漏掉其他进程在同一时刻保存、稍晚才提交的字幕
+# (重叠部分按sha256判断，内容没变的视频不会重复索引)
+WATERMARK_OVERLAP_SECONDS = 60
+
+
+def _has_trigram_tokenizer(conn):
+    """SQLite 3.34+ 支持trigram分词器，可以对中文做子串检索"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class SubtitleSearchIndex:
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        """
+        打开（或创建）字幕全文索引
+
+        Args:
+            db_path: 索引数据库路径
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cues'"
+        ).fetchone()
+        if not exists:
+            # 中文没有空格分词，优先使用trigram分词器；旧版SQLite退回unicode61
+            tokenizer = 'trigram' if _has_trigram_tokenizer(self.conn) else 'unicode61'
+            self.conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE cues USING fts5(
+                    text, video_id UNINDEXED, start_ms UNINDEXED, end_ms UNINDEXED,
+                    tokenize='{tokenizer}'
+                )
+                """
+            )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS indexed_videos (
+                video_id    TEXT PRIMARY KEY,
+                sha256      TEXT,
+                cue_count   INTEGER,
+                indexed_at  REAL,
+                first_rowid INTEGER
+            )
+            """
+        )
+        # 增量更新的水位线：{字幕存储目录: 已经处理到的 stored_at}
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS store_watermarks (
+                store_root TEXT PRIMARY KEY,
+                stored_at  REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(indexed_videos)")}
+        if 'first_rowid' not in columns:
+            # 旧版本的索引没有记录rowid，这些视频重新索引时退回按 video_id 删除
+            with self.conn:
+                self.conn.execute("ALTER TABLE indexed_videos ADD COLUMN first_rowid INTEGER")
+        self.tokenizer = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'cues'"
+        ).fetchone()[0]
+        self.trigram = 'trigram' in self.tokenizer
+
+    def close(self):
+        """关闭索引数据库"""
+        self.conn.close()
+
+    def index_video(self, video_id: str, srt_text: str, sha256: str = None) -> int:
+        """
+        索引（或重新索引）一个视频的字幕
+
+        Returns:
+            写入的字幕条目数量
+        """
+        cues = parse_srt(srt_text)
+        with self.conn:
+            self._delete_cues(video_id)
+            last = self.conn.execute("SELECT rowid FROM cues ORDER BY rowid DESC LIMIT 1").fetchone()
+            first_rowid = (last[0] if last else 0) + 1
+            self.conn.executemany(
+                "INSERT INTO cues (rowid, text, video_id, start_ms, end_ms) VALUES (?, ?, ?, ?, ?)",
+                ((rowid, text.replace('\n', ' '), video_id, start_ms, end_ms)
+                 for rowid, (start_ms, end_ms, text) in enumerate(cues.iter_tuples(), first_rowid))
+            )
+            self.conn.execute(
+                """
+                INSERT INTO indexed_videos (video_id, sha256, cue_count, indexed_at, first_rowid)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    cue_count = excluded.cue_count,
+                    indexed_at = excluded.indexed_at,
+                    first_rowid = excluded.first_rowid
+                """,
+                (video_id, sha256, len(cues), time.time(), first_rowid)
+            )
+        return len(cues)
+
+    def _delete_cues(self, video_id):
+        """删除一个视频已经索引的字幕条目（在 index_video 的事务中调用）"""
+        row = self.conn.execute(
+            "SELECT first_rowid, cue_count FROM indexed_videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if row is None:
+            return
+        first_rowid, cue_count = row
+        if first_rowid is None:
+            self.conn.execute("DELETE FROM cues WHERE video_id = ?", (video_id,))
+        elif cue_count:
+            self.conn.execute(
+                "DELETE FROM cues WHERE rowid BETWEEN ? AND ?", (first_rowid, first_rowid + cue_count - 1)
+            )
+
+    def update_from_store(self, subtitle_store: SubtitleStore) -> int:
+        """
+        增量更新：只读取字幕存储中上次更新之后保存的记录，索引其中新增或内容发生变化的视频
+
+        Returns:
+            本次索引的视频数量
+        """
+        store_root = os.path.abspath(subtitle_store.root)
+        row = self.conn.execute(
+            "SELECT stored_at FROM store_watermarks WHERE store_root = ?", (store_root,)
+        ).fetchone()
+        stored_after = row[0] - WATERMARK_OVERLAP_SECONDS if row else None
+
+        updated = 0
+        watermark = row[0] if row else None
+        for video_id, sha256, stored_at in subtitle_store.entries_since(stored_after):
+            watermark = stored_at if watermark is None else max(watermark, stored_at)
+            indexed = self.conn.execute(
+                "SELECT sha256 FROM indexed_videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if indexed and indexed[0] == sha256:
+                continue
+            srt_text = subtitle_store.load(video_id)
+            if srt_text is None:
+                continue
+            self.index_video(video_id, srt_text, sha256)
+            updated += 1
+
+        if watermark is not None:
+            with self.conn:
+                self.conn.execute(
+                    """
+                    INSERT INTO store_watermarks (store_root, stored_at) VALUES (?, ?)
+                    ON CONFLICT(store_root) DO UPDATE SET stored_at = excluded.stored_at
+                    """,
+                    (store_root, watermark)
+                )
+        return updated
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """
+        检索包含关键词的字幕条目
+
+        Returns:
+            [{'video_id', 'start_ms', 'end_ms', 'time', 'snippet'}]，按相关度排序
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        if self.trigram and len(query) < 3:
+            # trigram索引只能匹配3个字符以上的词，短词退回到逐条扫描
+            rows = self.conn.execute(
+                "SELECT video_id, start_ms, end_ms, text FROM cues WHERE instr(text, ?) > 0 LIMIT ?",
+                (query, limit)
+            )
+        else:
+            # 用双引号包裹，作为短语查询，避免用户输入被当作FTS语法
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = self.conn.execute(
+                """
+                SELECT video_id, start_ms, end_ms, snippet(cues, 0, '[', ']', '…', 16)
+                FROM cues WHERE cues MATCH ? ORDER BY rank LIMIT ?
+                """,
+                (phrase, limit)
+            )
+
+        return [
+            {
+                'video_id': video_id,
+                'start_ms': start_ms,
+                'end_ms': end_ms,
+                'time': format_srt_time(start_ms),
+                'snippet': snippet,
+            }
+            for video_id, start_ms, end_ms, snippet in rows
+        ]
+
+
+def open_search_index():
+    """根据环境变量 SUBTITLE_SEARCH_DB 打开字幕索引，未设置时返回None"""
+    db_path = os.getenv('SUBTITLE_SEARCH_DB')
+    if not db_path:
+        return None
+    return SubtitleSearchIndex(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕全文检索工具')
+    parser.add_argument('--db', default=os.getenv('SUBTITLE_SEARCH_DB', DEFAULT_INDEX_PATH), help='索引数据库路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update = subparsers.add_parser('update', help='从字幕存储增量更新索引')
+    update.add_argument('--store', default=os.getenv('SUBTITLE_STORE_DIR', DEFAULT_STORE_DIR), help='字幕存储目录')
+
+    query = subparsers.add_parser('query', help='检索关键词')
+    query.add_argument('term', help='要检索的词或短语')
+    query.add_argument('--limit', type=int, default=20, help='最多返回多少条')
+
+    args = parser.parse_args()
+    index = SubtitleSearchIndex(args.db)
+
+    if args.command == 'update':
+        store = SubtitleStore(args.store)
+        start_time = time.perf_counter()
+        updated = index.update_from_store(store)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"✅ 索引了 {updated} 个视频的字幕 ({elapsed_ms:.1f} ms)")
+        store.close()
+    elif args.command == 'query':
+        start_time = time.perf_counter()
+        results = index.search(args.term, args.limit)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        for result in results:
+            print(f"{result['video_id']}\t{result['time']}\t{result['snippet']}")
+            print(f"  https://www.youtube.com/watch?v={result['video_id']}&t={result['start_ms'] // 1000}s")
+        print(f"\n🔍 找到 {len(results)} 条结果 ({elapsed_ms:.1f} ms)")
+
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕内容存储
+把SRT提供方返回的字幕文本按内容哈希保存为压缩文件（相同内容只存一份），
+并用一个索引记录 video_id -> 字幕文件 的对应关系，后续任务可以直接在本地读取字幕
+
+安装了 zstandard 时使用zstd压缩，否则使用gzip
+"""
+
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_STORE_DIR = 'subtitles'
+
+# 提供方响应中可能包含字幕文本的字段
+SRT_TEXT_KEYS = ['srt', 'content', 'subtitle', 'subtitles', 'text', 'data', 'result']
+
+# 只查询缓存 (fetch_only) 的响应中表示缓存状态的字段，以及表示没有缓存的取值
+CACHE_STATUS_KEYS = ['status', 'cache_status', 'message']
+CACHE_MISS_VALUES = {'not cached', 'not_cached', 'miss', 'cache_miss'}
+
+
+def extract_srt_text(data):
+    """
+    从SRT提供方的响应中提取字幕文本
+
+    响应可能是字符串、字典或列表，这里递归查找第一个包含SRT时间轴 (-->) 的字符串
+
+    Returns:
+        字幕文本，找不到时返回None
+    """
+    if isinstance(data, str):
+        return data if '-->' in data else None
+    if isinstance(data, dict):
+        for key in SRT_TEXT_KEYS:
+            if key in data:
+                text = extract_srt_text(data[key])
+                if text:
+                    return text
+        return None
+    if isinstance(data, list):
+        for item in data:
+            text = extract_srt_text(item)
+            if text:
+                return text
+    return None
+
+
+def is_cache_miss(data):
+    """
+    只查询缓存 (fetch_only) 的响应是否表示没有缓存
+
+    先看明确的状态字段 (cached 为 false，或 status / cache_status / message 为 "not cached" 等)；
+    没有这些字段时以响应中是否包含字幕文本为准，没有字幕的响应不能当作命中
+
+    Args:
+        data: SRT提供方返回的JSON
+    """
+    if isinstance(data, dict):
+        if data.get('cached') is False:
+            return True
+        for key in CACHE_STATUS_KEYS:
+            value = data.get(key)
+            if isinstance(value, str) and value.strip().lower() in CACHE_MISS_VALUES:
+                return True
+    return extract_srt_text(data) is None
+
+
+class SubtitleStore:
+    def __init__(self, root: str = DEFAULT_STORE_DIR, compression: str = None):
+        """
+        打开（或创建）字幕存储目录
+
+        Args:
+            root: 存储根目录
+            compression: 'zstd' 或 'gzip'，默认有 zstandard 时用zstd
+        """
+        if compression is None:
+            compression = 'zstd' if zstandard else 'gzip'
+        if compression == 'zstd' and not zstandard:
+            raise ImportError("使用zstd压缩需要安装 zstandard: pip install zstandard")
+        if compression not in ('zstd', 'gzip'):
+            raise ValueError(f"不支持的压缩格式: {compression}")
+
+        self.root = root
+        self.compression = compression
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subtitles (
+                video_id    TEXT PRIMARY KEY,
+                sha256      TEXT NOT NULL,
+                compression TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                stored_at   REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_subtitles_sha256 ON subtitles (sha256)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_subtitles_stored_at ON subtitles (stored_at)")
+
+    def close(self):
+        """关闭索引数据库"""
+        self.conn.close()
+
+    def _blob_path(self, sha256, compression):
+        """内容哈希对应的文件路径，按哈希前两位分目录避免单个目录文件过多"""
+        extension = 'zst' if compression == 'zstd' else 'gz'
+        return os.path.join(self.root, 'blobs', sha256[:2], f'{sha256}.srt.{extension}')
+
+    def _compress(self, raw):
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(raw)
+        return gzip.compress(raw, compresslevel=9)
+
+    @staticmethod
+    def _decompress(blob, compression):
+        if compression == 'zstd':
+            if not zstandard:
+                raise ImportError("读取zstd压缩的字幕需要安装 zstandard: pip install zstandard")
+            return zstandard.ZstdDecompressor().decompress(blob)
+        return gzip.decompress(blob)
+
+    def save(self, video_id: str, srt_text: str) -> str:
+        """
+        保存一个视频的字幕文本
+
+        Returns:
+            字幕内容的sha256哈希
+        """
+        raw = srt_text.encode('utf-8')
+        sha256 = hashlib.sha256(raw).hexdigest()
+
+        # 已经有相同内容的文件时只更新索引
+        existing = self.conn.execute(
+            "SELECT compression FROM subtitles WHERE sha256 = ? LIMIT 1", (sha256,)
+        ).fetchone()
+        compression = existing[0] if existing else self.compression
+        path = self._blob_path(sha256, compression)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(self._compress(raw))
+            os.replace(temp_path, path)
+
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO subtitles (video_id, sha256, compression, size, stored_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    compression = excluded.compression,
+                    size = excluded.size,
+                    stored_at = excluded.stored_at
+                """,
+                (video_id, sha256, compression, len(raw), time.time())
+            )
+        return sha256
+
+    def save_response(self, video_id: str, data) -> bool:
+        """从提供方的响应中提取字幕并保存，响应中没有字幕文本时返回False"""
+        srt_text = extract_srt_text(data)
+        if not srt_text:
+            return False
+        self.save(video_id, srt_text)
+        return True
+
+    def has(self, video_id: str) -> bool:
+        """是否已经保存了该视频的字幕"""
+        return self.conn.execute(
+            "SELECT 1 FROM subtitles WHERE video_id = ?", (video_id,)
+        ).fetchone() is not None
+
+    def load(self, video_id: str):
+        """读取一个视频的字幕文本，不存在时返回None"""
+        row = self.conn.execute(
+            "SELECT sha256, compression FROM subtitles WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if not row:
+            return None
+        with open(self._blob_path(row[0], row[1]), 'rb') as f:
+            return self._decompress(f.read(), row[1]).decode('utf-8')
+
+    def entries(self):
+        """遍历索引中的所有 (video_id, sha256) 记录"""
+        return self.conn.execute("SELECT video_id, sha256 FROM subtitles ORDER BY video_id").fetchall()
+
+    def entries_since(self, stored_after: float = None):
+        """
+        在某个时间之后保存（或更新）的 (video_id, sha256, stored_at) 记录，按保存时间排序
+
+        Args:
+            stored_after: 时间戳，None表示所有记录
+        """
+        if stored_after is None:
+            return self.conn.execute(
+                "SELECT video_id, sha256, stored_at FROM subtitles ORDER BY stored_at"
+            ).fetchall()
+        return self.conn.execute(
+            "SELECT video_id, sha256, stored_at FROM subtitles WHERE stored_at > ? ORDER BY stored_at",
+            (stored_after,)
+        ).fetchall()
+
+
+def open_subtitle_store():
+    """根据环境变量 SUBTITLE_STORE_DIR 打开字幕存储，未设置时返回None"""
+    root = os.getenv('SUBTITLE_STORE_DIR')
+    if not root:
+        return None
+    return SubtitleStore(root)
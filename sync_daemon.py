@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道持续同步守护进程
+常驻运行，按各自的间隔轮询关注列表中的频道：
+- 每次轮询只增量获取新上传的视频：先读取频道的RSS订阅源（不消耗API配额），
+  只有订阅源覆盖不到时才调用API翻页（遇到目录中已有的视频就停止）
+- 同时到期的多个频道并发下载订阅源
+- 为新视频请求SRT字幕，之前请求失败（或写入目录后还没来得及请求）的视频在之后的轮询中重试
+- 轮询间隔根据频道最近的发布频率自动调整，经常更新的频道轮询更频繁，长期不更新的频道很少轮询
+- 收到 SIGTERM / SIGINT 后处理完当前频道再退出
+
+关注列表可以来自文本文件（每行一个频道ID）、命令行或Google Sheets，每隔一段时间重新读取一次；
+视频和SRT结果保存在目录数据库中，重启后根据每个频道的上次同步时间继续调度
+
+用法:
+    python sync_daemon.py --channels-file channels.txt
+    python sync_daemon.py --spreadsheet-id <ID> --sheet-name Sheet1 --column-range A:A
+    python sync_daemon.py --channels UCxxxx UCyyyy --once
+"""
+
+import os
+import time
+import heapq
+import signal
+import logging
+import argparse
+import threading
+
+from youtube_video_fetcher import YouTubeVideoFetcher, get_api_key
+from channel_feeds import fetch_feeds
+from catalogue_store import CatalogueStore, DEFAULT_DB_PATH
+from video_records import parse_timestamp
+from pipeline_metrics import metrics
+from structured_logging import setup_logging
+
+logger = logging.getLogger('youtube_srt.sync')
+
+DEFAULT_MIN_INTERVAL = 300        # 最短5分钟轮询一次
+DEFAULT_MAX_INTERVAL = 86400      # 最长1天轮询一次
+DEFAULT_WATCHLIST_REFRESH = 3600  # 每小时重新读取一次关注列表
+
+# 轮询间隔为预计发布间隔的 1/POLL_DIVISOR，新视频平均在发布间隔的 1/20 时间内被发现
+POLL_DIVISOR = 10
+# 用最近多少个视频估算发布频率
+CADENCE_SAMPLE = 10
+# 一次最多并发下载多少个到期频道的订阅源
+FEED_PREFETCH_BATCH = 50
+# 每次轮询一个频道最多请求多少个视频的SRT，其余的留到之后的轮询
+DEFAULT_SRT_LIMIT = 50
+
+
+def read_channels_file(path):
+    """从文本文件读取频道ID，每行一个，# 开头的行为注释"""
+    channel_ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            channel_id = line.split('#', 1)[0].strip()
+            if channel_id:
+                channel_ids.append(channel_id)
+    return channel_ids
+
+
+def estimate_poll_interval(published_timestamps, now, min_interval, max_interval):
+    """
+    根据最近视频的发布时间估算轮询间隔
+
+    预计发布间隔取最近视频的平均间隔和距最近一次发布的时间中较大的值，
+    这样很久没有更新的频道即使以前更新很频繁，也会逐渐降低轮询频率
+
+    Args:
+        published_timestamps: 最近视频的发布时间戳
+        now: 当前时间戳
+        min_interval: 最短轮询间隔（秒）
+        max_interval: 最长轮询间隔（秒）
+    """
+    if not published_timestamps:
+        return max_interval
+    newest = max(published_timestamps)
+    oldest = min(published_timestamps)
+    if len(published_timestamps) > 1:
+        average_gap = (newest - oldest) / (len(published_timestamps) - 1)
+    else:
+        average_gap = max_interval * POLL_DIVISOR
+    expected_gap = max(average_gap, now - newest)
+    return max(min_interval, min(max_interval, expected_gap / POLL_DIVISOR))
+
+
+class SyncDaemon:
+    def __init__(self, fetcher, store, channel_source, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, watchlist_refresh=DEFAULT_WATCHLIST_REFRESH,
+                 srt_delay=1.0, srt_concurrency=1, backfill=False, subtitle_store=None, search_index=None,
+                 srt_limit=DEFAULT_SRT_LIMIT):
+        """
+        Args:
+            fetcher: YouTubeVideoFetcher 实例
+            store: CatalogueStore 实例，保存视频列表、SRT结果和每个频道的上次同步时间
+            channel_source: 无参数函数，返回关注的频道ID列表（读取失败时返回None）
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            watchlist_refresh: 重新读取关注列表的间隔（秒）
+            srt_delay: SRT请求间隔（秒）
+            srt_concurrency: SRT请求并发数
+            backfill: 第一次同步一个频道时是否为所有已有视频请求SRT（默认只记录视频列表）
+            subtitle_store: 字幕存储，传入时保存返回的字幕文本
+            search_index: 字幕全文索引，与 subtitle_store 一起传入时增量更新索引
+            srt_limit: 每次轮询一个频道最多请求多少个视频的SRT，0或None表示不限
+        """
+        self.fetcher = fetcher
+        self.store = store
+        self.channel_source = channel_source
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.watchlist_refresh = watchlist_refresh
+        self.srt_delay = srt_delay
+        self.srt_concurrency = srt_concurrency
+        self.backfill = backfill
+        self.subtitle_store = subtitle_store
+        self.search_index = search_index
+        self.srt_limit = srt_limit
+
+        self.stop_event = threading.Event()
+        self.watched = set()
+        self.intervals = {}
+        self.next_due = {}
+        self._schedule = []  # (到期时间, 频道ID) 的最小堆，过期条目在取出时跳过
+
+    def stop(self, signum=None, frame=None):
+        """请求停止（可直接用作信号处理函数），当前频道处理完后退出"""
+        if not self.stop_event.is_set():
+            logger.warning("收到停止信号，处理完当前频道后退出", extra={'signal': signum})
+        self.stop_event.set()
+
+    def _schedule_channel(self, channel_id, due):
+        self.next_due[channel_id] = due
+        heapq.heappush(self._schedule, (due, channel_id))
+
+    def _recent_timestamps(self, channel_id):
+        videos = self.store.get_channel_videos(channel_id, limit=CADENCE_SAMPLE)
+        timestamps = (parse_timestamp(video['published_at']) for video in videos)
+        return [timestamp for timestamp in timestamps if timestamp is not None]
+
+    def load_watchlist(self):
+        """读取关注列表：新频道按上次同步时间加入调度，已移除的频道不再轮询"""
+        channel_ids = self.channel_source()
+        if channel_ids is None:
+            logger.warning("读取关注列表失败，继续使用当前列表", extra={'channels': len(self.watched)})
+            return
+
+        now = time.time()
+        added = [channel_id for channel_id in channel_ids if channel_id not in self.watched]
+        removed = self.watched - set(channel_ids)
+        for channel_id in added:
+            interval = estimate_poll_interval(
+                self._recent_timestamps(channel_id), now, self.min_interval, self.max_interval
+            )
+            self.intervals[channel_id] = interval
+            channel = self.store.get_channel(channel_id)
+            last_sync = channel['last_sync'] if channel and channel['last_sync'] else 0
+            self._schedule_channel(channel_id, max(now, last_sync + interval))
+        for channel_id in removed:
+            self.next_due.pop(channel_id, None)
+
+        self.watched = set(channel_ids)
+        logger.info(
+            f"关注列表: {len(self.watched)} 个频道 (新增 {len(added)}, 移除 {len(removed)})",
+            extra={'channels': len(self.watched), 'added': len(added), 'removed': len(removed)}
+        )
+
+    def prefetch_feeds(self, channel_ids):
+        """
+        并发下载多个频道的订阅源
+
+        Returns:
+            {频道ID: 订阅源视频列表}，未启用订阅源时返回空字典
+        """
+        if not getattr(self.fetcher, 'use_feed', False):
+            return {}
+        # 第一次同步的频道需要完整列表，不读取订阅源
+        synced = [channel_id for channel_id in channel_ids if self.store.get_channel(channel_id)]
+        return fetch_feeds(synced) if len(synced) > 1 else {}
+
+    def poll_channel(self, channel_id, feed_videos=None):
+        """
+        增量同步一个频道并为新视频请求SRT
+
+        Args:
+            channel_id: 频道ID
+            feed_videos: 预先下载的订阅源（prefetch_feeds 的结果）
+
+        Returns:
+            新视频数量，找不到频道时返回None
+        """
+        # 延迟导入，get_all_videos 导入时需要 gspread 等依赖
+        from get_all_videos import get_channel_info, batch_request_srt
+
+        known_video_ids = self.store.get_known_video_ids(channel_id)
+        new_videos = self.fetcher.get_new_videos(channel_id, known_video_ids, feed_videos=feed_videos)
+        if new_videos is None:
+            return None
+
+        channel_info = get_channel_info(self.fetcher, channel_id)
+        self.store.upsert_channel(channel_info, len(known_video_ids) + len(new_videos))
+        if new_videos:
+            self.store.upsert_videos(channel_id, new_videos)
+        metrics.increment('sync_polls')
+        metrics.increment('sync_new_videos', len(new_videos))
+
+        # 视频写入目录后再从目录中取还没有成功SRT的视频：包括这次的新视频、之前失败的视频，
+        # 以及上次写入目录后、请求SRT前进程退出而遗漏的视频
+        # 第一次同步时 (目录中还没有视频) 默认只记录视频列表，之后也不为第一次同步时的历史视频请求SRT
+        srt_videos = []
+        if known_video_ids or self.backfill:
+            srt_videos = self.store.videos_missing_srt(
+                channel_id, include_failed=True, limit=self.srt_limit or None,
+                first_seen_after=None if self.backfill else self.store.channel_first_seen(channel_id)
+            )
+        if srt_videos:
+            srt_results = batch_request_srt(
+                srt_videos, channel_info, delay=self.srt_delay,
+                subtitle_store=self.subtitle_store, concurrency=self.srt_concurrency
+            )
+            self.store.upsert_srt_results(srt_results)
+            if self.subtitle_store and self.search_index:
+                self.search_index.update_from_store(self.subtitle_store)
+
+        return len(new_videos)
+
+    def run_once(self, channel_id, feed_videos=None):
+        """轮询一个频道并安排下一次轮询"""
+        start_time = time.time()
+        try:
+            new_count = self.poll_channel(channel_id, feed_videos)
+        except Exception as e:
+            # 出错时 (配额、网络等) 加倍间隔后重试
+            interval = min(self.max_interval, self.intervals.get(channel_id, self.min_interval) * 2)
+            logger.warning(
+                f"同步频道 {channel_id} 出错: {e}，{interval / 60:.0f} 分钟后重试",
+                extra={'channel_id': channel_id, 'error_class': type(e).__name__, 'next_poll_seconds': interval}
+            )
+        else:
+            if new_count is None:
+                interval = self.max_interval
+                logger.warning(f"找不到频道 {channel_id}", extra={'channel_id': channel_id})
+            else:
+                interval = estimate_poll_interval(
+                    self._recent_timestamps(channel_id), time.time(), self.min_interval, self.max_interval
+                )
+                logger.info(
+                    f"频道 {channel_id}: {new_count} 个新视频，{interval / 60:.0f} 分钟后再次轮询",
+                    extra={
+                        'channel_id': channel_id, 'new_videos': new_count, 'next_poll_seconds': round(interval),
+                        'duration_ms': round((time.time() - start_time) * 1000, 1),
+                    }
+                )
+
+        self.intervals[channel_id] = interval
+        if channel_id in self.watched:
+            self._schedule_channel(channel_id, time.time() + interval)
+
+        metrics_filename = os.getenv('PIPELINE_METRICS_FILE')
+        if metrics.enabled and metrics_filename:
+            metrics.save(metrics_filename)
+
+    def run(self, once=False):
+        """
+        主循环，直到调用 stop() 为止
+
+        Args:
+            once: 只把关注列表中的每个频道同步一次后退出
+        """
+        self.load_watchlist()
+        next_refresh = time.time() + self.watchlist_refresh
+
+        if once:
+            channel_ids = sorted(self.watched)
+            for start in range(0, len(channel_ids), FEED_PREFETCH_BATCH):
+                batch = channel_ids[start:start + FEED_PREFETCH_BATCH]
+                feeds = self.prefetch_feeds(batch)
+                for channel_id in batch:
+                    if self.stop_event.is_set():
+                        return
+                    self.run_once(channel_id, feeds.get(channel_id))
+            return
+
+        while not self.stop_event.is_set():
+            now = time.time()
+            if now >= next_refresh:
+                self.load_watchlist()
+                next_refresh = now + self.watchlist_refresh
+
+            if not self._schedule:
+                self.stop_event.wait(next_refresh - now)
+                continue
+
+            due, channel_id = self._schedule[0]
+            if self.next_due.get(channel_id) != due:
+                heapq.heappop(self._schedule)  # 已移除或重新调度的频道
+                continue
+            if due > now:
+                self.stop_event.wait(min(due, next_refresh) - now)
+                continue
+
+            # 取出所有已到期的频道，一起下载订阅源
+            due_channels = []
+            while self._schedule and self._schedule[0][0] <= now and len(due_channels) < FEED_PREFETCH_BATCH:
+                due, channel_id = heapq.heappop(self._schedule)
+                if self.next_due.get(channel_id) == due and channel_id not in due_channels:
+                    due_channels.append(channel_id)
+            feeds = self.prefetch_feeds(due_channels)
+            for channel_id in due_channels:
+                if self.stop_event.is_set():
+                    break
+                self.run_once(channel_id, feeds.get(channel_id))
+
+        logger.warning("同步守护进程已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='频道持续同步守护进程')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--channels-file', help='关注列表文件，每行一个频道ID')
+    source.add_argument('--channels', nargs='+', help='关注的频道ID')
+    source.add_argument('--spreadsheet-id', help='从Google Sheets读取关注列表')
+    parser.add_argument('--sheet-name', default='Sheet1', help='工作表名称')
+    parser.add_argument('--column-range', default='A:A', help='频道ID所在的列范围')
+    parser.add_argument('--db', default=os.getenv('CATALOGUE_DB_PATH', DEFAULT_DB_PATH), help='目录数据库路径')
+    parser.add_argument('--min-interval', type=float, default=float(os.getenv('SYNC_MIN_INTERVAL', DEFAULT_MIN_INTERVAL)),
+                        help='最短轮询间隔（秒）')
+    parser.add_argument('--max-interval', type=float, default=float(os.getenv('SYNC_MAX_INTERVAL', DEFAULT_MAX_INTERVAL)),
+                        help='最长轮询间隔（秒）')
+    parser.add_argument('--watchlist-refresh', type=float, default=DEFAULT_WATCHLIST_REFRESH,
+                        help='重新读取关注列表的间隔（秒）')
+    parser.add_argument('--srt-delay', type=float, default=1.0, help='SRT请求间隔（秒）')
+    parser.add_argument('--srt-concurrency', type=int, default=1, help='SRT请求并发数')
+    parser.add_argument('--backfill', action='store_true', help='第一次同步频道时为所有已有视频请求SRT')
+    parser.add_argument('--srt-limit', type=int, default=int(os.getenv('SYNC_SRT_LIMIT', DEFAULT_SRT_LIMIT)),
+                        help='每次轮询一个频道最多请求多少个视频的SRT (0表示不限)')
+    parser.add_argument('--once', action='store_true', help='每个频道只同步一次后退出')
+    parser.add_argument('--no-feed', action='store_true', help='不使用RSS订阅源，每次轮询都调用API')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    api_key = get_api_key()
+    if not api_key:
+        return
+
+    if args.channels_file:
+        def channel_source():
+            try:
+                return read_channels_file(args.channels_file)
+            except OSError as e:
+                logger.warning(f"读取关注列表文件失败: {e}")
+                return None
+    elif args.channels:
+        def channel_source():
+            return args.channels
+    else:
+        def channel_source():
+            from get_all_videos import read_channel_ids_from_sheets
+            return read_channel_ids_from_sheets(args.spreadsheet_id, args.sheet_name, args.column_range)
+
+    from subtitle_storage import open_subtitle_store
+    from subtitle_search import open_search_index
+
+    store = CatalogueStore(args.db)
+    subtitle_store = open_subtitle_store()
+    search_index = open_search_index()
+
+    daemon = SyncDaemon(
+        YouTubeVideoFetcher(api_key, use_feed=False if args.no_feed else None), store, channel_source,
+        min_interval=args.min_interval, max_interval=args.max_interval,
+        watchlist_refresh=args.watchlist_refresh, srt_delay=args.srt_delay,
+        srt_concurrency=args.srt_concurrency, backfill=args.backfill,
+        subtitle_store=subtitle_store, search_index=search_index, srt_limit=args.srt_limit
+    )
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    try:
+        daemon.run(once=args.once)
+    finally:
+        store.close()
+        if subtitle_store:
+            subtitle_store.close()
+        if search_index:
+            search_index.close()
+
+
+if __name__ == "__main__":
+    main()
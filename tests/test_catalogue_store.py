@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from catalogue_store import CatalogueStore
+
+CHANNEL_ID = 'UCaaaaaaaaaaaaaaaaaaaaaa'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CatalogueStore(str(tmp_path / 'catalogue.db'))
+    store.upsert_videos(CHANNEL_ID, [
+        {'video_id': 'vid1', 'title': '视频 1', 'published_at': '2025-05-01T00:00:00Z'},
+        {'video_id': 'vid2', 'title': '视频 2', 'published_at': '2025-05-02T00:00:00Z'},
+    ])
+    yield store
+    store.close()
+
+
+def srt_record(video_id, success, srt='1\n00:00:01,000 --> 00:00:02,000\n字幕\n'):
+    result = ({'success': True, 'data': {'srt': srt}, 'status_code': 200} if success
+              else {'success': False, 'error': 'HTTP 500', 'status_code': 500})
+    return {'channel_id': CHANNEL_ID, 'video_id': video_id, 'request_result': result}
+
+
+def srt_row(store, video_id):
+    return store.conn.execute("SELECT * FROM srt_requests WHERE video_id = ?", (video_id,)).fetchone()
+
+
+def test_failure_does_not_overwrite_success(store):
+    store.upsert_srt_results([srt_record('vid1', True)])
+    store.upsert_srt_results([srt_record('vid1', False)])
+
+    row = srt_row(store, 'vid1')
+    assert row['success'] == 1
+    assert row['status_code'] == 200
+    assert row['error'] is None
+    assert store.get_srt_done_ids(CHANNEL_ID) == {'vid1'}
+    assert [video['video_id'] for video in store.videos_missing_srt(CHANNEL_ID)] == ['vid2']
+
+
+def test_success_replaces_failure_and_newer_success_is_kept(store):
+    store.upsert_srt_results([srt_record('vid2', False)])
+    assert srt_row(store, 'vid2')['success'] == 0
+
+    store.upsert_srt_results([srt_record('vid2', True, srt='旧')])
+    store.upsert_srt_results([srt_record('vid2', True, srt='新')])
+    row = srt_row(store, 'vid2')
+    assert row['success'] == 1
+    assert '新' in row['response']
+    assert [video['video_id'] for video in store.videos_missing_srt(CHANNEL_ID)] == ['vid1']
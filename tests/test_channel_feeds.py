@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from channel_feeds import FEED_WINDOW, fetch_feed
+from local_standins import FakeYouTubeResource, fake_video_id
+from youtube_video_fetcher import YouTubeVideoFetcher
+
+FEEDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'feeds')
+
+# fixtures/feeds/UCfixturefeed0000000000A.xml 是这个40个视频的虚拟频道最新15个视频的订阅源
+CHANNEL_ID = 'UCfixturefeed0000000000A'
+TOTAL_VIDEOS = 40
+
+
+def video_id(number):
+    """虚拟频道第number个视频（1最早）的ID"""
+    return fake_video_id('UU' + CHANNEL_ID[2:], number)
+
+
+def known_up_to(number):
+    return {video_id(n) for n in range(1, number + 1)}
+
+
+@pytest.fixture(autouse=True)
+def local_feeds(monkeypatch):
+    monkeypatch.setenv('FEED_URL_TEMPLATE', 'file://' + FEEDS_DIR + '/{channel_id}.xml')
+
+
+@pytest.fixture
+def resource():
+    return FakeYouTubeResource(videos_per_channel=TOTAL_VIDEOS)
+
+
+def make_fetcher(resource, use_feed):
+    return YouTubeVideoFetcher('test-key', youtube=resource, page_delay=0, use_feed=use_feed)
+
+
+def test_fixture_feed_is_parsed():
+    videos = fetch_feed(CHANNEL_ID)
+    assert len(videos) == FEED_WINDOW
+    assert videos[0].video_id == video_id(TOTAL_VIDEOS)
+    assert videos[0].title == f'虚拟视频 {TOTAL_VIDEOS}'
+    assert videos[0].published_at == '2025-05-24T00:00:00Z'
+
+
+def test_feed_reaching_known_video_skips_api(resource):
+    new_videos = make_fetcher(resource, use_feed=True).get_new_videos(CHANNEL_ID, known_up_to(35))
+
+    assert [video.video_id for video in new_videos] == [video_id(n) for n in range(40, 35, -1)]
+    assert 'playlistItems.list' not in resource.calls
+
+
+def test_feed_not_reaching_known_video_falls_back_to_api(resource):
+    new_videos = make_fetcher(resource, use_feed=True).get_new_videos(CHANNEL_ID, known_up_to(20))
+
+    assert [video.video_id for video in new_videos] == [video_id(n) for n in range(40, 20, -1)]
+    assert resource.calls.get('playlistItems.list', 0) > 0
+
+
+def test_missing_feed_falls_back_to_api(resource):
+    channel_id = 'UCnofeed000000000000000A'
+    known = {fake_video_id('UU' + channel_id[2:], n) for n in range(1, 39)}
+    new_videos = make_fetcher(resource, use_feed=True).get_new_videos(channel_id, known)
+
+    assert len(new_videos) == 2
+    assert resource.calls.get('playlistItems.list', 0) > 0
+
+
+def test_feed_records_match_api_records(resource):
+    known = known_up_to(30)
+    from_feed = make_fetcher(resource, use_feed=True).get_new_videos(CHANNEL_ID, known)
+    assert 'playlistItems.list' not in resource.calls
+    from_api = make_fetcher(resource, use_feed=False).get_new_videos(CHANNEL_ID, known)
+
+    assert len(from_feed) == 10
+    assert from_feed == from_api
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import sys
+
+import pytest
+
+import columnar_export
+from columnar_export import append_to_dataset
+
+CHANNEL_ID = 'UCaaaaaaaaaaaaaaaaaaaaaa'
+
+
+def make_video(number, title=None):
+    return {'video_id': f'vid{number:08d}', 'title': title or f'视频 {number}',
+            'published_at': f'2025-05-{number:02d}T00:00:00Z'}
+
+
+def make_result(number, success):
+    return {'channel_id': CHANNEL_ID, 'video_id': f'vid{number:08d}', 'title': f'视频 {number}',
+            'published_at': f'2025-05-{number:02d}T00:00:00Z',
+            'request_result': {'success': success, 'status_code': 200 if success else 500}}
+
+
+@pytest.fixture
+def pickle_parquet(monkeypatch):
+    """用 pickle 代替 Parquet 读写，只测试分区和去重逻辑"""
+    def write(columns, fields, filename, compression=None):
+        with open(filename, 'wb') as f:
+            pickle.dump(columns, f)
+
+    def read(filename, fields):
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+
+    monkeypatch.setattr(columnar_export, 'write_parquet', write)
+    monkeypatch.setattr(columnar_export, 'read_parquet', read)
+    return read
+
+
+def test_same_day_runs_do_not_duplicate(tmp_path, pickle_parquet):
+    root = str(tmp_path)
+    append_to_dataset([make_video(2), make_video(1)], root, CHANNEL_ID, date='2025-05-25')
+    filename = append_to_dataset([make_video(3), make_video(2, '新标题'), make_video(1)], root, CHANNEL_ID,
+                                 date='2025-05-25')
+
+    assert os.listdir(os.path.dirname(filename)) == ['part-0.parquet']
+    columns = pickle_parquet(filename, None)
+    assert columns['video_id'] == ['vid00000002', 'vid00000001', 'vid00000003']
+    assert columns['title'][0] == '新标题'
+    assert 'channel_id' not in columns
+
+    # 不同日期是各自的分区
+    other = append_to_dataset([make_video(1)], root, CHANNEL_ID, date='2025-05-26')
+    assert other != filename
+    assert pickle_parquet(other, None)['video_id'] == ['vid00000001']
+
+
+def test_retried_srt_result_replaces_failure(tmp_path, pickle_parquet):
+    root = str(tmp_path)
+    append_to_dataset([make_result(1, True), make_result(2, False)], root, CHANNEL_ID, 'srt_results',
+                      date='2025-05-25')
+    filename = append_to_dataset([make_result(2, True)], root, CHANNEL_ID, 'srt_results', date='2025-05-25')
+
+    columns = pickle_parquet(filename, None)
+    assert columns['video_id'] == ['vid00000001', 'vid00000002']
+    assert columns['success'] == [True, True]
+
+
+def test_legacy_part_files_are_merged(tmp_path, pickle_parquet):
+    root = str(tmp_path)
+    partition = tmp_path / 'videos' / f'channel_id={CHANNEL_ID}' / 'date=2025-05-25'
+    partition.mkdir(parents=True)
+    for number in (1, 2):
+        columns = columnar_export.video_columns([make_video(number)])
+        columnar_export.write_parquet(columns, columnar_export.VIDEO_FIELDS, str(partition / f'part-{number}.parquet'))
+
+    filename = append_to_dataset([make_video(2)], root, CHANNEL_ID, date='2025-05-25')
+    assert os.listdir(str(partition)) == ['part-0.parquet']
+    assert pickle_parquet(filename, None)['video_id'] == ['vid00000001', 'vid00000002']
+
+
+def test_missing_parquet_libraries(tmp_path, monkeypatch):
+    for module in ('pyarrow', 'pyarrow.parquet', 'pandas'):
+        monkeypatch.setitem(sys.modules, module, None)
+    with pytest.raises(ImportError, match='pyarrow 或 pandas'):
+        append_to_dataset([make_video(1)], str(tmp_path), CHANNEL_ID, date='2025-05-25')
+
+
+def test_pandas_fallback_round_trip(tmp_path, monkeypatch):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('fastparquet')
+    # 屏蔽 pyarrow，走 pandas + fastparquet 的写入和读取路径
+    for module in ('pyarrow', 'pyarrow.parquet'):
+        monkeypatch.setitem(sys.modules, module, None)
+
+    root = str(tmp_path)
+    append_to_dataset([make_result(1, True), make_result(2, False)], root, CHANNEL_ID, 'srt_results',
+                      date='2025-05-25', compression='gzip')
+    filename = append_to_dataset([make_result(2, True), make_result(3, False)], root, CHANNEL_ID, 'srt_results',
+                                 date='2025-05-25', compression='gzip')
+
+    frame = pd.read_parquet(filename)
+    assert frame['video_id'].tolist() == ['vid00000001', 'vid00000002', 'vid00000003']
+    assert frame['success'].tolist() == [True, True, False]
+    assert frame['published_at'].iloc[0] == pd.Timestamp('2025-05-01', tz='UTC')
+    assert frame['status_code'].tolist() == [200, 200, 500]
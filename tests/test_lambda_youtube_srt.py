@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import lambda_youtube_srt
+
+SRT = "1\n00:00:01,000 --> 00:00:02,000\n字幕\n\n"
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """代替SRT提供方：probe 返回 probes[video_id]，failing 中的视频请求失败，记录每次请求 (video_id, fetch_only)"""
+    class Provider:
+        def __init__(self):
+            self.probes = {}
+            self.failing = set()
+            self.sent = []
+
+        def request(self, video_id, fetch_only=False):
+            self.sent.append((video_id, fetch_only))
+            if video_id in self.failing:
+                return {'success': False, 'error': 'HTTP 500', 'status_code': 500}
+            data = self.probes.get(video_id, {'youtube_id': video_id, 'srt': SRT}) if fetch_only \
+                else {'youtube_id': video_id, 'srt': SRT}
+            return {'success': True, 'data': data, 'status_code': 200}
+
+    provider = Provider()
+    monkeypatch.setattr(lambda_youtube_srt, 'request_srt_for_video', provider.request)
+    return provider
+
+
+@pytest.mark.parametrize('probe_data, generated', [
+    ({'youtube_id': 'a', 'srt': SRT}, False),
+    ({'youtube_id': 'a', 'message': 'not cached'}, True),
+    ({'youtube_id': 'a', 'status': 'not_cached'}, True),
+    ({'youtube_id': 'a', 'status': 'processing'}, True),
+])
+def test_probe_then_generate(provider, probe_data, generated):
+    provider.probes['a'] = probe_data
+    assert lambda_youtube_srt.probe_then_generate('a')['success']
+    assert provider.sent == [('a', True)] + ([('a', False)] if generated else [])
+
+
+class FakeContext:
+    def __init__(self, remaining_ms=900000):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class FakeFetcher:
+    """channels: {频道ID: 视频ID列表}，不在其中的频道返回None (找不到频道)"""
+
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_multiple_channel_videos(self, channel_ids, max_videos=None, ids_only=False):
+        return {
+            channel_id: [{'video_id': video_id} for video_id in self.channels[channel_id]]
+            if channel_id in self.channels else None
+            for channel_id in channel_ids
+        }
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    fetcher = FakeFetcher({'UCa': ['a1', 'a2'], 'UCb': ['b1', 'shared']})
+    monkeypatch.setenv('YOUTUBE_API_KEY', 'test-key')
+    monkeypatch.setattr(lambda_youtube_srt, 'get_fetcher', lambda api_key: fetcher)
+    return fetcher
+
+
+def invoke(event, context=None):
+    response = lambda_youtube_srt.lambda_handler(event, context or FakeContext())
+    body = json.loads(response['body'])
+    return response, body
+
+
+def failed_items(response):
+    return [failure['itemIdentifier'] for failure in response['batchItemFailures']]
+
+
+def test_video_ids_from_text(provider):
+    response, body = invoke({'video_ids': 'v1\n# 注释\n\nv2\nv1\n', 'probe': False})
+
+    assert response['statusCode'] == 200
+    assert body['total_videos'] == 2
+    assert provider.sent == [('v1', False), ('v2', False)]
+    assert failed_items(response) == []
+    assert body['retry_event'] is None
+
+
+def test_channels_and_failures_build_retry_event(provider, fetcher):
+    provider.failing.add('a2')
+    response, body = invoke({'channel_ids': ['UCa', 'UCmissing'], 'video_ids': ['v1'], 'probe': False})
+
+    assert body['total_channels'] == 2
+    assert body['total_videos'] == 3
+    assert failed_items(response) == ['UCa', 'UCmissing']
+    assert body['retry_event'] == {'channel_ids': ['UCmissing'], 'video_ids': ['a2']}
+    assert body['item_results']['UCa']['failed_videos'] == ['a2']
+
+
+def test_sqs_records(provider, fetcher):
+    provider.failing.add('b1')
+    records = [
+        {'messageId': 'm1', 'body': json.dumps({'channel_id': 'UCa'})},
+        {'messageId': 'm2', 'body': 'v1'},
+        {'messageId': 'm3', 'body': json.dumps({'title': '没有ID'})},
+        {'messageId': 'm4', 'body': json.dumps({'video_ids': ['shared', 'b1']})},
+        {'messageId': 'm5', 'body': json.dumps({'channel_id': 'UCb'})},
+        {'messageId': 'm6', 'body': '[1, 2]'},
+    ]
+    response, body = invoke({'Records': records})
+
+    # 格式错误的消息和包含失败视频的消息都要重试，同一个视频只请求一次
+    assert failed_items(response) == ['m3', 'm6', 'm4', 'm5']
+    assert body['total_videos'] == 5
+    generated = [video_id for video_id, fetch_only in provider.sent if not fetch_only]
+    assert sorted(generated) == ['b1']
+
+
+def test_handler_error_fails_whole_sqs_batch(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(lambda_youtube_srt, 'request_srt_batch', broken)
+    response, body = invoke({'Records': [{'messageId': 'm1', 'body': 'v1'}, {'messageId': 'm2', 'body': 'v2'}]})
+    assert response['statusCode'] == 500
+    assert failed_items(response) == ['m1', 'm2']
+
+
+def test_time_reserve_covers_probe_and_delay():
+    timeout_ms = lambda_youtube_srt.SRT_TIMEOUT * 1000
+    margin = lambda_youtube_srt.TIME_MARGIN_MS
+    assert lambda_youtube_srt.time_reserve_ms(probe=False) == timeout_ms + margin
+    assert lambda_youtube_srt.time_reserve_ms(probe=True, delay=1.5) == 2 * timeout_ms + 1500 + margin
+    assert lambda_youtube_srt.time_reserve_ms(fetch_only=True, probe=True) == timeout_ms + margin
+
+
+def test_items_skipped_when_time_runs_short(provider):
+    # 剩余40秒：够一个请求，但不够先查询缓存再生成
+    response, body = invoke({'video_ids': ['v1', 'v2']}, FakeContext(40000))
+    assert provider.sent == []
+    assert body['skipped_count'] == 2
+    assert failed_items(response) == ['v1', 'v2']
+
+    response, body = invoke({'video_ids': ['v1', 'v2'], 'probe': False}, FakeContext(40000))
+    assert body['skipped_count'] == 0
+    assert failed_items(response) == []
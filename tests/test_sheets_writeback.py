@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from local_standins import FakeWorksheet
+from sheets_writeback import SheetsWriteback, WRITEBACK_HEADERS
+
+SYNCED_AT = 1748044800   # 2025-05-24T00:00:00Z
+
+
+def make_worksheet():
+    return FakeWorksheet([
+        ['channel_id'],
+        ['UCaaaaaaaaaaaaaaaaaaaaaa'],
+        [],
+        ['UCbbbbbbbbbbbbbbbbbbbbbb'],
+        ['UCcccccccccccccccccccccc'],
+        ['UCaaaaaaaaaaaaaaaaaaaaaa'],
+    ])
+
+
+def test_flush_is_one_batch_update_with_rows_per_channel():
+    worksheet = make_worksheet()
+    writeback = SheetsWriteback(worksheet, flush_every=None)
+    writeback.record('UCcccccccccccccccccccccc', 30, 28, 2, error='timeout', synced_at=SYNCED_AT)
+    writeback.record('UCaaaaaaaaaaaaaaaaaaaaaa', 10, 10, 0, synced_at=SYNCED_AT)
+    writeback.record('UCbbbbbbbbbbbbbbbbbbbbbb', 0, 0, 0, error='频道不存在', synced_at=SYNCED_AT)
+    assert worksheet.batch_calls == []
+
+    assert writeback.flush() == 3
+    assert len(worksheet.batch_calls) == 1
+    assert worksheet.batch_calls[0]['kwargs'] == {'value_input_option': 'RAW'}
+    assert worksheet.batch_calls[0]['data'] == [
+        {'range': 'B1:F1', 'values': [WRITEBACK_HEADERS]},
+        {'range': 'B2:F2', 'values': [[10, 10, 0, '2025-05-24T00:00:00Z', '']]},
+        {'range': 'B4:F4', 'values': [[0, 0, 0, '2025-05-24T00:00:00Z', '频道不存在']]},
+        {'range': 'B5:F5', 'values': [[30, 28, 2, '2025-05-24T00:00:00Z', 'timeout']]},
+    ]
+    # 重复出现的频道只回写第一次出现的行
+    assert worksheet.get('A6:F6') == [['UCaaaaaaaaaaaaaaaaaaaaaa']]
+
+    assert writeback.flush() == 0
+    assert len(worksheet.batch_calls) == 1
+
+
+def test_unknown_channel_and_auto_flush():
+    worksheet = make_worksheet()
+    writeback = SheetsWriteback(worksheet, column_range='A2:A6', flush_every=2)
+    assert not writeback.record('UCzzzzzzzzzzzzzzzzzzzzzz', 1, 1, 0, synced_at=SYNCED_AT)
+    writeback.record('UCaaaaaaaaaaaaaaaaaaaaaa', 1, 1, 0, synced_at=SYNCED_AT)
+    writeback.record('UCbbbbbbbbbbbbbbbbbbbbbb', 2, 1, 1, synced_at=SYNCED_AT)
+
+    assert len(worksheet.batch_calls) == 1
+    assert [item['range'] for item in worksheet.batch_calls[0]['data']] == ['B2:F2', 'B4:F4']
+    assert worksheet.get('B4:F4') == [[2, 1, 1, '2025-05-24T00:00:00Z']]
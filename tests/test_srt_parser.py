@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from srt_parser import iter_cues, parse_srt
+
+
+def test_empty_cue_does_not_swallow_next_cue():
+    srt = (
+        "1\n00:00:01,000 --> 00:00:02,000\nfirst\n\n"
+        "2\n00:00:03,000 --> 00:00:04,000\nsecond\n\n"
+        "3\n00:00:05,000 --> 00:00:06,000\n\n"
+        "4\n00:00:07,000 --> 00:00:08,000\nlast\n"
+    )
+    assert list(iter_cues(srt)) == [
+        (1000, 2000, 'first'),
+        (3000, 4000, 'second'),
+        (7000, 8000, 'last'),
+    ]
+
+
+def test_empty_cue_with_whitespace_line_and_crlf():
+    srt = (
+        b"1\r\n00:00:01,000 --> 00:00:02,000\r\n  \r\n"
+        b"2\r\n00:00:03,000 --> 00:00:04,000\r\nsecond\r\n"
+    )
+    assert list(iter_cues(srt)) == [(3000, 4000, 'second')]
+
+
+def test_multiline_cue_text():
+    cues = parse_srt("1\n00:00:01,5 --> 00:00:02,000\nline one\nline two\n\n")
+    assert list(cues.iter_tuples()) == [(1500, 2000, 'line one\nline two')]
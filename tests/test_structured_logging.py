@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+
+import pytest
+
+import structured_logging
+
+
+@pytest.fixture(autouse=True)
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    structured_logging._stop_listener()
+    root.handlers, root.level = handlers, level
+
+
+def log_failure():
+    try:
+        {}['missing']
+    except KeyError:
+        logging.getLogger('youtube_srt.test').exception("请求 %s 失败", 'abc', extra={'video_id': 'abc'})
+
+
+def test_json_log_keeps_exception(tmp_path):
+    log_file = tmp_path / 'app.jsonl'
+    listener = structured_logging.setup_logging('json', str(log_file), 'INFO')
+    log_failure()
+    listener.stop()
+
+    entry = json.loads(log_file.read_text(encoding='utf-8'))
+    assert entry['msg'] == "请求 abc 失败"
+    assert entry['video_id'] == 'abc'
+    assert entry['exc'].startswith('Traceback')
+    assert "KeyError: 'missing'" in entry['exc']
+
+
+def test_text_log_keeps_exception(tmp_path):
+    log_file = tmp_path / 'app.log'
+    listener = structured_logging.setup_logging('text', str(log_file), 'INFO')
+    log_failure()
+    listener.stop()
+
+    text = log_file.read_text(encoding='utf-8')
+    assert "ERROR 请求 abc 失败\nTraceback" in text
+    assert text.count("KeyError: 'missing'") == 1
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from subtitle_search import SubtitleSearchIndex
+from subtitle_storage import SubtitleStore
+
+
+def make_srt(*texts):
+    return ''.join(
+        f"{number}\n00:00:{number:02d},000 --> 00:00:{number:02d},900\n{text}\n\n"
+        for number, text in enumerate(texts, 1)
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SubtitleSearchIndex(str(tmp_path / 'search.db'))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SubtitleStore(str(tmp_path / 'subtitles'), compression='gzip')
+    yield store
+    store.close()
+
+
+def cue_count(index, video_id=None):
+    if video_id is None:
+        return index.conn.execute("SELECT COUNT(*) FROM cues").fetchone()[0]
+    return index.conn.execute("SELECT COUNT(*) FROM cues WHERE video_id = ?", (video_id,)).fetchone()[0]
+
+
+def test_index_and_query(index):
+    assert index.index_video('vidA', make_srt('今天我们讨论量子力学', 'quantum mechanics basics')) == 2
+    index.index_video('vidB', make_srt('经典力学回顾'))
+
+    results = index.search('量子力学')
+    assert [(result['video_id'], result['time']) for result in results] == [('vidA', '00:00:01,000')]
+    assert '[量子力学]' in results[0]['snippet']
+    assert [result['video_id'] for result in index.search('quantum')] == ['vidA']
+    # 两个字的短词
+    assert sorted(result['video_id'] for result in index.search('力学')) == ['vidA', 'vidB']
+    assert index.search('  ') == []
+
+
+def test_reindex_replaces_only_that_video(index):
+    index.index_video('vidA', make_srt('第一版 字幕内容', '第一版 第二句'))
+    index.index_video('vidB', make_srt('另一个视频的字幕'))
+    index.index_video('vidA', make_srt('第二版 字幕内容'))
+
+    assert cue_count(index, 'vidA') == 1
+    assert cue_count(index, 'vidB') == 1
+    assert index.search('第一版') == []
+    assert [result['video_id'] for result in index.search('第二版')] == ['vidA']
+    assert [result['video_id'] for result in index.search('另一个视频')] == ['vidB']
+
+
+def test_reindex_legacy_rows_without_rowid(index):
+    index.index_video('vidA', make_srt('旧索引的字幕'))
+    index.conn.execute("UPDATE indexed_videos SET first_rowid = NULL")
+    index.index_video('vidA', make_srt('新索引的字幕'))
+
+    assert cue_count(index) == 1
+    assert [result['video_id'] for result in index.search('新索引')] == ['vidA']
+
+
+def test_update_from_store_is_incremental(index, store, monkeypatch):
+    store.save('vidA', make_srt('第一个视频'))
+    store.save('vidB', make_srt('第二个视频'))
+    assert index.update_from_store(store) == 2
+    assert index.update_from_store(store) == 0
+
+    # 水位线之前的记录不再读取
+    calls = []
+    monkeypatch.setattr(store, 'entries_since', lambda stored_after=None: calls.append(stored_after) or [])
+    index.update_from_store(store)
+    assert calls and calls[0] is not None
+    monkeypatch.undo()
+
+    store.save('vidA', make_srt('第一个视频 修改后'))
+    store.save('vidC', make_srt('第三个视频'))
+    assert index.update_from_store(store) == 2
+    assert cue_count(index) == 3
+    assert [result['video_id'] for result in index.search('修改后')] == ['vidA']
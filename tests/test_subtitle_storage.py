@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from subtitle_storage import extract_srt_text, is_cache_miss
+
+SRT = "1\n00:00:01,000 --> 00:00:02,000\n字幕\n\n"
+
+
+@pytest.mark.parametrize('data', [
+    {'youtube_id': 'abc', 'message': 'not cached'},
+    {'youtube_id': 'abc', 'status': 'NOT_CACHED'},
+    {'youtube_id': 'abc', 'cache_status': 'miss'},
+    {'youtube_id': 'abc', 'cached': False, 'srt': SRT},
+    # 没有状态字段，也没有字幕
+    {'youtube_id': 'abc', 'status': 'queued'},
+    {},
+    None,
+    'pending',
+])
+def test_cache_miss(data):
+    assert is_cache_miss(data)
+
+
+@pytest.mark.parametrize('data', [
+    {'youtube_id': 'abc', 'srt': SRT},
+    {'youtube_id': 'abc', 'status': 'ok', 'cached': True, 'result': {'content': SRT}},
+    [{'text': SRT}],
+    SRT,
+])
+def test_cache_hit(data):
+    assert not is_cache_miss(data)
+    assert extract_srt_text(data) == SRT
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import sys
+import types
+
+import pytest
+
+from catalogue_store import CatalogueStore
+from sync_daemon import SyncDaemon
+from video_records import VideoRecord
+
+CHANNEL_ID = 'UCaaaaaaaaaaaaaaaaaaaaaa'
+
+
+class FakeFetcher:
+    """按 videos 列表（从新到旧）返回不在 known 中的视频"""
+
+    use_feed = False
+
+    def __init__(self, videos):
+        self.videos = videos
+
+    def get_new_videos(self, channel_id, known_video_ids, max_videos=None, feed_videos=None):
+        return [video for video in self.videos if video.video_id not in known_video_ids]
+
+
+def make_video(number):
+    return VideoRecord(f'vid{number:08d}', f'视频 {number}', f'2025-05-{number:02d}T00:00:00Z')
+
+
+class SrtProvider:
+    """代替 get_all_videos (需要 gspread)：记录每次请求SRT的视频，failing 中的视频请求失败"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def batch_request_srt(self, videos, channel_info, delay=1.0, subtitle_store=None, concurrency=None):
+        self.calls.append([video['video_id'] for video in videos])
+        return [{
+            'channel_id': channel_info['id'],
+            'video_id': video['video_id'],
+            'title': video['title'],
+            'published_at': video['published_at'],
+            'request_result': ({'success': False, 'error': 'HTTP 500', 'status_code': 500}
+                               if video['video_id'] in self.failing
+                               else {'success': True, 'data': {}, 'status_code': 200}),
+        } for video in videos]
+
+
+@pytest.fixture
+def srt(monkeypatch):
+    provider = SrtProvider()
+    module = types.SimpleNamespace(
+        get_channel_info=lambda fetcher, channel_id: {'id': channel_id, 'name': 'test'},
+        batch_request_srt=provider.batch_request_srt,
+    )
+    monkeypatch.setitem(sys.modules, 'get_all_videos', module)
+    return provider
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CatalogueStore(str(tmp_path / 'catalogue.db'))
+    yield store
+    store.close()
+
+
+def make_daemon(store, fetcher, **kwargs):
+    return SyncDaemon(fetcher, store, lambda: [CHANNEL_ID], srt_delay=0, **kwargs)
+
+
+def test_first_sync_records_history_without_srt(store, srt):
+    fetcher = FakeFetcher([make_video(n) for n in (3, 2, 1)])
+    daemon = make_daemon(store, fetcher)
+    assert daemon.poll_channel(CHANNEL_ID) == 3
+    assert srt.calls == []
+
+    fetcher.videos.insert(0, make_video(4))
+    assert daemon.poll_channel(CHANNEL_ID) == 1
+    # 只请求新视频，不为第一次同步时的历史视频补请求
+    assert srt.calls == [['vid00000004']]
+
+
+def test_failed_srt_is_retried_on_later_polls(store, srt):
+    fetcher = FakeFetcher([make_video(1)])
+    daemon = make_daemon(store, fetcher)
+    daemon.poll_channel(CHANNEL_ID)
+
+    fetcher.videos[:0] = [make_video(3), make_video(2)]
+    srt.failing.add('vid00000002')
+    daemon.poll_channel(CHANNEL_ID)
+    assert srt.calls[-1] == ['vid00000003', 'vid00000002']
+
+    srt.failing.clear()
+    assert daemon.poll_channel(CHANNEL_ID) == 0
+    assert srt.calls[-1] == ['vid00000002']
+
+    # 全部成功后不再请求
+    daemon.poll_channel(CHANNEL_ID)
+    assert len(srt.calls) == 2
+
+
+def test_videos_stored_before_a_crash_get_srt_next_poll(store, srt, monkeypatch):
+    fetcher = FakeFetcher([make_video(1)])
+    daemon = make_daemon(store, fetcher)
+    daemon.poll_channel(CHANNEL_ID)
+
+    fetcher.videos.insert(0, make_video(2))
+    module = sys.modules['get_all_videos']
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    # 视频已经写入目录，请求SRT之前进程退出
+    monkeypatch.setattr(module, 'batch_request_srt', crash)
+    with pytest.raises(KeyboardInterrupt):
+        daemon.poll_channel(CHANNEL_ID)
+
+    monkeypatch.setattr(module, 'batch_request_srt', srt.batch_request_srt)
+    assert daemon.poll_channel(CHANNEL_ID) == 0
+    assert srt.calls == [['vid00000002']]
+
+
+def test_backfill_is_limited_per_poll(store, srt):
+    fetcher = FakeFetcher([make_video(n) for n in (5, 4, 3, 2, 1)])
+    daemon = make_daemon(store, fetcher, backfill=True, srt_limit=2)
+    daemon.poll_channel(CHANNEL_ID)
+    daemon.poll_channel(CHANNEL_ID)
+    daemon.poll_channel(CHANNEL_ID)
+    daemon.poll_channel(CHANNEL_ID)
+    assert srt.calls == [['vid00000005', 'vid00000004'], ['vid00000003', 'vid00000002'], ['vid00000001']]
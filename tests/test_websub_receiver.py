@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from local_standins import LocalWebSubHub
+from websub_receiver import WebSubReceiver, topic_url
+from work_queue import WorkQueue
+
+CHANNELS = ['UCaaaaaaaaaaaaaaaaaaaaaa', 'UCbbbbbbbbbbbbbbbbbbbbbb']
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def hub():
+    with LocalWebSubHub() as hub:
+        yield hub
+
+
+@pytest.fixture
+def receiver(hub, tmp_path):
+    receiver = WebSubReceiver(str(tmp_path / 'jobs.db'), lambda: CHANNELS, callback_url=None,
+                              hub_url=hub.url, host='127.0.0.1', port=0, renew_interval=3600)
+    receiver.callback_url = receiver.local_url + 'websub'
+    receiver.start()
+    assert wait_for(lambda: len(hub.subscriptions) == len(CHANNELS))
+    yield receiver
+    receiver.close()
+
+
+def queued_srt_jobs(queue_path):
+    queue = WorkQueue(queue_path)
+    try:
+        jobs = []
+        while True:
+            job = queue.lease('test', kinds=('srt',))
+            if job is None:
+                return jobs
+            jobs.append(job['payload'])
+    finally:
+        queue.close()
+
+
+def test_subscribe_is_verified(hub, receiver):
+    assert receiver.stats['verified'] == len(CHANNELS)
+    assert set(receiver.leases) == set(CHANNELS)
+    assert {topic for _, topic in hub.subscriptions} == {topic_url(channel_id) for channel_id in CHANNELS}
+
+
+def test_signed_notification_enqueues_srt_job(hub, receiver):
+    assert hub.publish(CHANNELS[0], 'vid00000001', title='新视频',
+                       published='2025-05-24T10:00:00+00:00') == 1
+    receiver.wait_idle()
+
+    assert receiver.stats['videos_enqueued'] == 1
+    assert queued_srt_jobs(receiver.queue_path) == [{
+        'video_id': 'vid00000001',
+        'channel_id': CHANNELS[0],
+        'title': '新视频',
+        'published_at': '2025-05-24T10:00:00Z',
+        'probe': True,
+    }]
+
+
+def test_bad_signature_is_ignored(hub, receiver):
+    for subscription in hub.subscriptions.values():
+        subscription['secret'] = 'wrong-secret'
+    hub.publish(CHANNELS[0], 'vid00000002')
+    receiver.wait_idle()
+
+    assert receiver.stats['bad_signatures'] == 1
+    assert receiver.stats['videos_enqueued'] == 0
+    assert queued_srt_jobs(receiver.queue_path) == []
+
+
+def test_invalid_lease_seconds_is_rejected(receiver):
+    status, _ = receiver.handle_verification({
+        'hub.mode': 'subscribe', 'hub.topic': topic_url(CHANNELS[0]),
+        'hub.challenge': 'abc', 'hub.lease_seconds': 'forever',
+    })
+    assert status == 400
+
+
+def test_unsubscribe_waits_for_verification(hub, receiver):
+    receiver.stop_event.set()
+    assert receiver.unsubscribe_all(timeout=5) == 0
+    assert receiver.watched == set()
+    # 中心读到回调返回的 challenge 后才删除订阅
+    assert wait_for(lambda: not hub.subscriptions)
+    assert hub.stats['unsubscribe'] == len(CHANNELS)
+    assert hub.stats['verify_failed'] == 0
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import work_queue
+from work_queue import JobWorker, WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'jobs.db'))
+    yield queue
+    queue.close()
+
+
+def job_row(queue, job_id):
+    return queue.conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue('srt', {'video_id': 'a'}, 'srt:a')
+    job = queue.lease('worker-1', visibility_timeout=0.05)
+    assert queue.lease('worker-2') is None
+
+    time.sleep(0.1)
+    again = queue.lease('worker-2')
+    assert again['id'] == job['id']
+    assert again['attempts'] == 2
+    # 原来的工作进程已经失去租约
+    assert not queue.ack(job['id'], 'worker-1')
+    assert queue.fail(job['id'], 'worker-1', 'late') is None
+    assert queue.ack(again['id'], 'worker-2')
+    assert queue.stats()['srt']['done'] == 1
+
+
+def test_failed_job_is_retried_with_backoff(queue, monkeypatch):
+    queue.enqueue('srt', {'video_id': 'a'}, 'srt:a')
+    for attempt in (1, 2):
+        job = queue.lease('worker')
+        assert job['attempts'] == attempt
+        before = time.time()
+        assert queue.fail(job['id'], 'worker', 'HTTP 500') == 'pending'
+        delay = job_row(queue, job['id'])['available_at'] - before
+        assert delay == pytest.approx(work_queue.RETRY_BASE_SECONDS * 2 ** (attempt - 1), abs=1)
+        # 退避期间不能被领取
+        assert queue.lease('worker') is None
+        queue.conn.execute('UPDATE jobs SET available_at = 0 WHERE id = ?', (job['id'],))
+
+
+def test_dead_letter_and_requeue(queue):
+    queue.enqueue('srt', {'video_id': 'a'}, 'srt:a', max_attempts=2)
+    for _ in range(2):
+        job = queue.lease('worker')
+        status = queue.fail(job['id'], 'worker', 'HTTP 500')
+        queue.conn.execute('UPDATE jobs SET available_at = 0 WHERE id = ?', (job['id'],))
+    assert status == 'dead'
+    assert queue.lease('worker') is None
+    assert job_row(queue, job['id'])['last_error'] == 'HTTP 500'
+
+    assert queue.requeue_dead('srt') == 1
+    assert queue.lease('worker')['attempts'] == 1
+
+
+def test_expired_lease_without_attempts_left_goes_dead(queue):
+    queue.enqueue('srt', {'video_id': 'a'}, 'srt:a', max_attempts=1)
+    job = queue.lease('worker-1', visibility_timeout=0.05)
+    time.sleep(0.1)
+    assert queue.lease('worker-2') is None
+    row = job_row(queue, job['id'])
+    assert row['status'] == 'dead'
+    assert row['last_error'] == '租约超时'
+
+
+def test_heartbeat_keeps_long_job_leased(tmp_path, monkeypatch):
+    monkeypatch.setitem(work_queue.VISIBILITY_TIMEOUTS, 'srt', 0.3)
+    queue_path = str(tmp_path / 'jobs.db')
+    worker = JobWorker(queue_path, str(tmp_path / 'catalogue.db'), kinds=('srt',), owner='worker-1')
+    worker.queue.enqueue('srt', {'video_id': 'a'}, 'srt:a')
+
+    started = threading.Event()
+    taken_over = []
+
+    def slow_srt(payload):
+        started.set()
+        time.sleep(1.0)
+
+    def other_worker():
+        started.wait()
+        other = WorkQueue(queue_path)
+        try:
+            deadline = time.time() + 0.9
+            while time.time() < deadline:
+                taken_over.append(other.lease('worker-2', kinds=('srt',)))
+                time.sleep(0.05)
+        finally:
+            other.close()
+
+    monkeypatch.setattr(worker, 'handle_srt', slow_srt)
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    try:
+        assert worker.process_one()
+    finally:
+        thread.join()
+        stats = worker.queue.stats()
+        worker.close()
+
+    assert taken_over and not any(taken_over)
+    assert stats['srt']['done'] == 1
+
+
+@pytest.mark.parametrize('probe_data, requests', [
+    ({'youtube_id': 'a', 'srt': '1\n00:00:01,000 --> 00:00:02,000\n字幕\n'}, [True]),
+    ({'youtube_id': 'a', 'message': 'not cached'}, [True, False]),
+    ({'youtube_id': 'a', 'status': 'miss'}, [True, False]),
+])
+def test_srt_probe_generates_on_cache_miss(tmp_path, monkeypatch, probe_data, requests):
+    sent = []
+    generated = {'youtube_id': 'a', 'srt': '1\n00:00:01,000 --> 00:00:02,000\n生成的字幕\n'}
+
+    def request_srt_for_video(video_id, fetch_only=False):
+        sent.append(fetch_only)
+        return {'success': True, 'data': probe_data if fetch_only else generated, 'status_code': 200}
+
+    # get_all_videos 导入时需要 gspread，这里只替换任务用到的函数
+    monkeypatch.setitem(sys.modules, 'get_all_videos', types.SimpleNamespace(request_srt_for_video=request_srt_for_video))
+    worker = JobWorker(str(tmp_path / 'jobs.db'), str(tmp_path / 'catalogue.db'), kinds=('srt',))
+    try:
+        worker.handle_srt({'video_id': 'a', 'channel_id': 'UCa', 'title': 't', 'published_at': '', 'probe': True})
+        assert sent == requests
+        assert worker.store.get_srt_done_ids('UCa') == {'a'}
+    finally:
+        worker.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的视频记录
+原来每个视频是一个 {'video_id', 'title', 'published_at'} 字典，字典本身就要占用约200字节；
+VideoRecord 使用 __slots__ 并把发布时间保存为整数时间戳，每条记录的内存约为原来的三分之一
+
+VideoRecord 实现了只读的 Mapping 接口，video['title']、video.get('published_at')、
+dict(video)、csv.DictWriter 等用法与原来的字典完全相同
+
+用法:
+    video = VideoRecord('dQw4w9WgXcQ', '标题', '2025-05-24T10:00:00Z')
+    video['published_at']      # '2025-05-24T10:00:00Z'
+    video.published_timestamp  # 1748080800
+"""
+
+import time
+import calendar
+from collections.abc import Mapping
+
+VIDEO_RECORD_FIELDS = ('video_id', 'title', 'published_at')
+
+
+def parse_timestamp(value):
+    """把 YouTube 的 '2025-05-24T10:00:00Z' 格式转换为UTC秒级时间戳，其他格式返回None"""
+    if not isinstance(value, str) or len(value) != 20 or value[10] != 'T' or value[19] != 'Z':
+        return None
+    try:
+        return calendar.timegm((
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]), 0, 0, 0
+        ))
+    except ValueError:
+        return None
+
+
+def format_timestamp(timestamp):
+    """把UTC秒级时间戳转换回 YouTube 的时间格式"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+class VideoRecord(Mapping):
+    """一个视频的ID、标题和发布时间"""
+
+    __slots__ = ('video_id', 'title', '_published')
+
+    def __init__(self, video_id, title='', published_at=''):
+        self.video_id = video_id
+        self.title = title
+        timestamp = parse_timestamp(published_at)
+        # 标准格式保存为整数；无法解析的格式保留原字符串，保证读出的值与传入的一致
+        self._published = timestamp if timestamp is not None else published_at
+
+    @property
+    def published_at(self):
+        if isinstance(self._published, int):
+            return format_timestamp(self._published)
+        return self._published
+
+    @property
+    def published_timestamp(self):
+        """发布时间的UTC秒级时间戳，无法解析时为None"""
+        return self._published if isinstance(self._published, int) else None
+
+    @classmethod
+    def from_dict(cls, video):
+        """从原来的字典格式创建"""
+        if isinstance(video, cls):
+            return video
+        return cls(video['video_id'], video.get('title', ''), video.get('published_at', ''))
+
+    def to_dict(self):
+        return {'video_id': self.video_id, 'title': self.title, 'published_at': self.published_at}
+
+    def __getitem__(self, key):
+        if key in VIDEO_RECORD_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(VIDEO_RECORD_FIELDS)
+
+    def __len__(self):
+        return len(VIDEO_RECORD_FIELDS)
+
+    def __repr__(self):
+        return f'VideoRecord({self.video_id!r}, {self.title!r}, {self.published_at!r})'
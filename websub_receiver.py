@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSub (PubSubHubbub) 推送通知接收器
+不再定时轮询频道：向YouTube的WebSub中心订阅关注列表中每个频道的上传通知，
+频道发布新视频时中心会立即把通知POST到本地的回调地址，收到后把视频直接加入任务队列的 srt 任务
+(先只查询缓存，没有缓存再生成)，由 work_queue.py 的工作进程处理。
+
+- 订阅验证: 中心用 GET 请求回调地址，带 hub.mode / hub.topic / hub.challenge，确认是关注的频道后原样返回 challenge
+- 通知: POST 的Atom内容，带 X-Hub-Signature (用订阅时的密钥做HMAC签名)，签名不对的通知被忽略
+- 续订: 订阅有租期 (hub.lease_seconds)，后台线程定期重新读取关注列表，订阅新频道、退订移除的频道，
+  并在租期到期前续订
+- 视频标题修改等也会发送通知，目录数据库中已经成功请求过SRT的视频不会重复加入
+
+回调地址必须能从公网访问 (反向代理或隧道转发到 --port)。
+
+用法:
+    python websub_receiver.py --channels-file channels.txt --callback-url https://example.com/websub
+    python websub_receiver.py --spreadsheet-id <ID> --callback-url https://example.com/websub --port 8080
+    python work_queue.py work --kinds srt        # 另外启动处理SRT任务的工作进程
+
+环境变量:
+    WEBSUB_CALLBACK_URL   回调地址
+    WEBSUB_HUB_URL        WebSub中心地址 (默认 https://pubsubhubbub.appspot.com/subscribe，可指向 local_standins 的替身)
+    WEBSUB_SECRET         通知签名密钥 (默认每次启动随机生成)
+    WEBSUB_LEASE_SECONDS  请求的订阅租期 (默认5天)
+"""
+
+import os
+import hmac
+import time
+import signal
+import logging
+import secrets
+import argparse
+import threading
+from queue import Queue, Empty
+import xml.etree.ElementTree as ElementTree
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from channel_feeds import ATOM_NS, YT_NS, normalize_published
+from pipeline_metrics import metrics
+from video_records import VideoRecord
+
+logger = logging.getLogger('youtube_srt.websub')
+
+DEFAULT_HUB_URL = 'https://pubsubhubbub.appspot.com/subscribe'
+TOPIC_URL_TEMPLATE = 'https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}'
+DEFAULT_LEASE_SECONDS = 432000      # 5天
+DEFAULT_RENEW_INTERVAL = 3600       # 每小时检查一次关注列表和租期
+# 租期剩余不到这个比例时续订
+RENEW_MARGIN = 0.2
+# 发出订阅请求后超过这个时间还没收到验证时重新订阅
+VERIFY_TIMEOUT = 600
+# 退出时最多等待这么久，让中心验证退订请求
+UNSUBSCRIBE_TIMEOUT = 30
+
+
+def topic_url(channel_id: str) -> str:
+    """频道上传通知的主题地址"""
+    return TOPIC_URL_TEMPLATE.format(channel_id=channel_id)
+
+
+def channel_from_topic(topic: str):
+    """从主题地址中取出频道ID，不是频道主题时返回None"""
+    return dict(parse_qsl(urlsplit(topic or '').query)).get('channel_id')
+
+
+def verify_signature(secret: str, body: bytes, header: str) -> bool:
+    """
+    检查 X-Hub-Signature 头 (例如 'sha1=9f...')
+
+    Args:
+        secret: 订阅时提供的密钥
+        body: 通知的原始内容
+        header: X-Hub-Signature 头的值
+    """
+    method, _, signature = (header or '').partition('=')
+    if method not in ('sha1', 'sha256', 'sha384', 'sha512') or not signature:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, method).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def parse_notification(body: bytes) -> list:
+    """
+    解析上传通知
+
+    Returns:
+        [(频道ID, VideoRecord)] 列表；删除视频的通知 (at:deleted-entry) 不包含在内
+    """
+    root = ElementTree.fromstring(body)
+    videos = []
+    for entry in root.iter(f'{ATOM_NS}entry'):
+        video_id = entry.findtext(f'{YT_NS}videoId')
+        channel_id = entry.findtext(f'{YT_NS}channelId')
+        if not video_id or not channel_id:
+            continue
+        videos.append((channel_id, VideoRecord(
+            video_id,
+            entry.findtext(f'{ATOM_NS}title') or '',
+            normalize_published(entry.findtext(f'{ATOM_NS}published') or '')
+        )))
+    return videos
+
+
+class WebSubReceiver:
+    def __init__(self, queue_path: str, channel_source, callback_url: str, hub_url: str = DEFAULT_HUB_URL,
+                 secret: str = None, lease_seconds: int = DEFAULT_LEASE_SECONDS, catalogue_path: str = None,
+                 host: str = '0.0.0.0', port: int = 8080, renew_interval: float = DEFAULT_RENEW_INTERVAL):
+        """
+        Args:
+            queue_path: 任务队列数据库路径，新视频加入其中的 srt 任务
+            channel_source: 无参数函数，返回关注的频道ID列表（读取失败时返回None）
+            callback_url: 中心访问的回调地址（公网地址，转发到 host:port）
+            hub_url: WebSub中心的订阅地址
+            secret: 通知签名密钥，None 时随机生成
+            lease_seconds: 请求的订阅租期（秒），中心可能返回更短的租期
+            catalogue_path: 目录数据库路径，传入时记录收到的视频并跳过已经成功请求过SRT的视频
+            host: 监听地址
+            port: 监听端口，0表示自动选择
+            renew_interval: 检查关注列表和续订的间隔（秒）
+        """
+        self.queue_path = queue_path
+        self.catalogue_path = catalogue_path
+        self.channel_source = channel_source
+        self.callback_url = callback_url
+        self.hub_url = hub_url
+        self.secret = secret or secrets.token_hex(16)
+        self.lease_seconds = lease_seconds
+        self.renew_interval = renew_interval
+
+        self.watched = set()
+        self.leases = {}       # 频道ID -> 租期到期时间（验证后才有）
+        self.requested = {}    # 频道ID -> 最近一次发出订阅请求的时间
+        self.unsubscribing = set()   # 已发出退订请求、等待中心验证的频道
+        self._unsubscribed = threading.Condition()
+        self.stats = {'verified': 0, 'rejected': 0, 'notifications': 0, 'bad_signatures': 0,
+                      'videos_enqueued': 0, 'videos_skipped': 0}
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # HTTP线程只验证和解析通知后立即返回，由一个线程写入队列和目录数据库 (SQLite连接不能跨线程使用)
+        self._pending = Queue()
+
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def local_url(self):
+        """本地监听地址（测试时可直接用作回调地址）"""
+        host, port = self.server.server_address[:2]
+        return f'http://{"127.0.0.1" if host == "0.0.0.0" else host}:{port}/'
+
+    # ---- 订阅 ----
+
+    def _hub_request(self, channel_id, mode):
+        """向中心发送订阅 / 退订请求，中心随后异步访问回调地址验证"""
+        import requests
+
+        data = {
+            'hub.callback': self.callback_url,
+            'hub.mode': mode,
+            'hub.topic': topic_url(channel_id),
+            'hub.verify': 'async',
+        }
+        if mode == 'subscribe':
+            data['hub.secret'] = self.secret
+            data['hub.lease_seconds'] = str(self.lease_seconds)
+        try:
+            response = requests.post(self.hub_url, data=data, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"{mode} {channel_id} 请求失败: {e}", extra={'channel_id': channel_id})
+            return False
+        if response.status_code not in (202, 204):
+            logger.warning(
+                f"{mode} {channel_id} 被中心拒绝: HTTP {response.status_code} {response.text[:200]}",
+                extra={'channel_id': channel_id, 'status_code': response.status_code}
+            )
+            return False
+        metrics.increment(f'websub_{mode}_requests')
+        return True
+
+    def renew(self):
+        """
+        重新读取关注列表：订阅新频道，退订已移除的频道，续订快要到期（或还没验证）的订阅
+
+        Returns:
+            发出的订阅请求数量
+        """
+        channel_ids = self.channel_source()
+        if channel_ids is None:
+            logger.warning("读取关注列表失败，继续使用当前列表", extra={'channels': len(self.watched)})
+            channel_ids = self.watched
+        channel_ids = set(channel_ids)
+
+        with self._lock:
+            removed = self.watched - channel_ids
+            self.watched = channel_ids
+        self._unsubscribe(removed)
+
+        now = time.time()
+        renew_before = now + self.lease_seconds * RENEW_MARGIN
+        subscribed = 0
+        for channel_id in sorted(channel_ids):
+            if self.stop_event.is_set():
+                break
+            expires = self.leases.get(channel_id)
+            if expires is not None and expires > renew_before:
+                continue
+            if expires is None and now - self.requested.get(channel_id, 0) < VERIFY_TIMEOUT:
+                continue  # 已经发出订阅请求，等待验证
+            if self._hub_request(channel_id, 'subscribe'):
+                self.requested[channel_id] = now
+                subscribed += 1
+
+        logger.info(
+            f"关注 {len(channel_ids)} 个频道: 发出 {subscribed} 个订阅请求，退订 {len(removed)} 个",
+            extra={'channels': len(channel_ids), 'subscribed': subscribed, 'removed': len(removed)}
+        )
+        return subscribed
+
+    def _unsubscribe(self, channel_ids):
+        """发送退订请求（调用前频道已经从 watched 中移除，验证请求才会被接受）"""
+        for channel_id in sorted(channel_ids):
+            self.leases.pop(channel_id, None)
+            self.requested.pop(channel_id, None)
+            # 先记录再发送：中心可能在请求返回之前就来验证
+            with self._unsubscribed:
+                self.unsubscribing.add(channel_id)
+            if not self._hub_request(channel_id, 'unsubscribe'):
+                with self._unsubscribed:
+                    self.unsubscribing.discard(channel_id)
+
+    def unsubscribe_all(self, timeout: float = UNSUBSCRIBE_TIMEOUT):
+        """
+        退订所有频道，并等待中心验证退订请求
+
+        中心异步访问回调地址验证，HTTP服务要一直运行到验证完成
+
+        Returns:
+            超时后仍未验证的频道数量
+        """
+        with self._lock:
+            channel_ids, self.watched = self.watched, set()
+        self._unsubscribe(channel_ids)
+
+        deadline = time.time() + timeout
+        with self._unsubscribed:
+            while self.unsubscribing:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(f"{len(self.unsubscribing)} 个频道的退订没有在 {timeout} 秒内验证",
+                                   extra={'channels': len(self.unsubscribing)})
+                    break
+                self._unsubscribed.wait(remaining)
+            return len(self.unsubscribing)
+
+    # ---- 回调 ----
+
+    def handle_verification(self, params: dict):
+        """
+        处理中心的订阅验证 GET 请求
+
+        Returns:
+            (状态码, 响应内容)
+        """
+        mode = params.get('hub.mode')
+        channel_id = channel_from_topic(params.get('hub.topic'))
+        challenge = params.get('hub.challenge')
+        with self._lock:
+            watched = channel_id in self.watched
+
+        if mode == 'subscribe' and watched and challenge:
+            try:
+                lease_seconds = int(params.get('hub.lease_seconds') or self.lease_seconds)
+            except ValueError:
+                self.stats['rejected'] += 1
+                return 400, b'invalid hub.lease_seconds'
+            self.leases[channel_id] = time.time() + lease_seconds
+            self.stats['verified'] += 1
+            logger.info(f"订阅 {channel_id} 已验证，租期 {lease_seconds / 86400:.1f} 天",
+                        extra={'channel_id': channel_id, 'lease_seconds': lease_seconds})
+            return 200, challenge.encode('utf-8')
+        if mode == 'unsubscribe' and not watched and challenge:
+            self.stats['verified'] += 1
+            with self._unsubscribed:
+                self.unsubscribing.discard(channel_id)
+                self._unsubscribed.notify_all()
+            return 200, challenge.encode('utf-8')
+        if mode == 'denied':
+            logger.warning(f"中心拒绝订阅 {channel_id}: {params.get('hub.reason')}", extra={'channel_id': channel_id})
+            self.leases.pop(channel_id, None)
+            self.requested.pop(channel_id, None)
+            return 200, b''
+
+        # 不是我们请求的订阅（或已经移除的频道）
+        self.stats['rejected'] += 1
+        return 404, b''
+
+    def handle_notification(self, body: bytes, signature: str) -> int:
+        """
+        处理中心 POST 的通知，把关注频道的视频交给写入线程加入 srt 任务
+
+        签名不对时按WebSub规范仍然返回成功，但忽略通知内容
+
+        Returns:
+            接受的视频数量
+        """
+        self.stats['notifications'] += 1
+        metrics.increment('websub_notifications')
+        if not verify_signature(self.secret, body, signature):
+            self.stats['bad_signatures'] += 1
+            logger.warning("忽略签名无效的通知", extra={'signature': (signature or '')[:16]})
+            return 0
+        try:
+            videos = parse_notification(body)
+        except ElementTree.ParseError as e:
+            logger.warning(f"无法解析通知: {e}")
+            return 0
+
+        with self._lock:
+            videos = [(channel_id, video) for channel_id, video in videos if channel_id in self.watched]
+        for item in videos:
+            self._pending.put(item)
+        return len(videos)
+
+    def _enqueue_video(self, queue, store, channel_id, video):
+        """把一个视频加入 srt 任务，已经成功请求过SRT的视频（标题修改等更新通知）跳过"""
+        from work_queue import srt_job_items
+
+        if store:
+            store.upsert_videos(channel_id, [video])
+            if video.video_id in store.get_srt_done_ids(channel_id):
+                self.stats['videos_skipped'] += 1
+                return
+        items = [(dict(payload, probe=True), dedupe_key)
+                 for payload, dedupe_key in srt_job_items(channel_id, [video])]
+        if queue.enqueue_many('srt', items):
+            self.stats['videos_enqueued'] += 1
+            metrics.increment('websub_videos_enqueued')
+            logger.info(f"新视频 {video.video_id} ({channel_id}) 已加入SRT任务",
+                        extra={'channel_id': channel_id, 'video_id': video.video_id})
+        else:
+            # 已经在排队或处理中
+            self.stats['videos_skipped'] += 1
+
+    def _dispatch_loop(self):
+        from work_queue import WorkQueue
+        from catalogue_store import CatalogueStore
+
+        queue = WorkQueue(self.queue_path)
+        store = CatalogueStore(self.catalogue_path) if self.catalogue_path else None
+        try:
+            while not (self.stop_event.is_set() and self._pending.empty()):
+                try:
+                    channel_id, video = self._pending.get(timeout=0.5)
+                except Empty:
+                    continue
+                try:
+                    self._enqueue_video(queue, store, channel_id, video)
+                except Exception as e:
+                    logger.warning(f"加入SRT任务出错: {e}",
+                                   extra={'video_id': video.video_id, 'error_class': type(e).__name__})
+                finally:
+                    self._pending.task_done()
+        finally:
+            queue.close()
+            if store:
+                store.close()
+
+    def wait_idle(self):
+        """等待收到的通知全部写入队列"""
+        self._pending.join()
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, data=b''):
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                self._reply(*receiver.handle_verification(dict(parse_qsl(urlsplit(self.path).query))))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b''
+                try:
+                    receiver.handle_notification(body, self.headers.get('X-Hub-Signature'))
+                except Exception as e:
+                    logger.exception(f"处理通知出错: {e}")
+                    self._reply(500)
+                    return
+                self._reply(204)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    # ---- 运行 ----
+
+    def _renew_loop(self):
+        while not self.stop_event.wait(self.renew_interval):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.warning(f"续订出错: {e}", extra={'error_class': type(e).__name__})
+
+    def start(self):
+        """在后台线程中启动HTTP服务，订阅关注列表中的频道，并定期续订"""
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name='websub-dispatch'),
+            threading.Thread(target=self.server.serve_forever, daemon=True, name='websub-http'),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.renew()
+        renew_thread = threading.Thread(target=self._renew_loop, daemon=True, name='websub-renew')
+        renew_thread.start()
+        self._threads.append(renew_thread)
+        return self
+
+    def stop(self, signum=None, frame=None):
+        """停止服务（可直接用作信号处理函数）"""
+        self.stop_event.set()
+
+    def close(self, unsubscribe=False):
+        """停止HTTP服务，等待收到的通知写入队列（退订时先等中心验证完退订请求）"""
+        self.stop_event.set()
+        if unsubscribe:
+            self.unsubscribe_all()
+        self.server.shutdown()
+        self.server.server_close()
+        if self._threads:
+            self._threads[0].join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSub推送通知接收器')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--channels-file', help='关注列表文件，每行一个频道ID')
+    source.add_argument('--channels', nargs='+', help='关注的频道ID')
+    source.add_argument('--spreadsheet-id', help='从Google Sheets读取关注列表')
+    parser.add_argument('--sheet-name', default='Sheet1', help='工作表名称')
+    parser.add_argument('--column-range', default='A:A', help='频道ID所在的列范围')
+    parser.add_argument('--callback-url', default=os.getenv('WEBSUB_CALLBACK_URL'), help='中心访问的公网回调地址')
+    parser.add_argument('--hub', default=os.getenv('WEBSUB_HUB_URL', DEFAULT_HUB_URL), help='WebSub中心地址')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址')
+    parser.add_argument('--port', type=int, default=8080, help='监听端口')
+    parser.add_argument('--lease-seconds', type=int,
+                        default=int(os.getenv('WEBSUB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)), help='订阅租期（秒）')
+    parser.add_argument('--queue', default=os.getenv('WORK_QUEUE_PATH', 'youtube_jobs.db'), help='任务队列数据库路径')
+    parser.add_argument('--db', default=os.getenv('CATALOGUE_DB_PATH', 'youtube_catalogue.db'), help='目录数据库路径')
+    parser.add_argument('--unsubscribe-on-exit', action='store_true', help='退出时退订所有频道')
+    args = parser.parse_args()
+
+    if not args.callback_url:
+        print("❌ 需要回调地址: --callback-url 或环境变量 WEBSUB_CALLBACK_URL")
+        return
+
+    from structured_logging import setup_logging
+    from sync_daemon import read_channels_file
+
+    setup_logging()
+
+    if args.channels_file:
+        def channel_source():
+            try:
+                return read_channels_file(args.channels_file)
+            except OSError as e:
+                logger.warning(f"读取关注列表文件失败: {e}")
+                return None
+    elif args.channels:
+        def channel_source():
+            return args.channels
+    else:
+        def channel_source():
+            from get_all_videos import read_channel_ids_from_sheets
+            return read_channel_ids_from_sheets(args.spreadsheet_id, args.sheet_name, args.column_range)
+
+    receiver = WebSubReceiver(
+        args.queue, channel_source, args.callback_url, hub_url=args.hub, secret=os.getenv('WEBSUB_SECRET'),
+        lease_seconds=args.lease_seconds, catalogue_path=args.db, host=args.host, port=args.port
+    )
+    signal.signal(signal.SIGTERM, receiver.stop)
+    signal.signal(signal.SIGINT, receiver.stop)
+
+    print(f"📡 WebSub接收器已启动: 监听 {args.host}:{args.port}，回调地址 {args.callback_url}")
+    receiver.start()
+    try:
+        receiver.stop_event.wait()
+    finally:
+        receiver.close(unsubscribe=args.unsubscribe_on_exit)
+        print(f"\n📊 通知统计: {receiver.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化任务队列和工作进程
+把"获取频道视频列表"和"请求SRT字幕"拆成独立的任务写入SQLite队列，由多个工作进程并行处理
+
+- 任务被领取后进入租约 (lease)，处理期间工作进程定期延长租约；工作进程崩溃后租约超过可见性超时
+  仍未确认时会被其他工作进程重新领取，不会丢失任务
+- 失败的任务按指数退避重试，超过最大次数后进入死信状态 (dead)，可以用 requeue-dead 重新排队
+- 队列文件放在多台机器共享的存储上时，多台机器的工作进程可以同时处理
+  (需要支持文件锁的共享文件系统；SQLite不建议放在NFS上)
+
+任务类型:
+    list_channel  增量获取频道的新视频写入目录数据库，并为新视频加入 srt 任务
+    srt           为一个视频请求SRT字幕，结果写入目录数据库 (和字幕存储)；
+                  payload 带 probe 时先只查询缓存，没有缓存再生成 (websub_receiver.py 加入的任务)
+
+用法:
+    python work_queue.py enqueue-channels --channels-file channels.txt
+    python work_queue.py enqueue-missing-srt --limit 1000
+    python work_queue.py work --processes 8 --idle-exit
+    python work_queue.py stats
+"""
+
+import os
+import json
+import time
+import socket
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+logger = logging.getLogger('youtube_srt.queue')
+
+DEFAULT_QUEUE_PATH = 'youtube_jobs.db'
+
+JOB_KINDS = ('list_channel', 'srt')
+
+# 每种任务的可见性超时（秒）：领取后超过这个时间未确认，视为工作进程已崩溃
+VISIBILITY_TIMEOUTS = {'list_channel': 900, 'srt': 120}
+# 处理任务期间每隔 可见性超时 * HEARTBEAT_FRACTION 秒延长一次租约
+# (srt 任务可能在熔断器打开时等待数分钟，不能只靠固定的可见性超时)
+HEARTBEAT_FRACTION = 1 / 3
+DEFAULT_MAX_ATTEMPTS = 5
+# 第n次失败后等待 RETRY_BASE_SECONDS * 2^(n-1) 秒再重试
+RETRY_BASE_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind         TEXT NOT NULL,
+    dedupe_key   TEXT UNIQUE,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner  TEXT,
+    lease_expires REAL,
+    last_error   TEXT,
+    created_at   REAL,
+    updated_at   REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, kind, available_at);
+"""
+
+
+class WorkQueue:
+    def __init__(self, db_path: str = DEFAULT_QUEUE_PATH):
+        """
+        打开（或创建）任务队列
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        # 多个进程同时写入时等待锁，而不是立即报 database is locked
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def enqueue(self, kind: str, payload: dict, dedupe_key: str = None, delay: float = 0,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        """加入一个任务，见 enqueue_many"""
+        return self.enqueue_many(kind, [(payload, dedupe_key)], delay, max_attempts) > 0
+
+    def enqueue_many(self, kind: str, items, delay: float = 0, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """
+        批量加入任务
+
+        相同 dedupe_key 的任务还在排队或处理中时不会重复加入；已完成或已进入死信的任务会被重新排队
+
+        Args:
+            kind: 任务类型
+            items: [(payload字典, dedupe_key)] 列表
+            delay: 多少秒后才可以被领取
+            max_attempts: 最大尝试次数
+
+        Returns:
+            新加入（或重新排队）的任务数量
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知的任务类型: {kind}")
+        now = time.time()
+        rows = [
+            (kind, dedupe_key, json.dumps(payload, ensure_ascii=False), max_attempts, now + delay, now, now)
+            for payload, dedupe_key in items
+        ]
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                """
+                INSERT INTO jobs (kind, dedupe_key, payload, max_attempts, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(dedupe_key) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = 'pending',
+                    attempts = 0,
+                    max_attempts = excluded.max_attempts,
+                    available_at = excluded.available_at,
+                    lease_owner = NULL,
+                    lease_expires = NULL,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE jobs.status IN ('done', 'dead')
+                """,
+                rows
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def lease(self, owner: str, kinds=JOB_KINDS, visibility_timeout: float = None):
+        """
+        领取一个可以处理的任务
+
+        可以领取的任务包括到期的排队任务和租约已过期（工作进程可能已崩溃）的任务；
+        租约过期且已用完尝试次数的任务转为死信
+
+        Args:
+            owner: 工作进程标识
+            kinds: 可以处理的任务类型
+            visibility_timeout: 租约时长（秒），默认按任务类型取 VISIBILITY_TIMEOUTS
+
+        Returns:
+            任务字典 {id, kind, payload, attempts, max_attempts}，没有可领取的任务时返回None
+        """
+        now = time.time()
+        placeholders = ','.join('?' * len(kinds))
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute(
+                f"""
+                UPDATE jobs SET status = 'dead', last_error = COALESCE(last_error, '租约超时'), updated_at = ?
+                WHERE status = 'leased' AND lease_expires <= ? AND attempts >= max_attempts
+                  AND kind IN ({placeholders})
+                """,
+                (now, now, *kinds)
+            )
+            row = self.conn.execute(
+                f"""
+                SELECT id, kind, payload, attempts, max_attempts FROM jobs
+                WHERE kind IN ({placeholders}) AND (
+                    (status = 'pending' AND available_at <= ?) OR
+                    (status = 'leased' AND lease_expires <= ?)
+                )
+                ORDER BY available_at
+                LIMIT 1
+                """,
+                (*kinds, now, now)
+            ).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+
+            timeout = visibility_timeout or VISIBILITY_TIMEOUTS.get(row['kind'], 300)
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                (owner, now + timeout, now, row['id'])
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1,
+            'max_attempts': row['max_attempts'],
+        }
+
+    def ack(self, job_id: int, owner: str) -> bool:
+        """确认任务完成；租约已被其他工作进程接手时返回False"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time(), job_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: int, owner: str, error: str) -> str:
+        """
+        记录任务失败：还有尝试次数时按指数退避重新排队，否则转为死信
+
+        Returns:
+            任务的新状态 'pending' 或 'dead'（租约已被其他工作进程接手时返回None）
+        """
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (job_id, owner)
+            ).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+            status = 'dead' if row['attempts'] >= row['max_attempts'] else 'pending'
+            retry_at = now + RETRY_BASE_SECONDS * 2 ** (row['attempts'] - 1)
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL,
+                    last_error = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (status, retry_at, error[:1000], now, job_id)
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return status
+
+    def extend(self, job_id: int, owner: str, visibility_timeout: float) -> bool:
+        """延长租约（处理时间可能超过可见性超时的任务可以定期调用）"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + visibility_timeout, time.time(), job_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def requeue_dead(self, kind: str = None) -> int:
+        """把死信任务重新排队，返回数量"""
+        sql = ("UPDATE jobs SET status = 'pending', attempts = 0, available_at = ?, last_error = NULL, updated_at = ? "
+               "WHERE status = 'dead'")
+        params = [time.time(), time.time()]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        return self.conn.execute(sql, params).rowcount
+
+    def outstanding(self, kinds=JOB_KINDS) -> int:
+        """还没有完成的任务数量（排队中和处理中）"""
+        placeholders = ','.join('?' * len(kinds))
+        row = self.conn.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased') AND kind IN ({placeholders})",
+            kinds
+        ).fetchone()
+        return row[0]
+
+    def stats(self) -> dict:
+        """返回 {任务类型: {状态: 数量}}"""
+        stats = {kind: {'pending': 0, 'leased': 0, 'done': 0, 'dead': 0} for kind in JOB_KINDS}
+        for row in self.conn.execute("SELECT kind, status, COUNT(*) AS count FROM jobs GROUP BY kind, status"):
+            stats.setdefault(row['kind'], {})[row['status']] = row['count']
+        return stats
+
+
+class JobFailed(Exception):
+    """任务处理失败，需要重试"""
+
+
+def srt_job_items(channel_id: str, videos) -> list:
+    """把视频列表转换为 srt 任务 (以视频ID去重)"""
+    return [
+        ({
+            'video_id': video['video_id'],
+            'channel_id': channel_id,
+            'title': video['title'],
+            'published_at': video['published_at'],
+        }, f"srt:{video['video_id']}")
+        for video in videos
+    ]
+
+
+class JobWorker:
+    """在一个工作进程中处理任务"""
+
+    def __init__(self, queue_path: str, catalogue_path: str, kinds=JOB_KINDS, owner: str = None):
+        from catalogue_store import CatalogueStore
+        from subtitle_storage import open_subtitle_store
+
+        self.queue = WorkQueue(queue_path)
+        self.store = CatalogueStore(catalogue_path)
+        self.subtitle_store = open_subtitle_store()
+        self.kinds = tuple(kinds)
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self._fetcher = None
+
+    def close(self):
+        self.queue.close()
+        self.store.close()
+        if self.subtitle_store:
+            self.subtitle_store.close()
+
+    @property
+    def fetcher(self):
+        # 只处理 srt 任务的工作进程不需要YouTube API密钥
+        if self._fetcher is None:
+            from youtube_video_fetcher import YouTubeVideoFetcher
+            self._fetcher = YouTubeVideoFetcher(os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY'))
+        return self._fetcher
+
+    def handle_list_channel(self, payload):
+        from get_all_videos import get_channel_info
+
+        channel_id = payload['channel_id']
+        known_video_ids = self.store.get_known_video_ids(channel_id)
+        new_videos = self.fetcher.get_new_videos(channel_id, known_video_ids, payload.get('max_videos'))
+        if new_videos is None:
+            raise JobFailed(f"找不到频道 {channel_id}")
+
+        channel_info = get_channel_info(self.fetcher, channel_id)
+        # 先加入SRT任务再写入目录：两步之间崩溃时任务会重试，重新入队的 srt 任务按视频ID去重；
+        # 反过来的话视频已经是"已知"的，重试时不会再被列出，也就永远不会请求SRT
+        if payload.get('srt', True) and new_videos:
+            self.queue.enqueue_many('srt', srt_job_items(channel_id, new_videos))
+        self.store.upsert_channel(channel_info, len(known_video_ids) + len(new_videos))
+        self.store.upsert_videos(channel_id, new_videos)
+        logger.info(
+            f"频道 {channel_id}: {len(new_videos)} 个新视频",
+            extra={'channel_id': channel_id, 'new_videos': len(new_videos), 'worker': self.owner}
+        )
+
+    def handle_srt(self, payload):
+        from get_all_videos import request_srt_for_video
+        from subtitle_storage import is_cache_miss
+
+        video_id = payload['video_id']
+        result = None
+        if payload.get('probe'):
+            # 先只查询缓存 (probe)，没有缓存时才触发生成
+            result = request_srt_for_video(video_id, fetch_only=True)
+            if not result['success'] or is_cache_miss(result['data']):
+                result = None
+        if result is None:
+            result = request_srt_for_video(video_id, fetch_only=False)
+        record = {
+            'channel_id': payload.get('channel_id'),
+            'video_id': video_id,
+            'title': payload.get('title'),
+            'published_at': payload.get('published_at'),
+            'request_result': result,
+        }
+        self.store.upsert_srt_results([record])
+        if not result['success']:
+            raise JobFailed(result['error'])
+        if self.subtitle_store:
+            self.subtitle_store.save_response(video_id, result['data'])
+        logger.info(f"{video_id} 成功", extra={'video_id': video_id, 'worker': self.owner})
+
+    @contextmanager
+    def _heartbeat(self, job):
+        """
+        处理任务期间在后台线程中定期延长租约，避免处理时间超过可见性超时后被其他工作进程重复领取
+
+        后台线程使用自己的数据库连接 (SQLite连接不能跨线程使用)
+        """
+        timeout = VISIBILITY_TIMEOUTS.get(job['kind'], 300)
+        stop = threading.Event()
+
+        def beat():
+            queue = WorkQueue(self.queue.db_path)
+            try:
+                while not stop.wait(timeout * HEARTBEAT_FRACTION):
+                    if not queue.extend(job['id'], self.owner, timeout):
+                        logger.warning(
+                            f"任务 {job['id']} ({job['kind']}) 的租约已失效，可能被其他工作进程重复处理",
+                            extra={'job_id': job['id'], 'kind': job['kind'], 'worker': self.owner}
+                        )
+                        return
+            finally:
+                queue.close()
+
+        thread = threading.Thread(target=beat, daemon=True, name=f"heartbeat-{job['id']}")
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def process_one(self) -> bool:
+        """领取并处理一个任务，没有可领取的任务时返回False"""
+        job = self.queue.lease(self.owner, self.kinds)
+        if job is None:
+            return False
+
+        handler = getattr(self, f"handle_{job['kind']}")
+        extra = {'job_id': job['id'], 'kind': job['kind'], 'attempts': job['attempts'], 'worker': self.owner}
+        try:
+            with self._heartbeat(job):
+                handler(job['payload'])
+        except Exception as e:
+            status = self.queue.fail(job['id'], self.owner, f'{type(e).__name__}: {e}')
+            logger.warning(f"任务 {job['id']} ({job['kind']}) 失败: {e}", extra=dict(extra, status=status))
+            if status is None:
+                logger.warning(f"任务 {job['id']} ({job['kind']}) 的租约已被其他工作进程接手，失败未记录", extra=extra)
+        else:
+            if not self.queue.ack(job['id'], self.owner):
+                logger.warning(f"任务 {job['id']} ({job['kind']}) 的租约已被其他工作进程接手，确认无效", extra=extra)
+        return True
+
+    def run(self, stop_event=None, idle_exit=False, poll_interval=2.0):
+        """
+        循环处理任务，直到 stop_event 被设置
+
+        Args:
+            stop_event: multiprocessing.Event，设置后处理完当前任务退出
+            idle_exit: 队列中没有未完成的任务时退出
+            poll_interval: 没有可领取的任务时的等待时间（秒）
+        """
+        processed = 0
+        while not (stop_event and stop_event.is_set()):
+            if self.process_one():
+                processed += 1
+                continue
+            if idle_exit and self.queue.outstanding(self.kinds) == 0:
+                break
+            if stop_event:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+        return processed
+
+
+def _worker_main(queue_path, catalogue_path, kinds, stop_event, idle_exit):
+    """工作进程入口"""
+    from structured_logging import setup_logging
+
+    # 停止信号由主进程统一处理，工作进程处理完当前任务再退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    setup_logging()
+
+    worker = JobWorker(queue_path, catalogue_path, kinds)
+    try:
+        worker.run(stop_event, idle_exit)
+    finally:
+        worker.close()
+
+
+def run_workers(queue_path, catalogue_path, processes=4, kinds=JOB_KINDS, idle_exit=False):
+    """启动多个工作进程，收到 SIGTERM / SIGINT 时通知它们处理完当前任务后退出"""
+    stop_event = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(
+            target=_worker_main, args=(queue_path, catalogue_path, tuple(kinds), stop_event, idle_exit),
+            name=f'youtube-worker-{i}'
+        )
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def request_stop(signum, frame):
+        print("\n⚠️  收到停止信号，等待工作进程处理完当前任务...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='持久化任务队列和工作进程')
+    parser.add_argument('--queue', default=os.getenv('WORK_QUEUE_PATH', DEFAULT_QUEUE_PATH), help='队列数据库路径')
+    parser.add_argument('--db', default=os.getenv('CATALOGUE_DB_PATH', 'youtube_catalogue.db'), help='目录数据库路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    channels = subparsers.add_parser('enqueue-channels', help='加入获取频道视频列表的任务')
+    source = channels.add_mutually_exclusive_group(required=True)
+    source.add_argument('--channels-file', help='频道列表文件，每行一个频道ID')
+    source.add_argument('--channels', nargs='+', help='频道ID')
+    source.add_argument('--spreadsheet-id', help='从Google Sheets读取频道列表')
+    channels.add_argument('--sheet-name', default='Sheet1', help='工作表名称')
+    channels.add_argument('--column-range', default='A:A', help='频道ID所在的列范围')
+    channels.add_argument('--max-videos', type=int, help='每个频道最多获取多少个新视频')
+    channels.add_argument('--no-srt', action='store_true', help='只获取视频列表，不加入SRT任务')
+
+    missing = subparsers.add_parser('enqueue-missing-srt', help='为目录中还没有SRT的视频加入SRT任务')
+    missing.add_argument('channel_id', nargs='?', help='只处理指定频道')
+    missing.add_argument('--limit', type=int, help='最多加入多少个任务')
+
+    work = subparsers.add_parser('work', help='启动工作进程')
+    work.add_argument('--processes', type=int, default=os.cpu_count() or 4, help='工作进程数量')
+    work.add_argument('--kinds', nargs='+', choices=JOB_KINDS, default=list(JOB_KINDS), help='处理的任务类型')
+    work.add_argument('--idle-exit', action='store_true', help='队列处理完后退出')
+
+    subparsers.add_parser('stats', help='显示队列统计')
+
+    requeue = subparsers.add_parser('requeue-dead', help='把死信任务重新排队')
+    requeue.add_argument('--kind', choices=JOB_KINDS, help='只处理指定类型')
+
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        print(f"🚀 启动 {args.processes} 个工作进程，处理 {', '.join(args.kinds)} 任务 (队列: {args.queue})")
+        run_workers(args.queue, args.db, args.processes, args.kinds, args.idle_exit)
+        print("✅ 工作进程已全部退出")
+        return
+
+    queue = WorkQueue(args.queue)
+
+    if args.command == 'enqueue-channels':
+        if args.channels_file:
+            from sync_daemon import read_channels_file
+            channel_ids = read_channels_file(args.channels_file)
+        elif args.channels:
+            channel_ids = args.channels
+        else:
+            from get_all_videos import read_channel_ids_from_sheets
+            channel_ids = read_channel_ids_from_sheets(args.spreadsheet_id, args.sheet_name, args.column_range) or []
+        added = queue.enqueue_many('list_channel', [
+            ({'channel_id': channel_id, 'max_videos': args.max_videos, 'srt': not args.no_srt},
+             f'list:{channel_id}')
+            for channel_id in channel_ids
+        ])
+        print(f"✅ 已加入 {added} 个频道任务 (共 {len(channel_ids)} 个频道)")
+
+    elif args.command == 'enqueue-missing-srt':
+        from catalogue_store import CatalogueStore
+        store = CatalogueStore(args.db)
+        videos = store.videos_missing_srt(args.channel_id, limit=args.limit)
+        store.close()
+        by_channel = {}
+        for video in videos:
+            by_channel.setdefault(video['channel_id'], []).append(video)
+        added = sum(queue.enqueue_many('srt', srt_job_items(channel_id, channel_videos))
+                    for channel_id, channel_videos in by_channel.items())
+        print(f"✅ 已加入 {added} 个SRT任务 (共 {len(videos)} 个缺少SRT的视频)")
+
+    elif args.command == 'stats':
+        for kind, counts in queue.stats().items():
+            print(f"📊 {kind}: 排队 {counts.get('pending', 0)}, 处理中 {counts.get('leased', 0)}, "
+                  f"完成 {counts.get('done', 0)}, 死信 {counts.get('dead', 0)}")
+
+    elif args.command == 'requeue-dead':
+        print(f"✅ 已重新排队 {queue.requeue_dead(args.kind)} 个死信任务")
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
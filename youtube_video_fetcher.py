@@ -8,20 +8,215 @@ YouTube频道视频ID获取工具
 import os
 import time
 import json
-from typing import List, Optional
-from googleapiclient.discovery import build
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
+from pipeline_metrics import metrics
+from video_records import VideoRecord
+from http_cache import EtagCache
+from channel_feeds import fetch_feed, new_videos_from_feed
+from api_key_pool import ApiKeyPool, QuotaExhaustedError, mask_key, parse_api_keys, quota_error_reason
+
+# 精简模式下 playlistItems 只返回用到的字段，不下载缩略图、描述等数据
+# 精简字段都包含 etag，用于条件请求缓存 (http_cache.py)
+LEAN_PLAYLIST_FIELDS = 'etag,nextPageToken,items(contentDetails/videoId,snippet(title,publishedAt))'
+# 只要视频ID时连 snippet 都不请求，发布时间取 contentDetails.videoPublishedAt
+IDS_ONLY_PLAYLIST_FIELDS = 'etag,nextPageToken,items(contentDetails(videoId,videoPublishedAt))'
+# 一次批量HTTP请求中包含的API调用数量，channels.list 一次最多也只能查询50个频道
+BATCH_SIZE = 50
+
+# 发现文档的下载地址（googleapiclient 没有内置文档时使用）
+DISCOVERY_URL = 'https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest'
+
+_discovery_lock = threading.Lock()
+_discovery_document = None
+
+
+def get_discovery_document() -> dict:
+    """
+    YouTube Data API v3 的发现文档，整个进程只解析一次
+
+    每次 build() 都要读取并解析约400KB的文档；所有API资源对象改用 build_from_document() 共用这一份
+    """
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            try:
+                from googleapiclient.discovery_cache import get_static_doc
+                document = get_static_doc('youtube', 'v3')
+            except ImportError:
+                document = None
+            if document is None:
+                import requests
+                response = requests.get(DISCOVERY_URL, timeout=30)
+                response.raise_for_status()
+                document = response.text
+            _discovery_document = json.loads(document)
+        return _discovery_document
+
+
+class ApiClientPool:
+    """
+    API资源对象池
+
+    googleapiclient 的资源对象内部使用 httplib2.Http，不能在多个线程中同时使用。
+    每个线程用 checkout() 签出一个独占的资源对象，用完放回池中供之后的线程复用，
+    同时使用的线程数决定创建的资源对象数量，不会为每次请求重新 build()
+    """
+
+    def __init__(self, factory):
+        """
+        Args:
+            factory: 函数，参数为API密钥，返回新的资源对象
+        """
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+
+    @contextmanager
+    def checkout(self, key):
+        """签出某个密钥的资源对象，with 块结束时放回池中"""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            client = idle.pop() if idle else None
+        if client is None:
+            client = self._factory(key)
+            with self._lock:
+                self.created += 1
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self._idle[key].append(client)
+
 
 class YouTubeVideoFetcher:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key, youtube=None, page_delay: float = 0.1, lean: bool = True, http_cache=None,
+                 use_feed: Optional[bool] = None):
         """
         初始化YouTube API客户端
         
         Args:
-            api_key: YouTube Data API v3的API密钥
+            api_key: YouTube Data API v3的API密钥；多个密钥（列表、逗号分隔的字符串或 ApiKeyPool）
+                     组成密钥池，每次调用选择剩余配额最多的密钥，配额用完时自动切换
+            youtube: 已创建的API资源对象（例如 local_standins.FakeYouTubeResource），所有密钥共用；
+                     默认在设置了环境变量 YOUTUBE_FAKE_VIDEOS 时使用本地替身，否则连接真实API
+            page_delay: 翻页请求之间的间隔（秒）
+            lean: 精简模式，请求时带 fields 过滤并要求gzip压缩的响应
+            http_cache: 条件请求缓存（EtagCache 或数据库路径），默认读取环境变量 YOUTUBE_HTTP_CACHE；
+                        有缓存的页面带 If-None-Match 请求，返回304时使用缓存的响应
+            use_feed: get_new_videos 先检查频道的RSS订阅源（不消耗配额），默认读取环境变量
+                      YOUTUBE_USE_FEED（默认启用，设为0时关闭）
         """
         self.api_key = api_key
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self.page_delay = page_delay
+        self.lean = lean
+        self.use_feed = os.getenv('YOUTUBE_USE_FEED', '1') != '0' if use_feed is None else use_feed
+        
+        http_cache = http_cache or os.getenv('YOUTUBE_HTTP_CACHE')
+        self.http_cache = EtagCache(http_cache) if isinstance(http_cache, str) else http_cache
+        
+        if isinstance(api_key, ApiKeyPool):
+            self.key_pool = api_key
+        else:
+            keys = parse_api_keys(api_key)
+            self.key_pool = ApiKeyPool(keys) if len(keys) > 1 else None
+        
+        if self.key_pool:
+            self.default_key = self.key_pool.keys[0]
+        else:
+            keys = parse_api_keys(api_key) if api_key else []
+            self.default_key = keys[0] if keys else None
+        
+        # 每个线程签出独立的API资源对象，同一个获取器可以在线程池中使用
+        self._youtube_override = youtube
+        self._fake_clients = {}
+        self.client_pool = ApiClientPool(self._new_client)
+        self._youtube = None
+    
+    def _new_client(self, key):
+        """为某个密钥创建API资源对象"""
+        if self._youtube_override is not None:
+            return self._youtube_override
+        if os.getenv('YOUTUBE_FAKE_VIDEOS'):
+            # 本地替身没有线程问题，每个密钥共用一个（模拟的配额按密钥计算）
+            client = self._fake_clients.get(key)
+            if client is None:
+                from local_standins import FakeYouTubeResource
+                client = self._fake_clients[key] = FakeYouTubeResource(
+                    int(os.getenv('YOUTUBE_FAKE_VIDEOS')), quota_units=int(os.getenv('YOUTUBE_FAKE_QUOTA', 0)) or None
+                )
+            return client
+        return build_from_document(get_discovery_document(), developerKey=key)
+    
+    @property
+    def youtube(self):
+        """默认密钥的API资源对象（只能在一个线程中使用，多线程时用 client() 签出）"""
+        if self._youtube is None:
+            self._youtube = self._new_client(self.default_key)
+        return self._youtube
+    
+    def client(self, key=None):
+        """
+        签出一个当前线程独占的API资源对象，用法: with fetcher.client() as youtube: ...
+        
+        Args:
+            key: API密钥，默认为第一个密钥
+        """
+        return self.client_pool.checkout(key or self.default_key)
+    
+    def _execute(self, build_request, stage: str, cost: int = 1):
+        """
+        发送一次API调用
+        
+        使用密钥池时选择剩余配额最多的密钥，收到配额用完的错误时把密钥标记为用完，
+        再用另一个密钥重新发送同一个请求（翻页时页码不变）
+        
+        Args:
+            build_request: 函数，参数为API资源对象，返回尚未发送的请求
+            stage: 运行指标中的阶段名称
+            cost: 本次调用消耗的配额单位
+            
+        Raises:
+            HttpError: API返回的其他错误
+            QuotaExhaustedError: 密钥池中所有密钥的配额都已用完
+        """
+        conditional = self.http_cache is not None
+        while True:
+            key = self.key_pool.acquire(cost) if self.key_pool else self.default_key
+            try:
+                with self.client(key) as youtube:
+                    request = build_request(youtube)
+                    cache_key = self.http_cache.prepare(request) if conditional else None
+                    with metrics.stage(stage):
+                        response = request.execute()
+            except HttpError as e:
+                if self.key_pool and quota_error_reason(e):
+                    self._key_exhausted(key)
+                    continue
+                if cache_key and e.resp.status == 304:
+                    response = self.http_cache.load(cache_key)
+                    if response is None:
+                        # 缓存刚被清除，不带 If-None-Match 重新请求
+                        conditional = False
+                        continue
+                else:
+                    raise
+            else:
+                if cache_key:
+                    self.http_cache.store(cache_key, response)
+            if self.key_pool:
+                self.key_pool.record(key, cost)
+            return response
+    
+    def _key_exhausted(self, key):
+        self.key_pool.mark_exhausted(key)
+        metrics.increment('api_key_failovers')
+        print(f"⚠️  API密钥 {mask_key(key)} 的配额已用完，切换到其他密钥")
     
     def get_channel_uploads_playlist_id(self, channel_id: str) -> Optional[str]:
         """
@@ -40,11 +235,11 @@ class YouTubeVideoFetcher:
                 return uploads_playlist_id
             
             # 方法2: 通过API获取（更可靠）
-            request = self.youtube.channels().list(
+            response = self._execute(lambda youtube: youtube.channels().list(
                 part='contentDetails',
-                id=channel_id
-            )
-            response = request.execute()
+                id=channel_id,
+                **({'fields': 'etag,items(contentDetails/relatedPlaylists/uploads)'} if self.lean else {})
+            ), 'uploads_resolve')
             
             if response['items']:
                 uploads_playlist_id = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
@@ -53,17 +248,64 @@ class YouTubeVideoFetcher:
                 print(f"未找到频道ID: {channel_id}")
                 return None
                 
-        except HttpError as e:
+        except (HttpError, QuotaExhaustedError) as e:
             print(f"获取频道信息时出错: {e}")
             return None
     
-    def get_all_video_ids(self, playlist_id: str, max_videos: Optional[int] = None) -> List[str]:
+    @staticmethod
+    def _accept_gzip(request):
+        """要求服务器返回gzip压缩的响应（Google API要求User-Agent中也带有gzip）"""
+        headers = getattr(request, 'headers', None)
+        if headers is None:
+            return request
+        headers['accept-encoding'] = 'gzip'
+        user_agent = headers.get('user-agent', '')
+        if 'gzip' not in user_agent:
+            headers['user-agent'] = f'{user_agent} (gzip)'.strip()
+        return request
+    
+    def _playlist_page_request(self, playlist_id: str, page_token: Optional[str] = None, ids_only: bool = False,
+                               youtube=None):
+        """创建一页 playlistItems.list 请求（尚未发送），youtube 为使用的API资源对象，默认 self.youtube"""
+        request_args = {
+            'part': 'contentDetails' if ids_only else 'contentDetails,snippet',
+            'playlistId': playlist_id,
+            'maxResults': 50,  # API允许的最大值
+        }
+        if ids_only:
+            request_args['fields'] = IDS_ONLY_PLAYLIST_FIELDS
+        elif self.lean:
+            request_args['fields'] = LEAN_PLAYLIST_FIELDS
+        
+        request = (youtube or self.youtube).playlistItems().list(pageToken=page_token, **request_args)
+        if self.lean:
+            self._accept_gzip(request)
+        return request
+    
+    @staticmethod
+    def _parse_playlist_items(response: dict, ids_only: bool = False) -> List[VideoRecord]:
+        """把一页 playlistItems 响应转换为视频记录列表"""
+        videos = []
+        for item in response.get('items', []):
+            if ids_only:
+                video_title = ''
+                publish_time = item['contentDetails'].get('videoPublishedAt', '')
+            else:
+                video_title = item['snippet']['title']
+                publish_time = item['snippet']['publishedAt']
+            
+            videos.append(VideoRecord(item['contentDetails']['videoId'], video_title, publish_time))
+        return videos
+    
+    def get_all_video_ids(self, playlist_id: str, max_videos: Optional[int] = None,
+                          ids_only: bool = False) -> List[str]:
         """
         获取播放列表中的所有视频ID
         
         Args:
             playlist_id: 播放列表ID
             max_videos: 最大获取视频数量，None表示获取所有
+            ids_only: 只获取视频ID和发布时间（不请求snippet，title为空字符串）
             
         Returns:
             视频ID列表
@@ -76,26 +318,17 @@ class YouTubeVideoFetcher:
         
         while True:
             try:
-                request = self.youtube.playlistItems().list(
-                    part='contentDetails,snippet',  # 获取更多信息
-                    playlistId=playlist_id,
-                    maxResults=50,  # API允许的最大值
-                    pageToken=next_page_token
+                response = self._execute(
+                    lambda youtube: self._playlist_page_request(playlist_id, next_page_token, ids_only, youtube),
+                    'playlist_page'
                 )
-                response = request.execute()
                 request_count += 1
+                metrics.increment('playlist_pages')
+                metrics.increment('videos_listed', len(response['items']))
                 
                 # 处理当前页的视频
-                for item in response['items']:
-                    video_id = item['contentDetails']['videoId']
-                    video_title = item['snippet']['title']
-                    publish_time = item['snippet']['publishedAt']
-                    
-                    all_video_ids.append({
-                        'video_id': video_id,
-                        'title': video_title,
-                        'published_at': publish_time
-                    })
+                for video in self._parse_playlist_items(response, ids_only):
+                    all_video_ids.append(video)
                     
                     # 如果设置了最大数量限制
                     if max_videos and len(all_video_ids) >= max_videos:
@@ -110,13 +343,17 @@ class YouTubeVideoFetcher:
                     break
                 
                 # 添加延迟以避免触发API限制
-                time.sleep(0.1)
+                if self.page_delay:
+                    time.sleep(self.page_delay)
                 
             except HttpError as e:
                 print(f"API请求出错: {e}")
                 if e.resp.status == 403:
                     print("可能是API配额超限，请检查你的API密钥和配额设置")
                 break
+            except QuotaExhaustedError as e:
+                print(f"❌ {e}，可以通过 YOUTUBE_API_KEYS 配置更多密钥")
+                break
             except Exception as e:
                 print(f"未知错误: {e}")
                 break
@@ -124,13 +361,15 @@ class YouTubeVideoFetcher:
         print(f"总共获取了 {len(all_video_ids)} 个视频，使用了 {request_count} 次API请求")
         return all_video_ids
     
-    def get_channel_videos(self, channel_id: str, max_videos: Optional[int] = None) -> List[str]:
+    def get_channel_videos(self, channel_id: str, max_videos: Optional[int] = None,
+                           ids_only: bool = False) -> List[str]:
         """
         获取指定频道的所有视频ID
         
         Args:
             channel_id: YouTube频道ID
             max_videos: 最大获取视频数量
+            ids_only: 只获取视频ID和发布时间
             
         Returns:
             视频信息列表
@@ -143,16 +382,257 @@ class YouTubeVideoFetcher:
         print(f"频道 {channel_id} 的uploads播放列表ID: {uploads_playlist_id}")
         
         # 获取所有视频ID
-        return self.get_all_video_ids(uploads_playlist_id, max_videos)
+        return self.get_all_video_ids(uploads_playlist_id, max_videos, ids_only)
+    
+    def get_new_videos(self, channel_id: str, known_video_ids: set, max_videos: Optional[int] = None,
+                       ids_only: bool = False, feed_videos: Optional[List[VideoRecord]] = None
+                       ) -> Optional[List[VideoRecord]]:
+        """
+        增量获取频道中还不在 known_video_ids 里的新视频
+        
+        启用 use_feed 时先读取频道的RSS订阅源（最新15个视频，不消耗配额）：订阅源中出现已知视频时
+        直接返回其中的新视频，只有新视频超过15个或订阅源不可用时才调用API。
+        uploads播放列表按发布时间从新到旧排列，遇到第一个已知视频就停止翻页，
+        没有新视频时只需要一次API请求；known_video_ids 为空时等同于获取所有视频
+        
+        Args:
+            channel_id: YouTube频道ID
+            known_video_ids: 已知的视频ID集合
+            max_videos: 最多返回多少个新视频
+            ids_only: 只获取视频ID和发布时间
+            feed_videos: 已经获取的订阅源（channel_feeds.fetch_feeds 并发获取多个频道时传入）
+            
+        Returns:
+            新视频列表（从新到旧），找不到频道时返回None；API错误会直接抛出 HttpError / QuotaExhaustedError
+        """
+        if self.use_feed and known_video_ids:
+            if feed_videos is None:
+                feed_videos = fetch_feed(channel_id)
+            new_videos = new_videos_from_feed(feed_videos, known_video_ids) if feed_videos is not None else None
+            if new_videos is not None:
+                metrics.increment('feed_hits')
+                return new_videos[:max_videos] if max_videos else new_videos
+            metrics.increment('feed_fallbacks')
+        
+        playlist_id = self.get_channel_uploads_playlist_id(channel_id)
+        if not playlist_id:
+            return None
+        
+        new_videos = []
+        page_token = None
+        while True:
+            response = self._execute(
+                lambda youtube: self._playlist_page_request(playlist_id, page_token, ids_only, youtube),
+                'playlist_page'
+            )
+            metrics.increment('playlist_pages')
+            metrics.increment('videos_listed', len(response.get('items', [])))
+            
+            for video in self._parse_playlist_items(response, ids_only):
+                if video.video_id in known_video_ids:
+                    return new_videos
+                new_videos.append(video)
+                if max_videos and len(new_videos) >= max_videos:
+                    return new_videos
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return new_videos
+            if self.page_delay:
+                time.sleep(self.page_delay)
+    
+    def get_uploads_playlist_ids(self, channel_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        批量获取多个频道的uploads播放列表ID
+        
+        UC开头的频道ID直接替换前缀；其余频道每50个合并为一次 channels.list 请求
+        
+        Args:
+            channel_ids: YouTube频道ID列表
+            
+        Returns:
+            {频道ID: uploads播放列表ID}，查询失败的频道值为None
+        """
+        playlists = {}
+        lookups = []
+        for channel_id in channel_ids:
+            if channel_id.startswith('UC'):
+                playlists[channel_id] = 'UU' + channel_id[2:]
+            else:
+                playlists[channel_id] = None
+                lookups.append(channel_id)
+        
+        for start in range(0, len(lookups), BATCH_SIZE):
+            chunk = lookups[start:start + BATCH_SIZE]
+            try:
+                response = self._execute(lambda youtube: youtube.channels().list(
+                    part='contentDetails',
+                    id=','.join(chunk),
+                    maxResults=BATCH_SIZE,
+                    **({'fields': 'etag,items(id,contentDetails/relatedPlaylists/uploads)'} if self.lean else {})
+                ), 'uploads_resolve')
+                for item in response.get('items', []):
+                    playlists[item['id']] = item['contentDetails']['relatedPlaylists']['uploads']
+            except (HttpError, QuotaExhaustedError) as e:
+                print(f"批量获取频道信息时出错: {e}")
+        
+        return playlists
     
-    def save_to_file(self, video_data: List[dict], filename: str, format_type: str = 'txt'):
+    def get_channel_video_counts(self, channel_ids: List[str]) -> Dict[str, Optional[int]]:
+        """
+        查询多个频道的视频数量 (statistics.videoCount)，每50个频道一次 channels.list 调用
+        
+        Args:
+            channel_ids: YouTube频道ID列表
+            
+        Returns:
+            {频道ID: 视频数量}，找不到或查询失败的频道值为None
+        """
+        counts = {channel_id: None for channel_id in channel_ids}
+        for start in range(0, len(channel_ids), BATCH_SIZE):
+            chunk = channel_ids[start:start + BATCH_SIZE]
+            try:
+                response = self._execute(lambda youtube: youtube.channels().list(
+                    part='statistics',
+                    id=','.join(chunk),
+                    maxResults=BATCH_SIZE,
+                    **({'fields': 'etag,items(id,statistics/videoCount)'} if self.lean else {})
+                ), 'channel_statistics')
+                for item in response.get('items', []):
+                    counts[item['id']] = int(item['statistics'].get('videoCount', 0))
+            except (HttpError, QuotaExhaustedError) as e:
+                print(f"批量获取频道视频数量时出错: {e}")
+        return counts
+    
+    def _execute_batch(self, requests_by_id: Dict[str, object], youtube=None) -> Dict[str, object]:
+        """
+        把多个API请求合并为一次HTTP请求发送
+        
+        Args:
+            requests_by_id: {请求ID: 尚未发送的请求对象}
+            youtube: 创建这些请求的API资源对象，默认 self.youtube
+            
+        Returns:
+            {请求ID: 响应}，单个请求失败时值为对应的异常
+        """
+        results = {}
+        
+        def callback(request_id, response, exception):
+            results[request_id] = exception if exception is not None else response
+        
+        batch = (youtube or self.youtube).new_batch_http_request(callback=callback)
+        for request_id, request in requests_by_id.items():
+            batch.add(request, request_id=request_id)
+        with metrics.stage('api_batch'):
+            batch.execute()
+        metrics.increment('api_batches')
+        return results
+    
+    def get_multiple_channel_videos(self, channel_ids: List[str], max_videos: Optional[int] = None,
+                                    ids_only: bool = False) -> Dict[str, Optional[List[dict]]]:
+        """
+        用批量HTTP请求同时获取多个频道的视频
+        
+        第一轮把所有频道的第一页合并发送（每批最多50个），之后每轮把所有还有下一页的频道的
+        下一页合并发送，直到全部取完；请求数量不变，但HTTP往返次数约为单个频道的页数
+        
+        Args:
+            channel_ids: YouTube频道ID列表
+            max_videos: 每个频道的最大获取视频数量
+            ids_only: 只获取视频ID和发布时间
+            
+        Returns:
+            {频道ID: 视频信息列表}，获取失败的频道值为None（可以再用 get_channel_videos 单独重试）
+        """
+        with self.client() as youtube:
+            supports_batch = hasattr(youtube, 'new_batch_http_request')
+        if not supports_batch:
+            return {channel_id: self.get_channel_videos(channel_id, max_videos, ids_only) for channel_id in channel_ids}
+        
+        playlists = self.get_uploads_playlist_ids(channel_ids)
+        results = {channel_id: None for channel_id in channel_ids}
+        pending = deque()
+        for channel_id in channel_ids:
+            if playlists.get(channel_id):
+                results[channel_id] = []
+                pending.append((channel_id, None))
+            else:
+                print(f"未找到频道ID: {channel_id}")
+        
+        print(f"开始批量获取 {len(pending)} 个频道的视频...")
+        round_count = 0
+        
+        while pending:
+            chunk = [pending.popleft() for _ in range(min(BATCH_SIZE, len(pending)))]
+            
+            try:
+                # 使用密钥池时整批请求使用同一个密钥
+                key = self.key_pool.acquire(len(chunk)) if self.key_pool else self.default_key
+                with self.client(key) as youtube:
+                    requests_by_id = {
+                        channel_id: self._playlist_page_request(playlists[channel_id], page_token, ids_only, youtube)
+                        for channel_id, page_token in chunk
+                    }
+                    cache_keys = {
+                        channel_id: self.http_cache.prepare(request) for channel_id, request in requests_by_id.items()
+                    } if self.http_cache else {}
+                    responses = self._execute_batch(requests_by_id, youtube)
+            except (HttpError, QuotaExhaustedError) as e:
+                print(f"批量请求出错: {e}")
+                for channel_id, _ in chunk:
+                    results[channel_id] = None
+                continue
+            round_count += 1
+            if self.key_pool:
+                self.key_pool.record(key, len(chunk))
+            
+            key_exhausted = False
+            for channel_id, page_token in chunk:
+                response = responses.get(channel_id)
+                if self.key_pool and isinstance(response, HttpError) and quota_error_reason(response):
+                    # 配额用完：同一页放回队列，下一轮换一个密钥重新请求
+                    if not key_exhausted:
+                        self._key_exhausted(key)
+                        key_exhausted = True
+                    pending.appendleft((channel_id, page_token))
+                    continue
+                if channel_id in cache_keys:
+                    if isinstance(response, HttpError) and response.resp.status == 304:
+                        response = self.http_cache.load(cache_keys[channel_id])
+                    elif isinstance(response, dict):
+                        self.http_cache.store(cache_keys[channel_id], response)
+                if response is None or isinstance(response, Exception):
+                    print(f"频道 {channel_id} 的批量请求失败: {response}")
+                    results[channel_id] = None
+                    continue
+                
+                metrics.increment('playlist_pages')
+                metrics.increment('videos_listed', len(response.get('items', [])))
+                videos = results[channel_id]
+                videos.extend(self._parse_playlist_items(response, ids_only))
+                
+                if max_videos and len(videos) >= max_videos:
+                    del videos[max_videos:]
+                elif response.get('nextPageToken'):
+                    pending.append((channel_id, response['nextPageToken']))
+            
+            fetched = sum(len(videos) for videos in results.values() if videos)
+            print(f"已获取 {fetched} 个视频 (第 {round_count} 次批量请求，剩余 {len(pending)} 个频道未完成)")
+            
+            if pending and self.page_delay:
+                time.sleep(self.page_delay)
+        
+        return results
+    
+    @staticmethod
+    def save_to_file(video_data: List[dict], filename: str, format_type: str = 'txt'):
         """
         将视频数据保存到文件
         
         Args:
             video_data: 视频数据列表
             filename: 文件名
-            format_type: 文件格式 ('txt', 'json', 'csv')
+            format_type: 文件格式 ('txt', 'json', 'csv', 'parquet')
         """
         try:
             if format_type == 'txt':
@@ -162,7 +642,7 @@ class YouTubeVideoFetcher:
             
             elif format_type == 'json':
                 with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(video_data, f, ensure_ascii=False, indent=2)
+                    json.dump(video_data, f, ensure_ascii=False, indent=2, default=dict)
             
             elif format_type == 'csv':
                 import csv
@@ -171,6 +651,10 @@ class YouTubeVideoFetcher:
                     writer.writeheader()
                     writer.writerows(video_data)
             
+            elif format_type == 'parquet':
+                from columnar_export import save_videos_parquet
+                save_videos_parquet(video_data, filename)
+            
             print(f"数据已保存到 {filename}")
             
         except Exception as e:
@@ -178,14 +662,15 @@ class YouTubeVideoFetcher:
 
 
 def get_api_key():
-    """从环境变量获取API密钥"""
-    api_key = os.getenv('YOUTUBE_API_KEY')
+    """从环境变量获取API密钥，YOUTUBE_API_KEYS（逗号分隔的多个密钥）优先于 YOUTUBE_API_KEY"""
+    api_key = os.getenv('YOUTUBE_API_KEYS') or os.getenv('YOUTUBE_API_KEY')
     if not api_key:
         print("❌ 请设置环境变量 YOUTUBE_API_KEY")
         print("设置方法:")
         print("  Linux/Mac: export YOUTUBE_API_KEY='你的API密钥'")
         print("  Windows: set YOUTUBE_API_KEY=你的API密钥")
         print("  PowerShell: $env:YOUTUBE_API_KEY='你的API密钥'")
+        print("  多个密钥轮换使用: export YOUTUBE_API_KEYS='密钥1,密钥2'")
         return None
     return api_key
 